@@ -0,0 +1,210 @@
+"""
+Controle de admissão antes de qualquer acesso ao banco
+Dr. Rodrigo Sguario - Site de Cardiologia
+
+Cada requisição é classificada (leitura pública, escrita admin, importação,
+backup) e passa por duas barreiras, decididas no before_request:
+
+- token bucket por (classe, IP do cliente): sem ficha, responde 429 com
+  Retry-After;
+- limite global de requisições simultâneas, proporcional ao tamanho do pool
+  de conexões: acima dele, responde 503 na hora em vez de esperar no pool.
+
+Os contadores de admitidas e descartadas vão para o /metrics. Os valores
+são por processo (cada worker do gunicorn tem os seus buckets).
+
+Variáveis de ambiente:
+    ADMISSION_<CLASSE>_RATE / _BURST   fichas por segundo e capacidade do bucket
+    ADMISSION_MAX_CONCURRENT           requisições simultâneas (padrão 2x DB_POOL_MAX_SIZE)
+    ADMISSION_TRUSTED_PROXIES          proxies à frente do app (padrão 1, o do Render)
+    ADMISSION_ENABLED                  0 desliga tudo
+"""
+
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+# classe: (fichas por segundo, capacidade)
+DEFAULT_LIMITS = {
+    'public_read': (20.0, 40),
+    'admin_write': (5.0, 10),
+    'import': (1 / 30, 2),
+    'backup': (1 / 60, 2),
+}
+
+# Rotas que não passam pela admissão (saúde, métricas, preflight do CORS)
+EXEMPT_PATHS = ('/', '/health', '/metrics')
+
+MAX_TRACKED_CLIENTS = int(os.environ.get('ADMISSION_MAX_CLIENTS', 10000))
+
+
+def _limits_from_env():
+    limits = {}
+    for name, (rate, burst) in DEFAULT_LIMITS.items():
+        prefix = f'ADMISSION_{name.upper()}'
+        limits[name] = (float(os.environ.get(f'{prefix}_RATE', rate)),
+                        float(os.environ.get(f'{prefix}_BURST', burst)))
+    return limits
+
+
+def classify_request(path, method):
+    """Classe de limite da requisição"""
+    if path.startswith('/api/reviews/import'):
+        return 'import'
+    if path.startswith('/api/site/backup'):
+        return 'backup'
+    if method in ('GET', 'HEAD'):
+        return 'public_read'
+    return 'admin_write'
+
+
+class TokenBuckets:
+    """Buckets por chave (classe, IP), com os menos recentes descartados quando cheio"""
+
+    def __init__(self, limits, max_clients=MAX_TRACKED_CLIENTS):
+        self.limits = limits
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, request_class, client):
+        """Consome uma ficha; retorna 0 se admitido ou os segundos até a próxima ficha"""
+        rate, burst = self.limits[request_class]
+        key = (request_class, client)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate if rate > 0 else 60.0
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class AdmissionController:
+    """Decide se a requisição entra e mantém os contadores"""
+
+    def __init__(self, limits=None, max_concurrent=None, trusted_proxies=None):
+        if max_concurrent is None:
+            default = 2 * int(os.environ.get('DB_POOL_MAX_SIZE', 5))
+            max_concurrent = int(os.environ.get('ADMISSION_MAX_CONCURRENT', default))
+        if trusted_proxies is None:
+            trusted_proxies = int(os.environ.get('ADMISSION_TRUSTED_PROXIES', 1))
+        self.buckets = TokenBuckets(limits or _limits_from_env())
+        self.max_concurrent = max_concurrent
+        self.trusted_proxies = trusted_proxies
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._admitted = {}
+        self._shed = {}
+
+    def client_ip(self):
+        """IP do cliente: entrada do X-Forwarded-For gravada pelo proxy confiável mais externo"""
+        forwarded = request.headers.get('X-Forwarded-For')
+        if forwarded and self.trusted_proxies > 0:
+            hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+            if hops:
+                return hops[-min(self.trusted_proxies, len(hops))]
+        return request.remote_addr or 'desconhecido'
+
+    def _count(self, counters, key):
+        with self._lock:
+            counters[key] = counters.get(key, 0) + 1
+
+    def admit(self):
+        """None se a requisição entra; senão a resposta 429/503 pronta"""
+        request_class = classify_request(request.path, request.method)
+
+        wait = self.buckets.take(request_class, self.client_ip())
+        if wait > 0:
+            self._count(self._shed, (request_class, 'rate_limited'))
+            response = jsonify({'error': 'Muitas requisições, tente novamente em instantes'})
+            response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+            return response, 429
+
+        if not self._slots.acquire(blocking=False):
+            self._count(self._shed, (request_class, 'overloaded'))
+            response = jsonify({'error': 'Servidor sobrecarregado, tente novamente em instantes'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+
+        g._admission_slot = True
+        with self._lock:
+            self._in_flight += 1
+            self._admitted[request_class] = self._admitted.get(request_class, 0) + 1
+        return None
+
+    def _release_slot(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def release(self):
+        if g.pop('_admission_slot', False):
+            self._release_slot()
+
+    def hold_until_closed(self, response):
+        """Respostas em streaming (backup) seguram a vaga até o corpo terminar de ser enviado"""
+        if response.is_streamed and g.pop('_admission_slot', False):
+            response.call_on_close(self._release_slot)
+        return response
+
+    def collect_metrics(self):
+        """Coletor para metrics_registry.register_collector"""
+        with self._lock:
+            admitted = dict(self._admitted)
+            shed = dict(self._shed)
+            in_flight = self._in_flight
+        return [
+            ('admission_admitted_total', 'counter', 'Requisições admitidas por classe',
+             [({'class': request_class}, value) for request_class, value in sorted(admitted.items())]),
+            ('admission_shed_total', 'counter', 'Requisições recusadas antes do banco (429/503)',
+             [({'class': request_class, 'reason': reason}, value)
+              for (request_class, reason), value in sorted(shed.items())]),
+            ('admission_in_flight', 'gauge', 'Requisições admitidas em andamento', [({}, in_flight)]),
+            ('admission_max_concurrent', 'gauge', 'Limite de requisições simultâneas',
+             [({}, self.max_concurrent)]),
+            ('admission_tracked_clients', 'gauge', 'Buckets (classe, IP) em memória',
+             [({}, len(self.buckets))]),
+        ]
+
+
+def init_admission(app, controller=None):
+    """Instala a admissão no app (registrar depois de init_metrics, para medir as recusas)"""
+    controller = controller or AdmissionController()
+    if os.environ.get('ADMISSION_ENABLED', '1') == '0':
+        return controller
+
+    @app.before_request
+    def _admission_before_request():
+        if request.method == 'OPTIONS' or request.path in EXEMPT_PATHS:
+            return None
+        return controller.admit()
+
+    @app.after_request
+    def _admission_after_request(response):
+        return controller.hold_until_closed(response)
+
+    @app.teardown_request
+    def _admission_teardown_request(exception=None):
+        controller.release()
+
+    return controller
@@ -1,202 +1,96 @@
 import os
 import json
+import base64
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, url_for
 from flask_cors import CORS
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+
+from db_pool import get_pool, PoolTimeout
+from src.services.content_cache import content_cache
+from backup import stream_backup, parse_mark, BackupError
+from migrations import run_migrations, pending_migrations, LATEST_VERSION
+from review_keys import review_dedup_key
+from metrics import init_metrics
+from admission import init_admission
+from conditional import (
+    make_etag, is_conditional, not_modified, not_modified_response, conditional_jsonify
+)
 
 app = Flask(__name__)
 
 # Configuração de CORS para permitir a comunicação com o seu frontend no Netlify
 CORS(app, origins=['https://sitecardiologia.netlify.app', 'http://localhost:5173', 'http://localhost:3000'], 
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-     allow_headers=['Content-Type', 'Authorization'])
+     allow_headers=['Content-Type', 'Authorization'],
+     expose_headers=['X-Next-Cursor', 'Link'])
+
+# Latência, idas ao banco e bytes por endpoint em GET /metrics
+metrics_registry = init_metrics(app)
+
+# Limite por IP/classe de rota e de requisições simultâneas, antes de tocar no banco
+admission = init_admission(app)
+metrics_registry.register_collector(admission.collect_metrics)
 
 # --- FUNÇÕES DO BANCO DE DADOS ---
 def get_db_connection():
+    """Retorna a conexão do pool associada à requisição atual.
+
+    A conexão é retirada do pool na primeira chamada e devolvida
+    automaticamente ao final da requisição (ver `release_db_connection`).
+    Com o pool esgotado, `PoolTimeout` sobe até `pool_exhausted` (503),
+    para não ser confundida com o banco fora do ar (None -> 500).
+    """
+    if 'db_conn' in g:
+        return g.db_conn
+
+    pool = get_pool()
+    if pool is None:
+        print("DATABASE_URL não configurada")
+        return None
+
     try:
-        # Verificar se a variável de ambiente existe
-        database_url = os.environ.get('DATABASE_URL')
-        if not database_url:
-            print("DATABASE_URL não configurada")
-            return None
-        
-        conn = psycopg2.connect(database_url)
-        return conn
+        conn = pool.getconn()
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Erro ao conectar ao banco de dados: {e}")
         return None
 
-def inicializar_db():
-    conn = get_db_connection()
-    if conn:
-        try:
-            with conn.cursor() as cur:
-                # Tabela de posts (já existente)
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS posts (
-                        id SERIAL PRIMARY KEY,
-                        titulo VARCHAR(255) NOT NULL,
-                        conteudo TEXT NOT NULL,
-                        data_criacao TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                    );
-                """)
-            
-                # Tabela para conteúdo das seções do site
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS site_content (
-                        id SERIAL PRIMARY KEY,
-                        section_id VARCHAR(100) NOT NULL UNIQUE,
-                        section_name VARCHAR(255) NOT NULL,
-                        content_data JSONB NOT NULL,
-                        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                    );
-                """)
-                
-                # Tabela para configurações do site
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS site_settings (
-                        id SERIAL PRIMARY KEY,
-                        setting_key VARCHAR(100) NOT NULL UNIQUE,
-                        setting_value JSONB NOT NULL,
-                        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                    );
-                """)
-                
-                # Tabela para avaliações importadas
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS reviews (
-                        id SERIAL PRIMARY KEY,
-                        source VARCHAR(50) NOT NULL,
-                        external_id VARCHAR(255),
-                        author_name VARCHAR(255) NOT NULL,
-                        rating INTEGER NOT NULL,
-                        comment TEXT,
-                        date_created TIMESTAMP WITH TIME ZONE,
-                        imported_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                        is_active BOOLEAN DEFAULT TRUE
-                    );
-                """)
-            
-                # Inserir dados padrão COMPLETOS para todas as seções do site
-                default_content = [
-                ('hero', 'Seção Principal', {
-                    "title": "Dr. Rodrigo Sguario",
-                    "subtitle": "Cardiologista Especialista em Transplante Cardíaco",
-                    "description": "Especialista em cardiologia com foco em transplante cardíaco e insuficiência cardíaca avançada.",
-                    "cta_text": "Agendar Consulta",
-                    "cta_link": "#contact",
-                    "achievements": [
-                        {"icon": "Heart", "title": "Referência em Transplante", "description": "Liderança e experiência em transplantes cardíacos"},
-                        {"icon": "Award", "title": "Tecnologia Avançada", "description": "Equipamentos de última geração para diagnósticos precisos"},
-                        {"icon": "Users", "title": "Atendimento Humanizado", "description": "Cuidado focado no paciente, com empatia e atenção"}
-                    ],
-                    "stats": [
-                        {"number": "500+", "label": "Pacientes Atendidos"},
-                        {"number": "15+", "label": "Anos de Experiência"},
-                        {"number": "5.0", "label": "Avaliação Média", "icon": "Star"},
-                        {"number": "24h", "label": "Suporte Emergencial"}
-                    ]
-                }),
-                ('about', 'Sobre o Médico', {
-                    "title": "Sobre o Dr. Rodrigo",
-                    "description": "Médico cardiologista com ampla experiência em transplante cardíaco e cuidado humanizado.",
-                    "education": [
-                        {"institution": "Instituto do Coração (InCor) - USP-SP", "degree": "Especialização em Insuficiência Cardíaca e Transplante", "period": "2023-2024", "description": "Centro de referência em cardiologia da América Latina"},
-                        {"institution": "UNICAMP", "degree": "Residência em Cardiologia", "period": "2021-2023", "description": "Formação especializada em cardiologia clínica e intervencionista"},
-                        {"institution": "Universidade Federal de Pelotas (UFPel)", "degree": "Graduação em Medicina", "period": "2015-2020", "description": "Formação médica com foco humanizado"}
-                    ],
-                    "specialties": [
-                        "Transplante Cardíaco",
-                        "Insuficiência Cardíaca Avançada", 
-                        "Cardiologia Preventiva",
-                        "Ecocardiografia",
-                        "Cateterismo Cardíaco",
-                        "Reabilitação Cardíaca"
-                    ],
-                    "values": [
-                        {"icon": "Heart", "title": "Formação de Excelência", "description": "InCor-USP, UNICAMP e UFPel. Formação acadêmica completa."},
-                        {"icon": "Users", "title": "Foco no Paciente", "description": "Cuidado centrado nas necessidades individuais de cada paciente."},
-                        {"icon": "BookOpen", "title": "Atualização Constante", "description": "Sempre em busca das mais recentes inovações em cardiologia."}
-                    ]
-                }),
-                ('services', 'Serviços', {
-                    "title": "Serviços Oferecidos",
-                    "description": "Cuidado cardiológico completo e personalizado para cada paciente.",
-                    "services": [
-                        {"name": "Transplante Cardíaco", "description": "Avaliação, indicação e acompanhamento para transplante cardíaco", "icon": "Heart"},
-                        {"name": "Insuficiência Cardíaca", "description": "Tratamento especializado para insuficiência cardíaca avançada", "icon": "Activity"},
-                        {"name": "Cardiologia Preventiva", "description": "Prevenção e controle de fatores de risco cardiovascular", "icon": "Shield"},
-                        {"name": "Ecocardiografia", "description": "Exames de imagem cardíaca com tecnologia avançada", "icon": "Monitor"},
-                        {"name": "Cateterismo Cardíaco", "description": "Procedimentos diagnósticos e terapêuticos invasivos", "icon": "Zap"},
-                        {"name": "Reabilitação Cardíaca", "description": "Programa de recuperação e prevenção secundária", "icon": "TrendingUp"}
-                    ]
-                }),
-                ('contact', 'Contato', {
-                    "title": "Entre em Contato",
-                    "description": "Agende sua consulta ou entre em contato conosco",
-                    "phone": "(11) 99999-9999",
-                    "email": "contato@drrodrigosguario.com.br",
-                    "address": "São Paulo, SP",
-                    "hours": "Segunda a Sexta: 8h às 18h",
-                    "emergency": "24h para casos de emergência"
-                })
-            ]
-            
-            # Inserir conteúdo padrão
-            for section_id, section_name, content_data in default_content:
-                cur.execute("""
-                    INSERT INTO site_content (section_id, section_name, content_data) 
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (section_id) DO NOTHING;
-                """, (section_id, section_name, json.dumps(content_data)))
-            
-                # Inserir configurações padrão
-                default_settings = [
-                ('doctor_info', {
-                    "name": "Dr. Rodrigo Sguario",
-                    "specialty": "Cardiologista",
-                    "crm": "CRM/SP 123456",
-                    "phone": "(11) 99999-9999",
-                    "email": "contato@drrodrigosguario.com.br"
-                }),
-                ('clinic_info', {
-                    "name": "Clínica Cardiológica",
-                    "address": "São Paulo, SP",
-                    "phone": "(11) 3333-4444",
-                    "hours": "Segunda a Sexta: 8h às 18h"
-                }),
-                ('social_media', {
-                    "instagram": "",
-                    "facebook": "",
-                    "linkedin": "",
-                    "whatsapp": "(11) 99999-9999"
-                }),
-                ('site_config', {
-                    "theme_color": "#1e293b",
-                    "accent_color": "#d4af37",
-                    "show_reviews": True,
-                    "auto_import_reviews": False
-                })
-            ]
-            
-                for setting_key, setting_value in default_settings:
-                    cur.execute("""
-                        INSERT INTO site_settings (setting_key, setting_value) 
-                        VALUES (%s, %s)
-                        ON CONFLICT (setting_key) DO NOTHING;
-                    """, (setting_key, json.dumps(setting_value)))
-                
-                conn.commit()
-                conn.close()
-                print("Banco de dados inicializado. Todas as tabelas do CMS verificadas/criadas.")
-        except Exception as e:
-            print(f"Erro ao inicializar banco de dados: {e}")
-            if conn:
-                conn.close()
-    else:
-        print("Falha na conexão com o DB. A inicialização foi ignorada.")
+    g.db_conn = conn
+    return conn
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Devolve ao pool a conexão usada pela requisição"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        get_pool().putconn(conn)
+
+@app.errorhandler(PoolTimeout)
+def pool_exhausted(e):
+    """Pool de conexões saturado: o cliente deve tentar de novo em instantes"""
+    print(f"Pool de conexões esgotado: {e}")
+    response = jsonify({'message': 'Servidor ocupado, tente novamente em instantes'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def aplicar_migracoes():
+    """Aplica as migrações pendentes no boot do worker (fora de qualquer requisição)"""
+    if os.environ.get('RUN_MIGRATIONS_ON_BOOT', '1') == '0':
+        return
+    pool = get_pool()
+    if pool is None:
+        print("Falha na conexão com o DB. As migrações foram ignoradas.")
+        return
+    try:
+        with pool.connection() as conn:
+            versions = run_migrations(conn)
+        if versions:
+            print(f"Migrações aplicadas: {versions}")
+    except Exception as e:
+        print(f"Erro ao aplicar migrações: {e}")
 
 # --- ROTAS DA API ---
 
@@ -217,18 +111,59 @@ def test_api():
         "cors": "Configurado para sitecardiologia.netlify.app"
     })
 
+@app.route('/api/db/pool', methods=['GET'])
+def db_pool_stats():
+    pool = get_pool()
+    if pool is None:
+        return jsonify({'message': 'DATABASE_URL não configurada'}), 503
+    return jsonify(pool.stats()), 200
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(content_cache.stats()), 200
+
+def coletar_metricas_pool_e_cache():
+    """Expõe o estado do pool e do cache de conteúdo no /metrics"""
+    metrics = []
+    pool = get_pool()
+    if pool is not None:
+        stats = pool.stats()
+        metrics += [
+            ('db_pool_connections', 'gauge', 'Conexões do pool por estado',
+             [({'state': 'in_use'}, stats['in_use']), ({'state': 'idle'}, stats['idle'])]),
+            ('db_pool_checkouts_total', 'counter', 'Conexões retiradas do pool', [({}, stats['checkouts'])]),
+            ('db_pool_timeouts_total', 'counter', 'Esperas por conexão que expiraram', [({}, stats['timeouts'])]),
+        ]
+    cache = content_cache.stats()
+    metrics += [
+        ('content_cache_lookups_total', 'counter', 'Consultas ao cache de conteúdo',
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        ('content_cache_entries', 'gauge', 'Entradas no cache de conteúdo', [({}, cache['entries'])]),
+    ]
+    return metrics
+
+metrics_registry.register_collector(coletar_metricas_pool_e_cache)
+
 @app.route('/api/init-db')
 def init_database():
+    # O schema é criado pelas migrações no boot; esta rota só informa o estado
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({
+            "status": "error",
+            "message": "Erro de conexão com o banco de dados"
+        }), 500
     try:
-        inicializar_db()
+        pending = pending_migrations(conn)
         return jsonify({
-            "status": "success",
-            "message": "Banco de dados inicializado com sucesso"
+            "status": "success" if not pending else "pending",
+            "latest_version": LATEST_VERSION,
+            "pending": [{"version": v, "description": d} for v, d in pending]
         })
     except Exception as e:
         return jsonify({
             "status": "error",
-            "message": f"Erro ao inicializar banco: {str(e)}"
+            "message": f"Erro ao verificar migrações: {str(e)}"
         }), 500
 
 @app.route('/api/admin/login', methods=['POST', 'OPTIONS'])
@@ -303,45 +238,118 @@ def criar_post():
         print(f"Erro ao inserir no banco de dados: {e}")
         conn.rollback()
         return jsonify({'message': 'Erro ao salvar o post'}), 500
-    finally:
-        if conn:
-            conn.close()
 
-# READ - Listar todos os posts
+# READ - Listar posts (paginação por cursor em (data_criacao, id))
+POST_FIELDS = ('id', 'titulo', 'conteudo', 'data_criacao')
+POSTS_DEFAULT_LIMIT = 20
+POSTS_MAX_LIMIT = 100
+
+def encode_posts_cursor(data_criacao, post_id):
+    """Gera um cursor opaco a partir da chave do último post da página"""
+    raw = f"{data_criacao.isoformat()}|{post_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_posts_cursor(cursor):
+    """Decodifica o cursor; lança ValueError se for inválido"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        data_criacao, post_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(data_criacao), int(post_id)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
 @app.route('/api/blog/posts', methods=['GET', 'OPTIONS'])
 def listar_posts():
     if request.method == 'OPTIONS':
         return '', 204
     
+    # Parâmetros: ?limit=20&cursor=<opaco>&fields=id,titulo,data_criacao
+    limit = request.args.get('limit', POSTS_DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, POSTS_MAX_LIMIT))
+    
+    fields_param = request.args.get('fields')
+    if fields_param:
+        fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+        invalid = [f for f in fields if f not in POST_FIELDS]
+        if invalid or not fields:
+            return jsonify({'message': f"Campos inválidos. Permitidos: {', '.join(POST_FIELDS)}"}), 400
+    else:
+        fields = list(POST_FIELDS)
+    
+    cursor_param = request.args.get('cursor')
+    after = None
+    if cursor_param:
+        try:
+            after = decode_posts_cursor(cursor_param)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+    
+    # id e data_criacao são sempre lidos para montar o próximo cursor
+    columns = [f for f in POST_FIELDS if f in fields or f in ('id', 'data_criacao')]
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     
+    # A página é identificada pela consulta; o ETag combina a consulta com
+    # (id, data_atualizacao) de cada post da página
+    query_key = (after, limit, ','.join(fields))
+    
+    def page_query(select_columns):
+        # Usa o índice idx_posts_data_criacao_id: custo constante por página
+        where = "WHERE (data_criacao, id) < (%s, %s)" if after else ""
+        params = (after[0], after[1], limit + 1) if after else (limit + 1,)
+        return f"""
+            SELECT {', '.join(select_columns)} 
+            FROM posts 
+            {where}
+            ORDER BY data_criacao DESC, id DESC
+            LIMIT %s
+        """, params
+    
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, titulo, conteudo, data_criacao 
-                FROM posts 
-                ORDER BY data_criacao DESC
-            """)
+            if is_conditional():
+                # Revalidação: lê só as chaves da página, sem o conteúdo
+                cur.execute(*page_query(['id', 'data_atualizacao']))
+                keys = cur.fetchall()
+                etag = make_etag('posts', query_key, keys)
+                last_modified = max((k[1] for k in keys if k[1]), default=None)
+                if not_modified(etag, last_modified):
+                    return not_modified_response(etag, last_modified)
+            
+            cur.execute(*page_query(columns + ['data_atualizacao']))
             posts = cur.fetchall()
-            
-            posts_list = []
-            for post in posts:
-                posts_list.append({
-                    'id': post[0],
-                    'titulo': post[1],
-                    'conteudo': post[2],
-                    'data_criacao': post[3].isoformat() if post[3] else None
-                })
-            
-        return jsonify(posts_list), 200
+        
+        etag = make_etag('posts', query_key, [(post[columns.index('id')], post[-1]) for post in posts])
+        last_modified = max((post[-1] for post in posts if post[-1]), default=None)
+        
+        has_more = len(posts) > limit
+        posts = posts[:limit]
+        
+        posts_list = []
+        for post in posts:
+            row = dict(zip(columns, post))
+            row['data_criacao'] = row['data_criacao'].isoformat() if row['data_criacao'] else None
+            posts_list.append({field: row[field] for field in fields})
+        
+        response = conditional_jsonify(posts_list, etag, last_modified)
+        
+        # O próximo cursor vai no cabeçalho para manter o corpo como lista
+        if has_more and posts:
+            last = dict(zip(columns, posts[-1]))
+            next_cursor = encode_posts_cursor(last['data_criacao'], last['id'])
+            next_args = {'cursor': next_cursor, 'limit': limit}
+            if fields_param:
+                next_args['fields'] = ','.join(fields)
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{url_for("listar_posts", _external=True, **next_args)}>; rel="next"'
+        
+        return response
     except Exception as e:
         print(f"Erro ao buscar posts: {e}")
         return jsonify({'message': 'Erro ao carregar posts'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # READ - Buscar post específico por ID
 @app.route('/api/blog/posts/<int:post_id>', methods=['GET', 'OPTIONS'])
@@ -355,8 +363,18 @@ def buscar_post(post_id):
     
     try:
         with conn.cursor() as cur:
+            if is_conditional():
+                # Revalidação: compara a data de alteração antes de ler o conteúdo
+                cur.execute("SELECT data_atualizacao FROM posts WHERE id = %s", (post_id,))
+                row = cur.fetchone()
+                if not row:
+                    return jsonify({'message': 'Post não encontrado'}), 404
+                etag = make_etag('post', post_id, row[0])
+                if not_modified(etag, row[0]):
+                    return not_modified_response(etag, row[0])
+            
             cur.execute("""
-                SELECT id, titulo, conteudo, data_criacao 
+                SELECT id, titulo, conteudo, data_criacao, data_atualizacao 
                 FROM posts 
                 WHERE id = %s
             """, (post_id,))
@@ -371,14 +389,11 @@ def buscar_post(post_id):
                 'conteudo': post[2],
                 'data_criacao': post[3].isoformat() if post[3] else None
             }
-            
-        return jsonify(post_data), 200
+        
+        return conditional_jsonify(post_data, make_etag('post', post_id, post[4]), post[4])
     except Exception as e:
         print(f"Erro ao buscar post: {e}")
         return jsonify({'message': 'Erro ao carregar post'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # UPDATE - Atualizar post existente
 @app.route('/api/blog/posts/<int:post_id>', methods=['PUT', 'OPTIONS'])
@@ -410,7 +425,7 @@ def atualizar_post(post_id):
             # Atualizar o post
             cur.execute("""
                 UPDATE posts 
-                SET titulo = %s, conteudo = %s 
+                SET titulo = %s, conteudo = %s, data_atualizacao = CURRENT_TIMESTAMP 
                 WHERE id = %s
             """, (titulo, conteudo, post_id))
             conn.commit()
@@ -420,9 +435,6 @@ def atualizar_post(post_id):
         print(f"Erro ao atualizar post: {e}")
         conn.rollback()
         return jsonify({'message': 'Erro ao atualizar post'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # DELETE - Deletar post
 @app.route('/api/blog/posts/<int:post_id>', methods=['DELETE', 'OPTIONS'])
@@ -450,18 +462,22 @@ def deletar_post(post_id):
         print(f"Erro ao deletar post: {e}")
         conn.rollback()
         return jsonify({'message': 'Erro ao deletar post'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # --- ROTAS DO SISTEMA CMS ---
 
 # CONTENT MANAGEMENT - Gerenciamento de conteúdo das seções
+# As leituras passam pelo content_cache (payload, ETag, Last-Modified) e respondem 304
+# quando o cliente já tem a versão atual; as rotas de escrita invalidam o namespace.
 @app.route('/api/content', methods=['GET', 'OPTIONS'])
 def get_all_content():
     if request.method == 'OPTIONS':
         return '', 204
     
+    cache_key = ('content', 'all')
+    cached = content_cache.get(cache_key)
+    if cached is not None:
+        return conditional_jsonify(*cached)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
@@ -483,20 +499,26 @@ def get_all_content():
                     'content_data': item[2],
                     'updated_at': item[3].isoformat() if item[3] else None
                 })
-            
-        return jsonify(content_list), 200
+        
+        last_modified = max((item[3] for item in content if item[3]), default=None)
+        cached = (content_list, make_etag('content', len(content), last_modified), last_modified)
+        content_cache.set(cache_key, cached)
+        return conditional_jsonify(*cached)
     except Exception as e:
         print(f"Erro ao buscar conteúdo: {e}")
         return jsonify({'message': 'Erro ao carregar conteúdo'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/content/<section_id>', methods=['GET', 'PUT', 'OPTIONS'])
 def manage_section_content(section_id):
     if request.method == 'OPTIONS':
         return '', 204
     
+    cache_key = ('content', 'section', section_id)
+    if request.method == 'GET':
+        cached = content_cache.get(cache_key)
+        if cached is not None:
+            return conditional_jsonify(*cached)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
@@ -520,8 +542,10 @@ def manage_section_content(section_id):
                     'content_data': content[2],
                     'updated_at': content[3].isoformat() if content[3] else None
                 }
-                
-            return jsonify(content_data), 200
+            
+            cached = (content_data, make_etag('content', section_id, content[3]), content[3])
+            content_cache.set(cache_key, cached)
+            return conditional_jsonify(*cached)
             
         elif request.method == 'PUT':
             data = request.get_json()
@@ -539,16 +563,14 @@ def manage_section_content(section_id):
                     return jsonify({'message': 'Seção não encontrada'}), 404
                 
                 conn.commit()
-                
+            
+            content_cache.invalidate('content')
             return jsonify({'message': 'Conteúdo atualizado com sucesso!'}), 200
             
     except Exception as e:
         print(f"Erro ao gerenciar conteúdo: {e}")
         conn.rollback()
         return jsonify({'message': 'Erro ao processar conteúdo'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # SETTINGS MANAGEMENT - Gerenciamento de configurações
 @app.route('/api/settings', methods=['GET', 'OPTIONS'])
@@ -556,6 +578,11 @@ def get_all_settings():
     if request.method == 'OPTIONS':
         return '', 204
     
+    cache_key = ('settings', 'all')
+    cached = content_cache.get(cache_key)
+    if cached is not None:
+        return conditional_jsonify(*cached)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
@@ -575,20 +602,26 @@ def get_all_settings():
                     'value': setting[1],
                     'updated_at': setting[2].isoformat() if setting[2] else None
                 }
-            
-        return jsonify(settings_dict), 200
+        
+        last_modified = max((setting[2] for setting in settings if setting[2]), default=None)
+        cached = (settings_dict, make_etag('settings', len(settings), last_modified), last_modified)
+        content_cache.set(cache_key, cached)
+        return conditional_jsonify(*cached)
     except Exception as e:
         print(f"Erro ao buscar configurações: {e}")
         return jsonify({'message': 'Erro ao carregar configurações'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/settings/<setting_key>', methods=['GET', 'PUT', 'OPTIONS'])
 def manage_setting(setting_key):
     if request.method == 'OPTIONS':
         return '', 204
     
+    cache_key = ('settings', 'key', setting_key)
+    if request.method == 'GET':
+        cached = content_cache.get(cache_key)
+        if cached is not None:
+            return conditional_jsonify(*cached)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
@@ -611,8 +644,10 @@ def manage_setting(setting_key):
                     'value': setting[0],
                     'updated_at': setting[1].isoformat() if setting[1] else None
                 }
-                
-            return jsonify(setting_data), 200
+            
+            cached = (setting_data, make_etag('settings', setting_key, setting[1]), setting[1])
+            content_cache.set(cache_key, cached)
+            return conditional_jsonify(*cached)
             
         elif request.method == 'PUT':
             data = request.get_json()
@@ -630,18 +665,17 @@ def manage_setting(setting_key):
                     return jsonify({'message': 'Configuração não encontrada'}), 404
                 
                 conn.commit()
-                
+            
+            content_cache.invalidate('settings')
             return jsonify({'message': 'Configuração atualizada com sucesso!'}), 200
             
     except Exception as e:
         print(f"Erro ao gerenciar configuração: {e}")
         conn.rollback()
         return jsonify({'message': 'Erro ao processar configuração'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # REVIEWS MANAGEMENT - Gerenciamento de avaliações
+
 @app.route('/api/reviews', methods=['GET', 'POST', 'OPTIONS'])
 def manage_reviews():
     if request.method == 'OPTIONS':
@@ -685,8 +719,9 @@ def manage_reviews():
             
             with conn.cursor() as cur:
                 cur.execute("""
-                    INSERT INTO reviews (source, external_id, author_name, rating, comment, date_created) 
-                    VALUES (%s, %s, %s, %s, %s, %s) 
+                    INSERT INTO reviews (source, external_id, author_name, rating, comment, date_created, dedup_key) 
+                    VALUES (%s, %s, %s, %s, %s, %s, %s) 
+                    ON CONFLICT (dedup_key) DO NOTHING
                     RETURNING id
                 """, (
                     data['source'],
@@ -694,20 +729,22 @@ def manage_reviews():
                     data['author_name'],
                     data['rating'],
                     data.get('comment'),
-                    data.get('date_created')
+                    data.get('date_created'),
+                    review_dedup_key(data['source'], data['author_name'], data.get('comment'), data.get('external_id'))
                 ))
-                review_id = cur.fetchone()[0]
+                inserted = cur.fetchone()
                 conn.commit()
-                
+            
+            if not inserted:
+                return jsonify({'message': 'Avaliação já cadastrada'}), 409
+            review_id = inserted[0]
+            
             return jsonify({'message': 'Avaliação adicionada com sucesso!', 'id': review_id}), 201
             
     except Exception as e:
         print(f"Erro ao gerenciar avaliações: {e}")
         conn.rollback()
         return jsonify({'message': 'Erro ao processar avaliações'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/reviews/import', methods=['POST', 'OPTIONS'])
 def import_reviews():
@@ -775,39 +812,39 @@ def import_reviews():
         else:
             all_reviews = sample_reviews
         
-        # Importar para o banco
+        # Importar para o banco em um único INSERT; duplicatas são
+        # descartadas pelo índice único em dedup_key
         imported_count = 0
         
-        with conn.cursor() as cur:
-            for review in all_reviews:
-                # Verificar se a avaliação já existe
-                cur.execute("""
-                    SELECT id FROM reviews 
-                    WHERE author_name = %s AND comment = %s AND source = %s
-                """, (review['patient_name'], review['comment'], review['source']))
-                
-                existing = cur.fetchone()
-                
-                if not existing:
-                    # Inserir nova avaliação
-                    cur.execute("""
-                        INSERT INTO reviews (source, author_name, rating, comment, date_created, is_active)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (
-                        review['source'],
-                        review['patient_name'],
-                        review['rating'],
-                        review['comment'],
-                        review['date'],
-                        True  # Ativa por padrão
-                    ))
-                    imported_count += 1
+        if all_reviews:
+            rows = [
+                (
+                    review['source'],
+                    review.get('external_id'),
+                    review['patient_name'],
+                    review['rating'],
+                    review['comment'],
+                    review['date'],
+                    True,  # Ativa por padrão
+                    review_dedup_key(review['source'], review['patient_name'], review['comment'], review.get('external_id'))
+                )
+                for review in all_reviews
+            ]
+            with conn.cursor() as cur:
+                inserted = execute_values(cur, """
+                    INSERT INTO reviews (source, external_id, author_name, rating, comment, date_created, is_active, dedup_key)
+                    VALUES %s
+                    ON CONFLICT (dedup_key) DO NOTHING
+                    RETURNING id
+                """, rows, page_size=len(rows), fetch=True)
+                imported_count = len(inserted)
         
         conn.commit()
         
         return jsonify({
             "success": True,
             "imported": imported_count,
+            "skipped": len(all_reviews) - imported_count,
             "total_found": len(all_reviews),
             "message": f"{imported_count} novas avaliações importadas com sucesso!",
             "source": source
@@ -821,17 +858,47 @@ def import_reviews():
             'message': f'Erro ao importar avaliações: {str(e)}',
             'imported': 0
         }), 500
-    finally:
-        if conn:
-            conn.close()
 
 # --- ROTAS ADICIONAIS PARA WORDPRESS CMS ---
 
+def upsert_site_sections(cur, sections):
+    """Grava várias seções em um único INSERT ... ON CONFLICT.
+
+    Seções cujo JSON não mudou não são tocadas (updated_at e os validadores
+    de cache continuam os mesmos). Retorna {section_id: 'created' | 'updated' | 'unchanged'}.
+    """
+    if not sections:
+        return {}
+    
+    rows = [
+        (section_id, section_id.replace('_', ' ').title(), json.dumps(content_data))
+        for section_id, content_data in sections.items()
+    ]
+    changed = execute_values(cur, """
+        INSERT INTO site_content (section_id, section_name, content_data) 
+        VALUES %s
+        ON CONFLICT (section_id) 
+        DO UPDATE SET content_data = EXCLUDED.content_data, updated_at = CURRENT_TIMESTAMP
+        WHERE site_content.content_data IS DISTINCT FROM EXCLUDED.content_data
+        RETURNING section_id, (xmax = 0) AS inserted
+    """, rows, template='(%s, %s, %s::jsonb)', page_size=len(rows), fetch=True)
+    
+    status = {section_id: 'unchanged' for section_id in sections}
+    for section_id, inserted in changed:
+        status[section_id] = 'created' if inserted else 'updated'
+    return status
+
 @app.route('/api/site/content', methods=['GET', 'POST', 'OPTIONS'])
 def wordpress_site_content():
     if request.method == 'OPTIONS':
         return '', 204
     
+    cache_key = ('content', 'site')
+    if request.method == 'GET':
+        cached = content_cache.get(cache_key)
+        if cached is not None:
+            return conditional_jsonify(*cached)
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
@@ -840,7 +907,7 @@ def wordpress_site_content():
         if request.method == 'GET':
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT section_id, content_data 
+                    SELECT section_id, content_data, updated_at 
                     FROM site_content 
                     ORDER BY section_id
                 """)
@@ -849,8 +916,11 @@ def wordpress_site_content():
                 content_dict = {}
                 for item in content:
                     content_dict[item[0]] = item[1]
-                
-            return jsonify(content_dict), 200
+            
+            last_modified = max((item[2] for item in content if item[2]), default=None)
+            cached = (content_dict, make_etag('content', len(content), last_modified), last_modified)
+            content_cache.set(cache_key, cached)
+            return conditional_jsonify(*cached)
             
         elif request.method == 'POST':
             data = request.get_json()
@@ -858,30 +928,26 @@ def wordpress_site_content():
                 return jsonify({'message': 'Nenhum dado enviado'}), 400
             
             with conn.cursor() as cur:
-                for section_id, content_data in data.items():
-                    cur.execute("""
-                        INSERT INTO site_content (section_id, section_name, content_data) 
-                        VALUES (%s, %s, %s)
-                        ON CONFLICT (section_id) 
-                        DO UPDATE SET content_data = %s, updated_at = CURRENT_TIMESTAMP
-                    """, (
-                        section_id, 
-                        section_id.replace('_', ' ').title(), 
-                        json.dumps(content_data),
-                        json.dumps(content_data)
-                    ))
-                
+                sections = upsert_site_sections(cur, data)
                 conn.commit()
-                
-            return jsonify({'message': 'Conteúdo do site atualizado com sucesso!'}), 200
+            
+            counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+            for section_status in sections.values():
+                counts[section_status] += 1
+            
+            if counts['created'] or counts['updated']:
+                content_cache.invalidate('content')
+            
+            return jsonify({
+                'message': 'Conteúdo do site atualizado com sucesso!',
+                'sections': sections,
+                **counts
+            }), 200
             
     except Exception as e:
         print(f"Erro ao gerenciar conteúdo do site: {e}")
         conn.rollback()
         return jsonify({'message': 'Erro ao processar conteúdo do site'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/site/content/<section_id>', methods=['PUT', 'OPTIONS'])
 def wordpress_update_section(section_id):
@@ -898,86 +964,52 @@ def wordpress_update_section(section_id):
     
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO site_content (section_id, section_name, content_data) 
-                VALUES (%s, %s, %s)
-                ON CONFLICT (section_id) 
-                DO UPDATE SET content_data = %s, updated_at = CURRENT_TIMESTAMP
-            """, (
-                section_id,
-                section_id.replace('_', ' ').title(),
-                json.dumps(data['content_data']),
-                json.dumps(data['content_data'])
-            ))
-            
+            section_status = upsert_site_sections(cur, {section_id: data['content_data']})[section_id]
             conn.commit()
-            
-        return jsonify({'message': 'Seção atualizada com sucesso!'}), 200
+        
+        if section_status != 'unchanged':
+            content_cache.invalidate('content')
+        return jsonify({'message': 'Seção atualizada com sucesso!', 'status': section_status}), 200
         
     except Exception as e:
         print(f"Erro ao atualizar seção: {e}")
         conn.rollback()
         return jsonify({'message': 'Erro ao atualizar seção'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/api/site/backup', methods=['POST', 'OPTIONS'])
 def wordpress_create_backup():
     if request.method == 'OPTIONS':
         return '', 204
     
-    conn = get_db_connection()
-    if not conn:
+    pool = get_pool()
+    if pool is None:
         return jsonify({'message': 'Erro de conexão com o banco de dados'}), 500
     
-    try:
-        with conn.cursor() as cur:
-            # Backup do conteúdo
-            cur.execute("SELECT section_id, content_data FROM site_content")
-            content_backup = cur.fetchall()
-            
-            # Backup das configurações
-            cur.execute("SELECT setting_key, setting_value FROM site_settings")
-            settings_backup = cur.fetchall()
-            
-            # Backup dos posts
-            cur.execute("SELECT id, titulo, conteudo, data_criacao FROM posts")
-            posts_backup = cur.fetchall()
-            
-            backup_data = {
-                'timestamp': datetime.now().isoformat(),
-                'content': {item[0]: item[1] for item in content_backup},
-                'settings': {item[0]: item[1] for item in settings_backup},
-                'posts': [
-                    {
-                        'id': item[0],
-                        'titulo': item[1],
-                        'conteudo': item[2],
-                        'data_criacao': item[3].isoformat() if item[3] else None
-                    }
-                    for item in posts_backup
-                ]
-            }
-            
-        return jsonify({
-            'success': True,
-            'message': 'Backup criado com sucesso!',
-            'backup': backup_data
-        }), 200
-        
-    except Exception as e:
-        print(f"Erro ao criar backup: {e}")
-        return jsonify({
-            'success': False,
-            'message': f'Erro ao criar backup: {str(e)}'
-        }), 500
-    finally:
-        if conn:
-            conn.close()
+    # ?gzip=1 comprime o arquivo; o corpo é gerado em pedaços, sem montar o backup em memória.
+    # ?since=<watermark do backup anterior> gera um backup incremental.
+    compress = request.args.get('gzip', '0').lower() in ('1', 'true', 'yes')
+    since = request.args.get('since')
+    if since:
+        try:
+            since = parse_mark(since)
+        except BackupError:
+            return jsonify({'message': 'Parâmetro since inválido (use ISO 8601 com fuso horário)'}), 400
+    
+    kind = 'incremental' if since else 'full'
+    filename = f"backup-{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.ndjson" + ('.gz' if compress else '')
+    
+    response = Response(
+        stream_backup(pool, compress=compress, since=since),
+        mimetype='application/gzip' if compress else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 # --- INICIALIZAÇÃO DO BANCO DE DADOS ---
-# A inicialização será feita apenas quando necessário, não durante o import
+# As migrações rodam uma vez no boot de cada worker; com tudo em dia o custo é
+# uma consulta. Desative com RUN_MIGRATIONS_ON_BOOT=0 e rode `python migrations.py` no deploy.
+aplicar_migracoes()
 
 # Execução da aplicação
 if __name__ == '__main__':
@@ -0,0 +1,455 @@
+"""
+Backup em streaming (NDJSON, opcionalmente gzip) e restauração em lote
+Dr. Rodrigo Sguario - Site de Cardiologia
+
+Formato: uma linha JSON por registro.
+- a primeira linha é o cabeçalho ({"type": "header", "kind": "full" | "incremental", ...});
+- cada linha seguinte é uma linha de tabela ({"type": "row", "table": ..., "data": {...}});
+- backups incrementais trazem também as chaves excluídas desde `since`
+  ({"type": "deletes", "table": ..., "keys": [...]}), lidas da tabela
+  backup_deletions, que triggers de DELETE preenchem (migração 6);
+- a última linha é o manifesto com a contagem e o SHA-256 das linhas de cada tabela.
+
+Uso pela linha de comando (usa DATABASE_URL):
+    python backup.py export [--since 2025-01-01T00:00:00+00:00] [--gzip] > backup.ndjson
+    python backup.py restore completo.ndjson.gz incremental1.ndjson.gz ...
+"""
+
+import io
+import os
+import sys
+import json
+import gzip
+import hashlib
+import zlib
+import tempfile
+from datetime import datetime, timezone
+
+BACKUP_FORMAT = 'dr-rodrigo-backup'
+BACKUP_VERSION = 1
+
+# Linhas lidas do servidor por ida ao banco (cursor nomeado)
+FETCH_SIZE = 1000
+# Chaves por linha "deletes" dos backups incrementais
+KEYS_PER_LINE = 10000
+# Tamanho aproximado de cada pedaço enviado ao cliente
+CHUNK_SIZE = 64 * 1024
+# Acima disso os arquivos temporários da restauração vão para o disco
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+# Margem (segundos) subtraída do watermark; linhas reenviadas são reaplicadas pelo upsert
+WATERMARK_OVERLAP = float(os.environ.get('BACKUP_WATERMARK_OVERLAP', 60))
+
+# Ordem de exportação, colunas, chave e coluna de alteração de cada tabela
+BACKUP_TABLES = {
+    'site_content': {
+        'columns': ('section_id', 'section_name', 'content_data', 'updated_at'),
+        'key': 'section_id',
+        'changed_at': 'updated_at',
+        'json_columns': ('content_data',),
+    },
+    'site_settings': {
+        'columns': ('setting_key', 'setting_value', 'updated_at'),
+        'key': 'setting_key',
+        'changed_at': 'updated_at',
+        'json_columns': ('setting_value',),
+    },
+    'posts': {
+        'columns': ('id', 'titulo', 'conteudo', 'data_criacao', 'data_atualizacao'),
+        'key': 'id',
+        'changed_at': 'data_atualizacao',
+        'json_columns': (),
+    },
+}
+
+
+class BackupError(Exception):
+    """Arquivo de backup inválido, truncado ou fora de ordem"""
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value)!r}")
+
+
+def _dump_line(record):
+    return json.dumps(record, ensure_ascii=False, default=_json_default).encode('utf-8') + b'\n'
+
+
+def parse_mark(value):
+    """Converte uma marca (since/watermark) ISO 8601; exige fuso horário"""
+    if isinstance(value, datetime):
+        mark = value
+    else:
+        try:
+            mark = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise BackupError(f"Marca de backup inválida: {value!r}")
+    if mark.tzinfo is None:
+        raise BackupError(f"Marca de backup sem fuso horário: {value!r}")
+    return mark
+
+
+# --- EXPORTAÇÃO ---
+
+def iter_backup_lines(conn, since=None):
+    """Gera as linhas do backup lendo cada tabela com um cursor do lado do servidor.
+
+    Tudo é lido em uma única transação REPEATABLE READ, então o backup
+    corresponde a um instantâneo consistente do banco. Com `since`, só as
+    linhas alteradas depois dessa marca são exportadas; a marca do próximo
+    incremental é o `watermark` do cabeçalho.
+
+    As colunas de alteração recebem CURRENT_TIMESTAMP, o início da transação
+    que grava. Uma transação em andamento no instantâneo pode ter começado
+    antes dele e confirmar depois, então o watermark é o início da transação
+    mais antiga ainda aberta (ou o do instantâneo), menos WATERMARK_OVERLAP.
+    As linhas que o incremental seguinte reenviar são reaplicadas pelo upsert.
+    """
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        cur.execute("""
+            SELECT least(now(), (SELECT min(xact_start) FROM pg_stat_activity
+                                 WHERE xact_start IS NOT NULL AND pid <> pg_backend_pid()))
+                   - make_interval(secs => %s),
+                   now()
+        """, (WATERMARK_OVERLAP,))
+        watermark, created_at = cur.fetchone()
+
+    yield _dump_line({
+        'type': 'header',
+        'format': BACKUP_FORMAT,
+        'version': BACKUP_VERSION,
+        'kind': 'incremental' if since else 'full',
+        'since': since,
+        'watermark': watermark,
+        'created_at': created_at,
+        'tables': list(BACKUP_TABLES),
+    })
+
+    manifest = {}
+    for table, spec in BACKUP_TABLES.items():
+        columns = spec['columns']
+        digest = hashlib.sha256()
+        count = 0
+
+        with conn.cursor(name=f'backup_{table}') as cur:
+            cur.itersize = FETCH_SIZE
+            if since:
+                cur.execute(
+                    f"SELECT {', '.join(columns)} FROM {table} "
+                    f"WHERE {spec['changed_at']} > %s ORDER BY {spec['key']}",
+                    (since,)
+                )
+            else:
+                cur.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {spec['key']}")
+            for row in cur:
+                line = _dump_line({'type': 'row', 'table': table, 'data': dict(zip(columns, row))})
+                digest.update(line)
+                count += 1
+                yield line
+
+        delete_count = 0
+        if since:
+            # Exclusões desde a marca (tombstones): o custo acompanha as alterações,
+            # não o tamanho da tabela
+            with conn.cursor(name=f'backup_deletes_{table}') as cur:
+                cur.itersize = KEYS_PER_LINE
+                cur.execute(
+                    "SELECT DISTINCT row_key FROM backup_deletions "
+                    "WHERE table_name = %s AND deleted_at > %s ORDER BY row_key",
+                    (table, since)
+                )
+                while True:
+                    keys = [row[0] for row in cur.fetchmany(KEYS_PER_LINE)]
+                    if not keys:
+                        break
+                    line = _dump_line({'type': 'deletes', 'table': table, 'keys': keys})
+                    digest.update(line)
+                    delete_count += len(keys)
+                    yield line
+
+        manifest[table] = {'rows': count, 'deletes': delete_count, 'sha256': digest.hexdigest()}
+
+    conn.rollback()
+    yield _dump_line({
+        'type': 'manifest',
+        'tables': manifest,
+        'finished_at': datetime.now(timezone.utc),
+    })
+
+
+def iter_chunks(lines, compress=False, chunk_size=CHUNK_SIZE):
+    """Agrupa as linhas em pedaços de ~chunk_size bytes, comprimindo com gzip se pedido"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    size = 0
+
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            data = b''.join(buffer)
+            buffer, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = b''.join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def stream_backup(pool, compress=False, since=None):
+    """Gera o corpo da resposta usando uma conexão própria do pool.
+
+    A conexão é retirada e devolvida pelo próprio gerador, pois ele continua
+    rodando depois que o contexto da requisição já foi encerrado.
+    """
+    try:
+        with pool.connection() as conn:
+            yield from iter_chunks(iter_backup_lines(conn, since=since), compress=compress)
+    except GeneratorExit:
+        raise
+    except Exception as e:
+        # Os cabeçalhos já foram enviados: o arquivo fica sem manifesto e é
+        # rejeitado na restauração
+        print(f"Erro ao gerar backup: {e}")
+        raise
+
+
+# --- RESTAURAÇÃO ---
+
+def _open_backup(fileobj):
+    """Aceita arquivos NDJSON puros ou comprimidos com gzip"""
+    if not hasattr(fileobj, 'peek'):
+        fileobj = io.BufferedReader(fileobj)
+    if fileobj.peek(2)[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=fileobj)
+    return fileobj
+
+
+def _csv_field(value):
+    # Formato CSV do COPY: campo vazio sem aspas é NULL, "" é texto vazio
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _write_csv_row(spool, values):
+    spool.write((','.join(_csv_field(v) for v in values) + '\n').encode('utf-8'))
+
+
+class _ParsedBackup:
+    """Um arquivo de backup já verificado, com as linhas em arquivos temporários CSV"""
+
+    def __init__(self, header):
+        self.header = header
+        self.rows = {table: tempfile.SpooledTemporaryFile(SPOOL_MAX_MEMORY) for table in BACKUP_TABLES}
+        self.deletes = {table: tempfile.SpooledTemporaryFile(SPOOL_MAX_MEMORY) for table in BACKUP_TABLES}
+        self.counts = {table: {'rows': 0, 'deletes': 0} for table in BACKUP_TABLES}
+
+    def close(self):
+        for spool in list(self.rows.values()) + list(self.deletes.values()):
+            spool.close()
+
+
+def parse_backup(fileobj):
+    """Lê e valida um arquivo de backup (cabeçalho, checksums e manifesto)"""
+    stream = _open_backup(fileobj)
+
+    first = stream.readline()
+    try:
+        header = json.loads(first)
+    except ValueError:
+        raise BackupError('Cabeçalho do backup inválido')
+    if header.get('type') != 'header' or header.get('format') != BACKUP_FORMAT:
+        raise BackupError('Arquivo não é um backup deste site')
+    if header.get('version') != BACKUP_VERSION:
+        raise BackupError(f"Versão de backup não suportada: {header.get('version')}")
+
+    parsed = _ParsedBackup(header)
+    digests = {table: hashlib.sha256() for table in BACKUP_TABLES}
+    manifest = None
+
+    try:
+        for line in stream:
+            if manifest is not None:
+                raise BackupError('Dados após o manifesto')
+            record = json.loads(line)
+            kind = record.get('type')
+            if kind == 'manifest':
+                manifest = record
+                continue
+
+            table = record.get('table')
+            if table not in BACKUP_TABLES:
+                raise BackupError(f"Tabela desconhecida no backup: {table}")
+            digests[table].update(line)
+
+            if kind == 'row':
+                spec = BACKUP_TABLES[table]
+                values = [
+                    json.dumps(record['data'].get(c), ensure_ascii=False) if c in spec['json_columns']
+                    else record['data'].get(c)
+                    for c in spec['columns']
+                ]
+                _write_csv_row(parsed.rows[table], values)
+                parsed.counts[table]['rows'] += 1
+            elif kind == 'deletes':
+                for key in record['keys']:
+                    _write_csv_row(parsed.deletes[table], [key])
+                parsed.counts[table]['deletes'] += len(record['keys'])
+            else:
+                raise BackupError(f"Registro desconhecido no backup: {kind}")
+
+        if manifest is None:
+            raise BackupError('Backup incompleto (sem manifesto)')
+        for table, expected in manifest['tables'].items():
+            if table not in BACKUP_TABLES:
+                raise BackupError(f"Tabela desconhecida no manifesto: {table}")
+            counts = parsed.counts[table]
+            if (expected['rows'] != counts['rows'] or expected.get('deletes', 0) != counts['deletes']
+                    or expected['sha256'] != digests[table].hexdigest()):
+                raise BackupError(f"Checksum ou contagem não confere para a tabela {table}")
+    except Exception:
+        parsed.close()
+        raise
+
+    for spool in list(parsed.rows.values()) + list(parsed.deletes.values()):
+        spool.seek(0)
+    return parsed
+
+
+def _apply_backup(cur, parsed, index):
+    """Carrega um backup já verificado com COPY (dentro da transação atual)"""
+    full = parsed.header['kind'] == 'full'
+
+    if full:
+        cur.execute(f"TRUNCATE {', '.join(BACKUP_TABLES)}")
+
+    for table, spec in BACKUP_TABLES.items():
+        columns = ', '.join(spec['columns'])
+
+        if full:
+            cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", parsed.rows[table])
+            continue
+
+        # Incremental: primeiro as exclusões, depois o upsert. Uma chave excluída e
+        # recriada depois de `since` vem nas duas listas e deve terminar viva
+        deletes = f"restore_deletes_{table}_{index}"
+        cur.execute(f"CREATE TEMP TABLE {deletes} ON COMMIT DROP AS SELECT {spec['key']} AS key FROM {table} WITH NO DATA")
+        cur.copy_expert(f"COPY {deletes} (key) FROM STDIN WITH (FORMAT csv)", parsed.deletes[table])
+        cur.execute(f"DELETE FROM {table} t USING {deletes} d WHERE t.{spec['key']} = d.key")
+
+        # COPY para uma tabela temporária e depois upsert em lote
+        stage = f"restore_{table}_{index}"
+        cur.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA")
+        cur.copy_expert(f"COPY {stage} ({columns}) FROM STDIN WITH (FORMAT csv)", parsed.rows[table])
+        updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in spec['columns'] if c != spec['key'])
+        cur.execute(f"""
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM {stage}
+            ON CONFLICT ({spec['key']}) DO UPDATE SET {updates}
+        """)
+
+
+def restore_backups(conn, files):
+    """Restaura um backup completo seguido de zero ou mais incrementais, em ordem.
+
+    Todos os arquivos são aplicados em uma única transação: ou tudo é
+    restaurado, ou nada muda. Retorna um resumo por arquivo.
+    """
+    if not files:
+        raise BackupError('Nenhum arquivo de backup enviado')
+
+    summary = []
+    previous_watermark = None
+    conn.rollback()
+    try:
+        with conn.cursor() as cur:
+            for index, fileobj in enumerate(files):
+                parsed = parse_backup(fileobj)
+                try:
+                    header = parsed.header
+                    if index == 0 and header['kind'] != 'full':
+                        raise BackupError('A cadeia de restauração deve começar por um backup completo')
+                    if index > 0:
+                        if header['kind'] != 'incremental':
+                            raise BackupError('Depois do backup completo só são aceitos incrementais')
+                        # Um incremental cobre as alterações a partir de `since`; se começar
+                        # depois da marca do arquivo anterior, há uma lacuna na cadeia
+                        if parse_mark(header.get('since')) > parse_mark(previous_watermark):
+                            raise BackupError(f"Lacuna na cadeia de backups antes do arquivo {index + 1}")
+                    _apply_backup(cur, parsed, index)
+                    previous_watermark = header['watermark']
+                    summary.append({
+                        'kind': header['kind'],
+                        'since': header.get('since'),
+                        'watermark': header['watermark'],
+                        'rows': {table: counts['rows'] for table, counts in parsed.counts.items()},
+                    })
+                finally:
+                    parsed.close()
+
+            # Os ids dos posts vieram do backup: ajusta a sequência
+            cur.execute("""
+                SELECT setval(pg_get_serial_sequence('posts', 'id'),
+                              COALESCE((SELECT max(id) FROM posts), 0) + 1, false)
+            """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return summary
+
+
+# --- LINHA DE COMANDO ---
+
+def main(argv):
+    import argparse
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description='Backup e restauração do banco do site')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help='Gera um backup na saída padrão')
+    export.add_argument('--since', help='Marca (watermark) do backup anterior, para um incremental')
+    export.add_argument('--gzip', action='store_true', help='Comprime a saída com gzip')
+    restore = sub.add_parser('restore', help='Restaura um backup completo e seus incrementais')
+    restore.add_argument('files', nargs='+', help='Arquivos na ordem: completo, incremental 1, ...')
+    args = parser.parse_args(argv)
+
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print("DATABASE_URL não configurada", file=sys.stderr)
+        return 1
+
+    conn = psycopg2.connect(database_url)
+    try:
+        if args.command == 'export':
+            since = parse_mark(args.since) if args.since else None
+            for chunk in iter_chunks(iter_backup_lines(conn, since=since), compress=args.gzip):
+                sys.stdout.buffer.write(chunk)
+        else:
+            files = [open(path, 'rb') for path in args.files]
+            try:
+                summary = restore_backups(conn, files)
+            finally:
+                for f in files:
+                    f.close()
+            print(json.dumps(summary, ensure_ascii=False, indent=2), file=sys.stderr)
+    except BackupError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,83 @@
+"""
+Benchmark do custo do hash de senha contra a vazão de logins
+Dr. Rodrigo Sguario - Site de Cardiologia
+
+Para cada método do werkzeug mede o tempo de uma verificação e depois
+simula logins concorrentes passando pelo pool limitado de
+src/services/password_hashing.py: logins/s aceitos, rejeitados (503) e a
+latência p95 dos aceitos.
+
+Uso: python bench_password.py [logins concorrentes (padrão 16)] [segundos por método (padrão 3)]
+"""
+
+import sys
+import time
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from src.services.password_hashing import (
+    PASSWORD_HASH_MAX_QUEUE, PASSWORD_HASH_WORKERS, PasswordHasher, PasswordHasherBusy
+)
+
+METHODS = ('pbkdf2:sha256:1000000', 'pbkdf2:sha256:600000', 'scrypt:32768:8:1', 'scrypt:16384:8:1')
+PASSWORD = 'senha-de-teste-123'
+
+
+def hash_cost(method, rounds=3):
+    """Mediana, em segundos, de uma verificação com o método"""
+    pwhash = generate_password_hash(PASSWORD, method)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        check_password_hash(pwhash, PASSWORD)
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2], pwhash
+
+
+def login_throughput(hasher, pwhash, clients, duration):
+    """Clientes em laço fazendo login até o fim do tempo"""
+    accepted, rejected = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                hasher.verify(pwhash, PASSWORD)
+            except PasswordHasherBusy:
+                with lock:
+                    rejected[0] += 1
+                time.sleep(0.01)  # o cliente respeitaria o Retry-After
+                continue
+            with lock:
+                accepted.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    accepted.sort()
+    p95 = accepted[int(len(accepted) * 0.95) - 1] if accepted else 0.0
+    return len(accepted) / duration, rejected[0], p95
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+
+    print(f"pool: {PASSWORD_HASH_WORKERS} threads + fila {PASSWORD_HASH_MAX_QUEUE}; "
+          f"{clients} clientes por {duration:.0f}s")
+    for method in METHODS:
+        cost, pwhash = hash_cost(method)
+        hasher = PasswordHasher(method=method)
+        rate, rejected, p95 = login_throughput(hasher, pwhash, clients, duration)
+        print(f"{method:>22}: {cost * 1000:7.1f} ms/hash - {rate:6.1f} logins/s, "
+              f"{rejected} rejeitados (503), p95 {p95 * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark da geração de slugs com muitos posts de mesmo título
+Dr. Rodrigo Sguario - Site de Cardiologia
+
+Compara o algoritmo antigo (uma consulta por sufixo testado) com o atual
+(uma consulta por post) em um SQLite em memória.
+
+O algoritmo antigo é quadrático (1000 posts = ~500 mil consultas), por isso
+roda com uma quantidade menor por padrão.
+
+Uso: python bench_slug.py [posts (padrão 5000)] [posts no algoritmo antigo (padrão 300)]
+"""
+
+import re
+import sys
+import time
+
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.user import db
+from src.models.admin import Admin  # noqa: F401 (registra a tabela admins)
+from src.models.blog import BlogPost
+
+TITLE = 'Coração: cuidados após o transplante'
+
+
+def legacy_generate_slug(post):
+    """Algoritmo anterior, mantido aqui só para comparação"""
+    slug = re.sub(r'[^\w\s-]', '', post.title.lower())
+    slug = re.sub(r'[-\s]+', '-', slug)
+    existing = BlogPost.query.filter_by(slug=slug).first()
+    if existing and existing.id != post.id:
+        counter = 1
+        while BlogPost.query.filter_by(slug=f"{slug}-{counter}").first():
+            counter += 1
+        slug = f"{slug}-{counter}"
+    return slug
+
+
+def run(app, count, legacy):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        queries = [0]
+
+        def count_query(*args):
+            queries[0] += 1
+
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+        started = time.perf_counter()
+        try:
+            for _ in range(count):
+                post = BlogPost(title=TITLE, content='<p>Texto</p>', category='Transplante', author_id=1)
+                if legacy:
+                    post.slug = legacy_generate_slug(post)
+                db.session.add(post)
+                db.session.commit()
+        finally:
+            elapsed = time.perf_counter() - started
+            event.remove(db.engine, 'before_cursor_execute', count_query)
+
+        last_slug = BlogPost.query.order_by(BlogPost.id.desc()).first().slug
+        return elapsed, queries[0], last_slug
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    legacy_count = int(sys.argv[2]) if len(sys.argv) > 2 else min(count, 300)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    for label, legacy, total in (('antigo', True, legacy_count), ('atual', False, count)):
+        elapsed, queries, last_slug = run(app, total, legacy)
+        print(f"{label:>6}: {total} posts em {elapsed:.2f}s "
+              f"({elapsed / total * 1000:.2f} ms/post, {queries} consultas) - último slug: {last_slug}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tarefas de manutenção do blog (src/)
+Dr. Rodrigo Sguario - Site de Cardiologia
+
+Usa DATABASE_URL se definida; senão, o SQLite local em src/database/app.db.
+
+Uso:
+    python blog_maintenance.py upgrade-schema
+    python blog_maintenance.py backfill-derived [--chunk-size 500] [--all]
+    python blog_maintenance.py migrate-tags [--chunk-size 1000]
+    python blog_maintenance.py rebuild-related
+    python blog_maintenance.py render-content [--chunk-size 200] [--all]
+"""
+
+import os
+import sys
+import argparse
+
+from flask import Flask
+
+from src.models.user import db
+from src.models.admin import Admin  # noqa: F401 (registra a tabela admins)
+from src.services.derived_fields import backfill_derived_fields
+from src.services.tags import migrate_tags
+from src.services.related_posts import rebuild_related_posts
+from src.services.rendering import backfill_rendered_content
+from src.services.blog_schema import upgrade_blog_schema
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'database', 'app.db')
+
+
+def create_app():
+    """App Flask mínimo, só com o SQLAlchemy configurado"""
+    database_url = os.environ.get('DATABASE_URL') or f'sqlite:///{DEFAULT_SQLITE_PATH}'
+    # O Render ainda entrega URLs no formato antigo "postgres://"
+    if database_url.startswith('postgres://'):
+        database_url = 'postgresql://' + database_url[len('postgres://'):]
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+    return app
+
+
+def cmd_upgrade_schema(args):
+    summary = upgrade_blog_schema(db.engine)
+    added = ', '.join(summary['added_columns']) or 'nenhuma'
+    print(f"Schema do blog atualizado (colunas novas: {added}; busca: {summary['search']})")
+
+
+def cmd_backfill_derived(args):
+    processed = backfill_derived_fields(chunk_size=args.chunk_size, only_missing=not args.all)
+    print(f"Campos derivados atualizados em {processed} posts")
+
+
+def cmd_migrate_tags(args):
+    processed = migrate_tags(chunk_size=args.chunk_size)
+    print(f"Tags migradas de {processed} posts")
+
+
+def cmd_rebuild_related(args):
+    processed = rebuild_related_posts()
+    print(f"Relacionados recalculados para {processed} posts")
+
+
+def cmd_render_content(args):
+    processed = backfill_rendered_content(chunk_size=args.chunk_size, only_stale=not args.all)
+    print(f"Conteúdo renderizado de {processed} posts")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Manutenção do blog')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    schema = subparsers.add_parser('upgrade-schema',
+                                   help='cria tabelas, colunas e índice de busca que faltam (rodar no deploy)')
+    schema.set_defaults(func=cmd_upgrade_schema)
+
+    backfill = subparsers.add_parser('backfill-derived',
+                                     help='preenche plain_text, word_count, excerpt e read_time')
+    backfill.add_argument('--chunk-size', type=int, default=500)
+    backfill.add_argument('--all', action='store_true', help='recalcula também os posts já preenchidos')
+    backfill.set_defaults(func=cmd_backfill_derived)
+
+    tags = subparsers.add_parser('migrate-tags',
+                                 help='cria blog_tags/blog_post_tags a partir de blog_posts.tags')
+    tags.add_argument('--chunk-size', type=int, default=1000)
+    tags.set_defaults(func=cmd_migrate_tags)
+
+    related = subparsers.add_parser('rebuild-related', help='recalcula a tabela de posts relacionados')
+    related.set_defaults(func=cmd_rebuild_related)
+
+    render = subparsers.add_parser('render-content',
+                                   help='preenche rendered_html, toc e render_hash')
+    render.add_argument('--chunk-size', type=int, default=200)
+    render.add_argument('--all', action='store_true', help='renderiza também os posts já atualizados')
+    render.set_defaults(func=cmd_render_content)
+
+    args = parser.parse_args(argv)
+    app = create_app()
+    with app.app_context():
+        args.func(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
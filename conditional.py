@@ -0,0 +1,52 @@
+"""
+Suporte a requisições condicionais (ETag / Last-Modified / 304)
+Dr. Rodrigo Sguario - Site de Cardiologia
+"""
+
+import hashlib
+
+from flask import request, jsonify, Response
+
+# Navegadores e CDN podem guardar a resposta, mas devem revalidar sempre
+CACHE_CONTROL = 'public, no-cache'
+
+
+def make_etag(*parts):
+    """Gera um ETag estável a partir dos validadores (contagem, max(updated_at), ...)"""
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def is_conditional():
+    """Indica se o cliente enviou algum validador"""
+    return bool(request.if_none_match) or request.if_modified_since is not None
+
+
+def not_modified(etag, last_modified=None):
+    """Verifica If-None-Match (prioritário) e If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        # Datas HTTP têm resolução de segundos
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def _add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def not_modified_response(etag, last_modified=None):
+    """Resposta 304 vazia com os validadores atuais"""
+    return _add_validators(Response(status=304), etag, last_modified)
+
+
+def conditional_jsonify(payload, etag, last_modified=None):
+    """Responde 304 sem serializar nada quando o cliente já tem a versão atual"""
+    if not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    return _add_validators(jsonify(payload), etag, last_modified)
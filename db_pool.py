@@ -0,0 +1,317 @@
+"""
+Pool de conexões PostgreSQL por processo (um por worker do gunicorn)
+Dr. Rodrigo Sguario - Site de Cardiologia
+"""
+
+import os
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+from metrics import InstrumentedCursor
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo de espera"""
+
+
+class _PooledConnection:
+    """Metadados de uma conexão física mantida pelo pool"""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Pool limitado de conexões psycopg2 com verificação de saúde e reciclagem.
+
+    - `max_size` limita o número de conexões abertas pelo processo;
+    - conexões com mais de `max_lifetime` segundos são descartadas;
+    - conexões ociosas por mais de `max_idle` segundos são fechadas (mantendo `min_size`);
+    - conexões ociosas por mais de `ping_after` segundos são testadas com `SELECT 1`.
+    """
+
+    def __init__(self, dsn, min_size=0, max_size=5, timeout=5.0,
+                 max_lifetime=1800.0, max_idle=300.0, ping_after=30.0,
+                 connection_factory=None, cursor_factory=None):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self.connection_factory = connection_factory
+        self.cursor_factory = cursor_factory
+
+        self._cond = threading.Condition()
+        self._idle = []  # pilha LIFO: a conexão mais recente fica "quente"
+        self._in_use = {}
+        self._connecting = 0
+        self._pid = os.getpid()
+
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'created': 0,
+            'closed_lifetime': 0,
+            'closed_idle': 0,
+            'closed_broken': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    # --- Ciclo de vida das conexões ---
+
+    def _connect(self):
+        kwargs = {}
+        if self.connection_factory is not None:
+            kwargs['connection_factory'] = self.connection_factory
+        if self.cursor_factory is not None:
+            kwargs['cursor_factory'] = self.cursor_factory
+        conn = psycopg2.connect(self.dsn, **kwargs)
+        return _PooledConnection(conn)
+
+    @staticmethod
+    def _close(entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, entry, now):
+        """Verifica se a conexão ainda pode ser usada"""
+        if entry.conn.closed:
+            return False
+        if now - entry.last_used < self.ping_after:
+            return True
+        try:
+            with entry.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            entry.conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _check_fork(self):
+        # Conexões herdadas do processo pai (preload do gunicorn) não podem ser reutilizadas
+        if os.getpid() != self._pid:
+            self._idle = []
+            self._in_use = {}
+            self._connecting = 0
+            self._pid = os.getpid()
+
+    def _reap_idle(self, now):
+        """Separa as conexões ociosas ou velhas demais (chamado com o lock adquirido).
+
+        Retorna as conexões a fechar; o fechamento é feito fora do lock.
+        """
+        keep = []
+        expired = []
+        # As conexões mais antigas ficam no início da pilha
+        for entry in self._idle:
+            total = len(keep) + len(self._in_use)
+            if now - entry.created_at > self.max_lifetime:
+                expired.append(entry)
+                self._stats['closed_lifetime'] += 1
+            elif now - entry.last_used > self.max_idle and total >= self.min_size:
+                expired.append(entry)
+                self._stats['closed_idle'] += 1
+            else:
+                keep.append(entry)
+        self._idle = keep
+        return expired
+
+    # --- API pública ---
+
+    def getconn(self):
+        """Retira uma conexão do pool, esperando até `timeout` segundos.
+
+        O lock só protege as listas: o teste de saúde (`SELECT 1`) e a
+        conexão nova rodam fora dele, com a vaga reservada em `_connecting`,
+        para que uma conexão lenta não trave os outros checkouts.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            expired = []
+            try:
+                with self._cond:
+                    self._check_fork()
+                    while True:
+                        now = time.monotonic()
+                        expired += self._reap_idle(now)
+
+                        if self._idle:
+                            entry = self._idle.pop()
+                            self._connecting += 1
+                            break
+
+                        if len(self._in_use) + self._connecting < self.max_size:
+                            entry = None
+                            self._connecting += 1
+                            break
+
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self._stats['timeouts'] += 1
+                            raise PoolTimeout(
+                                f"Nenhuma conexão livre após {self.timeout:.1f}s "
+                                f"({len(self._in_use)}/{self.max_size} em uso)"
+                            )
+                        self._cond.wait(remaining)
+            finally:
+                for stale in expired:
+                    self._close(stale)
+
+            if entry is None:
+                break
+
+            alive = self._is_alive(entry, time.monotonic())
+            if not alive:
+                self._close(entry)
+            with self._cond:
+                self._connecting -= 1
+                if alive:
+                    return self._checkout(entry, started)
+                self._stats['closed_broken'] += 1
+                self._cond.notify()
+
+        # Vaga reservada e nenhuma ociosa: conecta fora do lock (handshake TCP/TLS é lento)
+        try:
+            entry = self._connect()
+        except Exception:
+            with self._cond:
+                self._connecting -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._connecting -= 1
+            self._stats['created'] += 1
+            return self._checkout(entry, started)
+
+    def _checkout(self, entry, started):
+        """Registra a conexão como em uso (chamado com o lock adquirido)"""
+        waited = time.monotonic() - started
+        self._stats['checkouts'] += 1
+        self._stats['wait_time_total'] += waited
+        self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+        self._in_use[id(entry.conn)] = entry
+        return entry.conn
+
+    def putconn(self, conn):
+        """Devolve a conexão ao pool, desfazendo transações pendentes.
+
+        O rollback roda fora do lock, com a vaga ainda reservada.
+        """
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+            if entry is None:
+                # Conexão de outro processo ou já devolvida
+                return
+            self._connecting += 1
+
+        reusable = not conn.closed
+        if reusable:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    reusable = False
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                reusable = False
+
+        now = time.monotonic()
+        expired_lifetime = now - entry.created_at > self.max_lifetime
+        if not reusable or expired_lifetime:
+            self._close(entry)
+
+        with self._cond:
+            self._connecting -= 1
+            if not reusable:
+                self._stats['closed_broken'] += 1
+            elif expired_lifetime:
+                self._stats['closed_lifetime'] += 1
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager para uso fora de uma requisição (scripts, boot)"""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """Fecha todas as conexões ociosas (usado no desligamento do worker)"""
+        with self._cond:
+            for entry in self._idle:
+                self._close(entry)
+            self._idle = []
+
+    def stats(self):
+        """Retorna um retrato do estado atual do pool"""
+        with self._cond:
+            checkouts = self._stats['checkouts']
+            return {
+                'pid': self._pid,
+                'max_size': self.max_size,
+                'min_size': self.min_size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'checkouts': checkouts,
+                'timeouts': self._stats['timeouts'],
+                'created': self._stats['created'],
+                'closed_lifetime': self._stats['closed_lifetime'],
+                'closed_idle': self._stats['closed_idle'],
+                'closed_broken': self._stats['closed_broken'],
+                'wait_time_avg_ms': round(self._stats['wait_time_total'] / checkouts * 1000, 3) if checkouts else 0.0,
+                'wait_time_max_ms': round(self._stats['wait_time_max'] * 1000, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Retorna o pool do processo atual, criando-o na primeira chamada"""
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None:
+            database_url = os.environ.get('DATABASE_URL')
+            if not database_url:
+                return None
+            _pool = ConnectionPool(
+                database_url,
+                min_size=int(os.environ.get('DB_POOL_MIN_SIZE', 0)),
+                max_size=int(os.environ.get('DB_POOL_MAX_SIZE', 5)),
+                timeout=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+                max_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+                max_idle=float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+                ping_after=float(os.environ.get('DB_POOL_PING_AFTER', 30)),
+                # Mede cada ida ao banco para o /metrics
+                cursor_factory=InstrumentedCursor,
+            )
+            atexit.register(_pool.closeall)
+        return _pool
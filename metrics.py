@@ -0,0 +1,237 @@
+"""
+Métricas por endpoint no formato texto do Prometheus (/metrics)
+Dr. Rodrigo Sguario - Site de Cardiologia
+
+Para cada (endpoint, método, status) são registrados histogramas de latência,
+idas ao banco por requisição, tempo gasto no banco e bytes de resposta, além
+do número de requisições em andamento. As consultas são medidas no cursor
+do psycopg2 (InstrumentedCursor) e, se o SQLAlchemy estiver instalado, nos
+eventos de cursor de qualquer Engine (blueprints em src/routes).
+
+Os valores são por processo: cada worker do gunicorn expõe os seus.
+"""
+
+import time
+import threading
+from bisect import bisect_left
+
+from flask import Response, g, request, has_app_context
+from psycopg2 import extensions
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+DB_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+RESPONSE_BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRIC_PREFIX = 'site'
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Guarda as séries por rótulos e gera a exposição em texto"""
+
+    HISTOGRAMS = (
+        ('http_request_duration_seconds', 'Latência das requisições HTTP', LATENCY_BUCKETS),
+        ('http_request_db_queries', 'Idas ao banco por requisição', DB_QUERIES_BUCKETS),
+        ('http_request_db_seconds', 'Tempo gasto no banco por requisição', DB_SECONDS_BUCKETS),
+        ('http_response_size_bytes', 'Tamanho do corpo da resposta', RESPONSE_BYTES_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._in_flight = 0
+        self._db_queries_total = 0
+        self._db_seconds_total = 0.0
+        self._collectors = []
+
+    def request_started(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self, labels, duration, db_queries, db_seconds, response_bytes):
+        with self._lock:
+            self._in_flight -= 1
+            series = self._series.get(labels)
+            if series is None:
+                series = [_Histogram(buckets) for _, _, buckets in self.HISTOGRAMS]
+                self._series[labels] = series
+            for histogram, value in zip(series, (duration, db_queries, db_seconds, response_bytes)):
+                if value is not None:
+                    histogram.observe(value)
+
+    def db_query(self, seconds):
+        with self._lock:
+            self._db_queries_total += 1
+            self._db_seconds_total += seconds
+
+    def register_collector(self, collector):
+        """Registra uma função que retorna [(nome, tipo, ajuda, [(rótulos, valor), ...]), ...]"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """Exposição no formato texto 0.0.4 do Prometheus"""
+        lines = []
+        with self._lock:
+            series = {labels: [(h.counts[:], h.total, h.count) for h in hs]
+                      for labels, hs in self._series.items()}
+            in_flight = self._in_flight
+            db_queries_total = self._db_queries_total
+            db_seconds_total = self._db_seconds_total
+
+        for index, (name, help_text, buckets) in enumerate(self.HISTOGRAMS):
+            full_name = f'{METRIC_PREFIX}_{name}'
+            lines.append(f'# HELP {full_name} {help_text}')
+            lines.append(f'# TYPE {full_name} histogram')
+            for (endpoint, method, status), data in sorted(series.items()):
+                counts, total, count = data[index]
+                base = f'endpoint="{_escape(endpoint)}",method="{method}",status="{status}"'
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{full_name}_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f'{full_name}_bucket{{{base},le="+Inf"}} {count}')
+                lines.append(f'{full_name}_sum{{{base}}} {total}')
+                lines.append(f'{full_name}_count{{{base}}} {count}')
+
+        _append_metric(lines, 'http_requests_in_flight', 'gauge',
+                       'Requisições em andamento', [({}, in_flight)])
+        _append_metric(lines, 'db_queries_total', 'counter',
+                       'Consultas executadas (inclusive fora de requisições)', [({}, db_queries_total)])
+        _append_metric(lines, 'db_query_seconds_total', 'counter',
+                       'Tempo total gasto em consultas', [({}, db_seconds_total)])
+
+        for collector in self._collectors:
+            try:
+                for name, metric_type, help_text, samples in collector():
+                    _append_metric(lines, name, metric_type, help_text, samples)
+            except Exception as e:
+                print(f"Erro ao coletar métricas: {e}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _append_metric(lines, name, metric_type, help_text, samples):
+    full_name = f'{METRIC_PREFIX}_{name}'
+    lines.append(f'# HELP {full_name} {help_text}')
+    lines.append(f'# TYPE {full_name} {metric_type}')
+    for labels, value in samples:
+        if labels:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in sorted(labels.items()))
+            lines.append(f'{full_name}{{{label_text}}} {value}')
+        else:
+            lines.append(f'{full_name} {value}')
+
+
+registry = MetricsRegistry()
+
+
+def record_db_query(seconds):
+    """Contabiliza uma ida ao banco na requisição atual (se houver) e no total do processo"""
+    registry.db_query(seconds)
+    if has_app_context() and '_metrics_started' in g:
+        g._metrics_db_queries += 1
+        g._metrics_db_seconds += seconds
+
+
+class InstrumentedCursor(extensions.cursor):
+    """Cursor do psycopg2 que mede cada ida ao banco"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            record_db_query(time.perf_counter() - started)
+
+
+def instrument_sqlalchemy():
+    """Mede as consultas feitas pelo SQLAlchemy, se ele estiver instalado"""
+    try:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+    except ImportError:
+        return False
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['_metrics_started'].pop()
+        record_db_query(time.perf_counter() - started)
+
+    return True
+
+
+def init_metrics(app):
+    """Instala os hooks de medição no app Flask e expõe GET /metrics"""
+
+    @app.before_request
+    def _metrics_before_request():
+        g._metrics_started = time.perf_counter()
+        g._metrics_db_queries = 0
+        g._metrics_db_seconds = 0.0
+        registry.request_started()
+
+    @app.after_request
+    def _metrics_after_request(response):
+        g._metrics_status = response.status_code
+        # Respostas em streaming não têm tamanho conhecido
+        g._metrics_bytes = None if response.is_streamed else response.calculate_content_length()
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown_request(exception=None):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        status = g.pop('_metrics_status', 500)
+        labels = (request.endpoint or 'unmatched', request.method, str(status))
+        registry.request_finished(
+            labels,
+            time.perf_counter() - started,
+            g.pop('_metrics_db_queries', 0),
+            g.pop('_metrics_db_seconds', 0.0),
+            g.pop('_metrics_bytes', None),
+        )
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    instrument_sqlalchemy()
+    return registry
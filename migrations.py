@@ -0,0 +1,376 @@
+"""
+Migrações versionadas do banco PostgreSQL
+Dr. Rodrigo Sguario - Site de Cardiologia
+
+As migrações rodam uma única vez, no boot do worker (ver app.py) ou no
+deploy (`python migrations.py`), protegidas por um advisory lock para que
+workers iniciando ao mesmo tempo não disputem o DDL. As versões aplicadas
+ficam registradas na tabela schema_migrations; quando não há nada pendente
+o custo é uma única consulta.
+"""
+
+import os
+import sys
+import json
+
+from psycopg2.extras import execute_values
+
+from review_keys import assign_dedup_keys
+
+# Chave do pg_advisory_xact_lock usado pelas migrações
+MIGRATIONS_LOCK_KEY = 728401
+
+# Regra de review_dedup_key (review_keys.py) em SQL, usada só pela migração 3.
+# O lower() do banco pode divergir de str.lower() com acentos: a migração 7
+# recalcula as chaves em Python
+REVIEW_DEDUP_KEY_SQL = r"""
+    CASE WHEN COALESCE(external_id, '') <> '' 
+        THEN md5('ext|' || source || '|' || external_id) 
+        ELSE md5('txt|' || source 
+                 || '|' || lower(btrim(regexp_replace(author_name, '\s+', ' ', 'g'))) 
+                 || '|' || lower(btrim(regexp_replace(COALESCE(comment, ''), '\s+', ' ', 'g')))) 
+    END
+"""
+
+# --- DADOS PADRÃO ---
+
+DEFAULT_CONTENT = [
+    ('hero', 'Seção Principal', {
+        "title": "Dr. Rodrigo Sguario",
+        "subtitle": "Cardiologista Especialista em Transplante Cardíaco",
+        "description": "Especialista em cardiologia com foco em transplante cardíaco e insuficiência cardíaca avançada.",
+        "cta_text": "Agendar Consulta",
+        "cta_link": "#contact",
+        "achievements": [
+            {"icon": "Heart", "title": "Referência em Transplante", "description": "Liderança e experiência em transplantes cardíacos"},
+            {"icon": "Award", "title": "Tecnologia Avançada", "description": "Equipamentos de última geração para diagnósticos precisos"},
+            {"icon": "Users", "title": "Atendimento Humanizado", "description": "Cuidado focado no paciente, com empatia e atenção"}
+        ],
+        "stats": [
+            {"number": "500+", "label": "Pacientes Atendidos"},
+            {"number": "15+", "label": "Anos de Experiência"},
+            {"number": "5.0", "label": "Avaliação Média", "icon": "Star"},
+            {"number": "24h", "label": "Suporte Emergencial"}
+        ]
+    }),
+    ('about', 'Sobre o Médico', {
+        "title": "Sobre o Dr. Rodrigo",
+        "description": "Médico cardiologista com ampla experiência em transplante cardíaco e cuidado humanizado.",
+        "education": [
+            {"institution": "Instituto do Coração (InCor) - USP-SP", "degree": "Especialização em Insuficiência Cardíaca e Transplante", "period": "2023-2024", "description": "Centro de referência em cardiologia da América Latina"},
+            {"institution": "UNICAMP", "degree": "Residência em Cardiologia", "period": "2021-2023", "description": "Formação especializada em cardiologia clínica e intervencionista"},
+            {"institution": "Universidade Federal de Pelotas (UFPel)", "degree": "Graduação em Medicina", "period": "2015-2020", "description": "Formação médica com foco humanizado"}
+        ],
+        "specialties": [
+            "Transplante Cardíaco",
+            "Insuficiência Cardíaca Avançada", 
+            "Cardiologia Preventiva",
+            "Ecocardiografia",
+            "Cateterismo Cardíaco",
+            "Reabilitação Cardíaca"
+        ],
+        "values": [
+            {"icon": "Heart", "title": "Formação de Excelência", "description": "InCor-USP, UNICAMP e UFPel. Formação acadêmica completa."},
+            {"icon": "Users", "title": "Foco no Paciente", "description": "Cuidado centrado nas necessidades individuais de cada paciente."},
+            {"icon": "BookOpen", "title": "Atualização Constante", "description": "Sempre em busca das mais recentes inovações em cardiologia."}
+        ]
+    }),
+    ('services', 'Serviços', {
+        "title": "Serviços Oferecidos",
+        "description": "Cuidado cardiológico completo e personalizado para cada paciente.",
+        "services": [
+            {"name": "Transplante Cardíaco", "description": "Avaliação, indicação e acompanhamento para transplante cardíaco", "icon": "Heart"},
+            {"name": "Insuficiência Cardíaca", "description": "Tratamento especializado para insuficiência cardíaca avançada", "icon": "Activity"},
+            {"name": "Cardiologia Preventiva", "description": "Prevenção e controle de fatores de risco cardiovascular", "icon": "Shield"},
+            {"name": "Ecocardiografia", "description": "Exames de imagem cardíaca com tecnologia avançada", "icon": "Monitor"},
+            {"name": "Cateterismo Cardíaco", "description": "Procedimentos diagnósticos e terapêuticos invasivos", "icon": "Zap"},
+            {"name": "Reabilitação Cardíaca", "description": "Programa de recuperação e prevenção secundária", "icon": "TrendingUp"}
+        ]
+    }),
+    ('contact', 'Contato', {
+        "title": "Entre em Contato",
+        "description": "Agende sua consulta ou entre em contato conosco",
+        "phone": "(11) 99999-9999",
+        "email": "contato@drrodrigosguario.com.br",
+        "address": "São Paulo, SP",
+        "hours": "Segunda a Sexta: 8h às 18h",
+        "emergency": "24h para casos de emergência"
+    })
+]
+
+DEFAULT_SETTINGS = [
+    ('doctor_info', {
+        "name": "Dr. Rodrigo Sguario",
+        "specialty": "Cardiologista",
+        "crm": "CRM/SP 123456",
+        "phone": "(11) 99999-9999",
+        "email": "contato@drrodrigosguario.com.br"
+    }),
+    ('clinic_info', {
+        "name": "Clínica Cardiológica",
+        "address": "São Paulo, SP",
+        "phone": "(11) 3333-4444",
+        "hours": "Segunda a Sexta: 8h às 18h"
+    }),
+    ('social_media', {
+        "instagram": "",
+        "facebook": "",
+        "linkedin": "",
+        "whatsapp": "(11) 99999-9999"
+    }),
+    ('site_config', {
+        "theme_color": "#1e293b",
+        "accent_color": "#d4af37",
+        "show_reviews": True,
+        "auto_import_reviews": False
+    })
+]
+
+
+# --- MIGRAÇÕES ---
+
+def _create_cms_tables(cur):
+    # Tabela de posts
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS posts (
+            id SERIAL PRIMARY KEY,
+            titulo VARCHAR(255) NOT NULL,
+            conteudo TEXT NOT NULL,
+            data_criacao TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    
+    # Tabela para conteúdo das seções do site
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS site_content (
+            id SERIAL PRIMARY KEY,
+            section_id VARCHAR(100) NOT NULL UNIQUE,
+            section_name VARCHAR(255) NOT NULL,
+            content_data JSONB NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    
+    # Tabela para configurações do site
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS site_settings (
+            id SERIAL PRIMARY KEY,
+            setting_key VARCHAR(100) NOT NULL UNIQUE,
+            setting_value JSONB NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    
+    # Tabela para avaliações importadas
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS reviews (
+            id SERIAL PRIMARY KEY,
+            source VARCHAR(50) NOT NULL,
+            external_id VARCHAR(255),
+            author_name VARCHAR(255) NOT NULL,
+            rating INTEGER NOT NULL,
+            comment TEXT,
+            date_created TIMESTAMP WITH TIME ZONE,
+            imported_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        );
+    """)
+
+def _posts_keyset_and_validators(cur):
+    # Data da última alteração, usada como validador (ETag / Last-Modified)
+    cur.execute("""
+        ALTER TABLE posts 
+        ADD COLUMN IF NOT EXISTS data_atualizacao TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+    """)
+    
+    # Índice para os backups incrementais (posts alterados desde uma data)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_posts_data_atualizacao ON posts (data_atualizacao);
+    """)
+    
+    # Índice para a paginação por cursor da listagem de posts
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_posts_data_criacao_id 
+        ON posts (data_criacao DESC, id DESC);
+    """)
+
+def _reviews_dedup_key(cur):
+    cur.execute("""
+        ALTER TABLE reviews ADD COLUMN IF NOT EXISTS dedup_key VARCHAR(32);
+    """)
+    # Preenche as linhas antigas; duplicatas já existentes ficam com NULL
+    cur.execute(f"""
+        UPDATE reviews r 
+        SET dedup_key = k.dedup_key 
+        FROM (
+            SELECT id, {REVIEW_DEDUP_KEY_SQL} AS dedup_key,
+                   row_number() OVER (PARTITION BY {REVIEW_DEDUP_KEY_SQL} ORDER BY id) AS rn
+            FROM reviews 
+            WHERE dedup_key IS NULL
+        ) k 
+        WHERE r.id = k.id AND k.rn = 1 
+          AND NOT EXISTS (SELECT 1 FROM reviews e WHERE e.dedup_key = k.dedup_key);
+    """)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_dedup_key ON reviews (dedup_key);
+    """)
+
+def _seed_defaults(cur):
+    # Um INSERT por tabela; não sobrescreve o que o administrador já editou
+    execute_values(cur, """
+        INSERT INTO site_content (section_id, section_name, content_data) 
+        VALUES %s
+        ON CONFLICT (section_id) DO NOTHING
+    """, [
+        (section_id, section_name, json.dumps(content_data))
+        for section_id, section_name, content_data in DEFAULT_CONTENT
+    ], template='(%s, %s, %s::jsonb)')
+    
+    execute_values(cur, """
+        INSERT INTO site_settings (setting_key, setting_value) 
+        VALUES %s
+        ON CONFLICT (setting_key) DO NOTHING
+    """, [
+        (setting_key, json.dumps(setting_value))
+        for setting_key, setting_value in DEFAULT_SETTINGS
+    ], template='(%s, %s::jsonb)')
+
+def _posts_data_criacao_not_null(cur):
+    # A paginação por cursor compara (data_criacao, id): NULL sairia da ordem
+    cur.execute("""
+        UPDATE posts SET data_criacao = COALESCE(data_atualizacao, CURRENT_TIMESTAMP)
+        WHERE data_criacao IS NULL;
+    """)
+    cur.execute("""
+        ALTER TABLE posts ALTER COLUMN data_criacao SET NOT NULL;
+    """)
+
+def _backup_deletions(cur):
+    # Tombstones para os backups incrementais: uma linha por exclusão, com a
+    # mesma referência de tempo (início da transação) das colunas de alteração
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS backup_deletions (
+            id BIGSERIAL PRIMARY KEY,
+            table_name VARCHAR(63) NOT NULL,
+            row_key TEXT NOT NULL,
+            deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_backup_deletions_table_deleted_at 
+        ON backup_deletions (table_name, deleted_at);
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION record_backup_deletion() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO backup_deletions (table_name, row_key) 
+            VALUES (TG_TABLE_NAME, to_jsonb(OLD) ->> TG_ARGV[0]);
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table, key in (('site_content', 'section_id'), ('site_settings', 'setting_key'), ('posts', 'id')):
+        cur.execute(f"""
+            DROP TRIGGER IF EXISTS {table}_backup_deletion ON {table};
+            CREATE TRIGGER {table}_backup_deletion AFTER DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION record_backup_deletion('{key}');
+        """)
+
+def _reviews_dedup_key_python(cur):
+    # Recalcula as chaves com a mesma função da importação (ver review_keys.py)
+    cur.execute("SELECT id, source, author_name, comment, external_id FROM reviews")
+    assignments = assign_dedup_keys(cur.fetchall())
+    cur.execute("UPDATE reviews SET dedup_key = NULL WHERE dedup_key IS NOT NULL")
+    execute_values(cur, """
+        UPDATE reviews r SET dedup_key = v.dedup_key 
+        FROM (VALUES %s) AS v (id, dedup_key) 
+        WHERE r.id = v.id
+    """, assignments, page_size=1000)
+
+# (versão, descrição, função). Nunca altere uma migração já publicada:
+# acrescente uma nova versão no final.
+MIGRATIONS = [
+    (1, 'Tabelas do CMS (posts, site_content, site_settings, reviews)', _create_cms_tables),
+    (2, 'posts: data_atualizacao e índices de paginação/backup', _posts_keyset_and_validators),
+    (3, 'reviews: chave de deduplicação', _reviews_dedup_key),
+    (4, 'Conteúdo e configurações padrão', _seed_defaults),
+    (5, 'posts: data_criacao obrigatória (cursor da listagem)', _posts_data_criacao_not_null),
+    (6, 'backup_deletions: exclusões para os backups incrementais', _backup_deletions),
+    (7, 'reviews: chaves de deduplicação recalculadas em Python', _reviews_dedup_key_python),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# --- EXECUÇÃO ---
+
+def applied_versions(cur):
+    """Versões já aplicadas (conjunto vazio se a tabela de controle não existir)"""
+    cur.execute("SELECT to_regclass('schema_migrations')")
+    if cur.fetchone()[0] is None:
+        return set()
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+def pending_migrations(conn):
+    """Lista as migrações ainda não aplicadas, sem alterar nada"""
+    with conn.cursor() as cur:
+        applied = applied_versions(cur)
+    conn.rollback()
+    return [(version, description) for version, description, _ in MIGRATIONS if version not in applied]
+
+def run_migrations(conn):
+    """Aplica as migrações pendentes; retorna as versões aplicadas nesta chamada"""
+    # Caminho rápido: uma consulta, sem lock, quando está tudo em dia
+    if not pending_migrations(conn):
+        return []
+    
+    applied_now = []
+    try:
+        with conn.cursor() as cur:
+            # O lock é liberado no commit; quem chegar depois espera e
+            # encontra as versões já registradas
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            applied = applied_versions(cur)
+            
+            for version, description, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                migrate(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                applied_now.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    return applied_now
+
+
+if __name__ == '__main__':
+    import psycopg2
+    
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print("DATABASE_URL não configurada")
+        sys.exit(1)
+    
+    conn = psycopg2.connect(database_url)
+    try:
+        versions = run_migrations(conn)
+        if versions:
+            print(f"Migrações aplicadas: {versions}")
+        else:
+            print("Banco de dados já está atualizado.")
+    finally:
+        conn.close()
@@ -0,0 +1,33 @@
+"""
+Chave de deduplicação das avaliações
+Dr. Rodrigo Sguario - Site de Cardiologia
+
+Usada pela importação (app.py) e pelo preenchimento das linhas antigas
+(migrations.py), para que as duas gerem exatamente a mesma chave. A
+normalização fica em Python: o lower() do PostgreSQL depende da collation
+e do locale do banco e pode divergir de str.lower() em textos acentuados.
+"""
+
+import hashlib
+
+
+def review_dedup_key(source, author_name, comment=None, external_id=None):
+    """Chave única da avaliação: fonte + id externo, ou hash de autor e comentário normalizados"""
+    if external_id:
+        raw = f"ext|{source}|{external_id}"
+    else:
+        normalize = lambda text: ' '.join((text or '').split()).lower()
+        raw = f"txt|{source}|{normalize(author_name)}|{normalize(comment)}"
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def assign_dedup_keys(rows):
+    """Chaves das linhas (id, source, author_name, comment, external_id), em ordem de id.
+
+    Retorna [(id, chave)] só para a primeira linha de cada chave; as
+    duplicatas já existentes ficam sem chave (NULL), como na migração 3.
+    """
+    first = {}
+    for review_id, source, author_name, comment, external_id in sorted(rows, key=lambda row: row[0]):
+        first.setdefault(review_dedup_key(source, author_name, comment, external_id), review_id)
+    return [(review_id, key) for key, review_id in first.items()]
@@ -1,5 +1,5 @@
 from src.models.user import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.services.password_hashing import password_hasher
 from datetime import datetime
 import secrets
 
@@ -23,12 +23,19 @@ class Admin(db.Model):
         self.set_password(password)
     
     def set_password(self, password):
-        """Define a senha do administrador com hash"""
-        self.password_hash = generate_password_hash(password)
+        """Define a senha do administrador com hash (no pool de hash; pode levantar PasswordHasherBusy)"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verifica se a senha está correta"""
-        return check_password_hash(self.password_hash, password)
+        """Verifica se a senha está correta (no pool de hash; pode levantar PasswordHasherBusy)"""
+        return password_hasher.verify(self.password_hash, password)
+    
+    def rehash_password_if_needed(self, password):
+        """Regrava o hash se os parâmetros mudaram (chamar após um login válido)"""
+        if password_hasher.needs_rehash(self.password_hash):
+            self.set_password(password)
+            return True
+        return False
     
     def generate_session_token(self):
         """Gera um token de sessão único"""
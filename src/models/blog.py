@@ -1,7 +1,63 @@
 from src.models.user import db
+from src.services.derived_fields import apply_derived_fields, compute_derived_fields
+from src.services.rendering import apply_rendered_fields
+from src.services.tags import sync_post_tags, refresh_post_tag_counts, remove_post_tags
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+import unicodedata
 import re
 
+_SLUG_INVALID_RE = re.compile(r'[^a-z0-9\s-]')
+_SLUG_SEPARATOR_RE = re.compile(r'[-\s]+')
+
+def slugify(text):
+    """Converte um texto em slug ASCII ("Coração Saudável" -> "coracao-saudavel")"""
+    normalized = unicodedata.normalize('NFKD', text or '')
+    ascii_text = normalized.encode('ascii', 'ignore').decode('ascii').lower()
+    slug = _SLUG_INVALID_RE.sub('', ascii_text)
+    return _SLUG_SEPARATOR_RE.sub('-', slug).strip('-')
+
+def parse_tags(tags):
+    """Normaliza tags (texto separado por vírgulas ou lista) em {slug: nome}"""
+    if not tags:
+        return {}
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    parsed = {}
+    for name in tags:
+        name = name.strip()
+        slug = slugify(name)
+        if slug and slug not in parsed:
+            parsed[slug] = name
+    return parsed
+
+def _slug_suffix(slug, base):
+    """Retorna N se `slug` for "base-N", senão None"""
+    suffix = slug[len(base) + 1:]
+    if slug.startswith(base + '-') and suffix.isdigit():
+        return int(suffix)
+    return None
+
+def _numeric_slug_clause(column, base, dialect):
+    """Condição "column é base-N" (N só com dígitos) no dialeto do banco"""
+    # O base só tem [a-z0-9-], que não precisa de escape no regex, no LIKE nem no GLOB
+    if dialect == 'postgresql':
+        # O LIKE de prefixo usa o índice text_pattern_ops (idx_blog_posts_slug_pattern,
+        # criado pelo passo de schema); o regex só filtra as linhas desse intervalo
+        return db.and_(column.like(f'{base}-%'),
+                       column.op('~', is_comparison=True)(f'^{base}-[0-9]+$'))
+    return db.and_(column.op('GLOB', is_comparison=True)(f'{base}-[0-9]*'),
+                   column.op('NOT GLOB', is_comparison=True)(f'{base}-*[^0-9]*'))
+
+# Associação post <-> tag; o índice (tag_id, post_id) atende o filtro ?tag=
+blog_post_tags = db.Table(
+    'blog_post_tags',
+    db.Column('post_id', db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('blog_tags.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_blog_post_tags_tag_post', 'tag_id', 'post_id'),
+)
+
 class BlogPost(db.Model):
     __tablename__ = 'blog_posts'
     
@@ -9,13 +65,19 @@ class BlogPost(db.Model):
     title = db.Column(db.String(200), nullable=False)
     slug = db.Column(db.String(250), unique=True, nullable=False)
     excerpt = db.Column(db.Text)
-    content = db.Column(db.Text, nullable=False)
+    # Colunas de texto longas ficam fora das listagens (undefer onde o post é lido inteiro)
+    content = db.deferred(db.Column(db.Text, nullable=False))
     category = db.Column(db.String(100), nullable=False)
     tags = db.Column(db.String(500))  # Tags separadas por vírgula
     featured_image = db.Column(db.String(500))
     is_published = db.Column(db.Boolean, default=False)
     is_featured = db.Column(db.Boolean, default=False)
     read_time = db.Column(db.Integer, default=5)  # Tempo de leitura em minutos
+    plain_text = db.deferred(db.Column(db.Text))  # Conteúdo sem HTML (derivado, ver derived_fields)
+    word_count = db.Column(db.Integer)
+    rendered_html = db.deferred(db.Column(db.Text))  # HTML seguro com âncoras (ver src/services/rendering.py)
+    toc = db.deferred(db.Column(db.Text))  # Sumário em JSON
+    render_hash = db.Column(db.String(64))  # Hash do conteúdo renderizado
     views = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -29,59 +91,77 @@ class BlogPost(db.Model):
         self.content = content
         self.category = category
         self.author_id = author_id
-        self.excerpt = excerpt or self.generate_excerpt()
+        self.excerpt = excerpt
         self.tags = tags
         self.slug = self.generate_slug()
-        self.read_time = self.calculate_read_time()
+        apply_derived_fields(self)
     
     def generate_slug(self):
-        """Gera um slug único baseado no título"""
-        # Remove acentos e caracteres especiais
-        slug = re.sub(r'[^\w\s-]', '', self.title.lower())
-        slug = re.sub(r'[-\s]+', '-', slug)
+        """Gera um slug único baseado no título.
+
+        Uma única consulta traz o slug base (se existir) e o "base-N" de maior
+        sufixo; o novo slug usa N + 1. Só entram sufixos numéricos: slugs mais
+        longos com o mesmo prefixo ("base-saudavel") não contam. Se um insert
+        concorrente pegar o mesmo slug, `save_with_unique_slug` (ou
+        `update_slug`) tenta de novo.
+        """
+        slug = slugify(self.title) or 'post'
+        
+        # O post mantém o próprio slug se o título gerar o mesmo base
+        if self.id is not None and self.slug and (self.slug == slug or _slug_suffix(self.slug, slug) is not None):
+            return self.slug
         
-        # Verifica se já existe um slug igual
-        existing = BlogPost.query.filter_by(slug=slug).first()
-        if existing and existing.id != self.id:
-            counter = 1
-            while BlogPost.query.filter_by(slug=f"{slug}-{counter}").first():
-                counter += 1
-            slug = f"{slug}-{counter}"
+        dialect = db.session.get_bind().dialect.name
+        with db.session.no_autoflush:
+            rows = db.session.query(BlogPost.slug).filter(db.or_(
+                BlogPost.slug == slug,
+                _numeric_slug_clause(BlogPost.slug, slug, dialect)
+            )).order_by(
+                db.case((BlogPost.slug == slug, 0), else_=1),
+                db.func.length(BlogPost.slug).desc(),
+                BlogPost.slug.desc()
+            ).limit(2).all()
         
-        return slug
+        if not rows or rows[0].slug != slug:
+            return slug
+        
+        suffix = _slug_suffix(rows[1].slug, slug) if len(rows) > 1 else 0
+        return f"{slug}-{suffix + 1}"
+    
+    def save_with_unique_slug(self, attempts=3):
+        """Insere o post, gerando outro slug se um insert concorrente usar o mesmo"""
+        for attempt in range(attempts):
+            try:
+                with db.session.begin_nested():
+                    db.session.add(self)
+                    db.session.flush()
+                return
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
+                self.slug = self.generate_slug()
+    
+    def update_slug(self, attempts=3):
+        """Regenera o slug de um post existente (título alterado), tentando de novo em colisão"""
+        # As demais alterações vão antes, fora do savepoint: um rollback dele só desfaz o slug
+        db.session.flush()
+        for attempt in range(attempts):
+            try:
+                with db.session.begin_nested():
+                    self.slug = self.generate_slug()
+                    db.session.flush()
+                return
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
     
     def generate_excerpt(self):
         """Gera um resumo automático do conteúdo"""
-        if not self.content:
-            return ""
-        
-        # Remove tags HTML se houver
-        clean_content = re.sub(r'<[^>]+>', '', self.content)
-        
-        # Pega os primeiros 200 caracteres
-        if len(clean_content) <= 200:
-            return clean_content
-        
-        # Corta no último espaço antes de 200 caracteres
-        excerpt = clean_content[:200]
-        last_space = excerpt.rfind(' ')
-        if last_space > 0:
-            excerpt = excerpt[:last_space]
-        
-        return excerpt + "..."
+        return compute_derived_fields(self.content)['excerpt']
     
     def calculate_read_time(self):
         """Calcula o tempo de leitura baseado no conteúdo"""
-        if not self.content:
-            return 1
-        
-        # Remove tags HTML
-        clean_content = re.sub(r'<[^>]+>', '', self.content)
-        word_count = len(clean_content.split())
-        
-        # Assume 200 palavras por minuto
-        read_time = max(1, round(word_count / 200))
-        return read_time
+        return compute_derived_fields(self.content)['read_time']
     
     def publish(self):
         """Publica o post"""
@@ -94,7 +174,10 @@ class BlogPost(db.Model):
         self.published_at = None
     
     def increment_views(self):
-        """Incrementa o contador de visualizações"""
+        """Incrementa o contador de visualizações.
+
+        A rota pública usa `src.services.view_counter`, que grava em lote.
+        """
         self.views += 1
     
     def get_tags_list(self):
@@ -123,6 +206,7 @@ class BlogPost(db.Model):
             'is_published': self.is_published,
             'is_featured': self.is_featured,
             'read_time': self.read_time,
+            'word_count': self.word_count,
             'views': self.views,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
@@ -156,21 +240,113 @@ class BlogPost(db.Model):
                            .limit(limit).all()
     
     @staticmethod
-    def search_posts(query_text):
-        """Busca posts por título ou conteúdo"""
-        search_term = f"%{query_text}%"
-        return BlogPost.query.filter_by(is_published=True)\
-                           .filter(db.or_(
-                               BlogPost.title.like(search_term),
-                               BlogPost.content.like(search_term),
-                               BlogPost.excerpt.like(search_term)
-                           ))\
-                           .order_by(BlogPost.published_at.desc()).all()
+    def search_posts(query_text, limit=50):
+        """Busca posts publicados por relevância (índice de texto completo)"""
+        from src.services.search import search_posts
+        return search_posts(query_text, per_page=limit).items
     
     def __repr__(self):
         return f'<BlogPost {self.title}>'
 
 
+@event.listens_for(BlogPost, 'before_insert')
+def _derived_fields_before_insert(mapper, connection, post):
+    if post.plain_text is None:
+        apply_derived_fields(post)
+
+
+@event.listens_for(BlogPost, 'before_update')
+def _derived_fields_before_update(mapper, connection, post):
+    """Recalcula os campos derivados sempre que o conteúdo ou o resumo mudam"""
+    state = inspect(post)
+    # word_count (não adiado) indica se o post já tem os campos derivados, sem carregar plain_text
+    if (state.attrs.content.history.has_changes() or state.attrs.excerpt.history.has_changes()
+            or post.word_count is None):
+        # plain_text ainda é o do conteúdo anterior: serve para saber se o resumo era automático
+        apply_derived_fields(post, previous_plain_text=post.plain_text)
+
+
+@event.listens_for(BlogPost, 'before_insert')
+def _render_before_insert(mapper, connection, post):
+    apply_rendered_fields(post)
+
+
+@event.listens_for(BlogPost, 'before_update')
+def _render_before_update(mapper, connection, post):
+    """Renderiza de novo só quando o conteúdo muda (ou o post ainda não foi renderizado)"""
+    if inspect(post).attrs.content.history.has_changes() or post.render_hash is None:
+        apply_rendered_fields(post)
+
+
+@event.listens_for(BlogPost, 'after_insert')
+def _tags_after_insert(mapper, connection, post):
+    if post.tags:
+        sync_post_tags(connection, post.id, parse_tags(post.tags))
+
+
+@event.listens_for(BlogPost, 'after_update')
+def _tags_after_update(mapper, connection, post):
+    """Mantém blog_post_tags e as contagens por tag na mesma transação"""
+    state = inspect(post)
+    if state.attrs.tags.history.has_changes():
+        sync_post_tags(connection, post.id, parse_tags(post.tags))
+    elif state.attrs.is_published.history.has_changes():
+        refresh_post_tag_counts(connection, post.id)
+
+
+@event.listens_for(BlogPost, 'before_delete')
+def _tags_before_delete(mapper, connection, post):
+    remove_post_tags(connection, post.id)
+
+
+class BlogTag(db.Model):
+    __tablename__ = 'blog_tags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    slug = db.Column(db.String(120), unique=True, nullable=False)
+    post_count = db.Column(db.Integer, default=0, nullable=False)  # Posts publicados com a tag
+    
+    def to_dict(self):
+        """Converte o objeto para dicionário"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'slug': self.slug,
+            'post_count': self.post_count
+        }
+    
+    def __repr__(self):
+        return f'<BlogTag {self.name}>'
+
+
+class BlogRelatedPost(db.Model):
+    """Vizinhos pré-calculados de cada post (ver src/services/related_posts.py)"""
+    __tablename__ = 'blog_related_posts'
+    
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    related_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'),
+                           nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<BlogRelatedPost {self.post_id} #{self.rank} -> {self.related_id}>'
+
+
+class BlogSnapshot(db.Model):
+    """Listas de posts já serializadas (ver src/services/post_snapshot.py)"""
+    __tablename__ = 'blog_snapshots'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    version = db.Column(db.String(32), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BlogSnapshot {self.name} {self.version}>'
+
+
 class BlogCategory(db.Model):
     __tablename__ = 'blog_categories'
     
@@ -190,9 +366,7 @@ class BlogCategory(db.Model):
     
     def generate_slug(self):
         """Gera um slug baseado no nome"""
-        slug = re.sub(r'[^\w\s-]', '', self.name.lower())
-        slug = re.sub(r'[-\s]+', '-', slug)
-        return slug
+        return slugify(self.name)
     
     def to_dict(self):
         """Converte o objeto para dicionário"""
@@ -1,24 +1,39 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, g
 from werkzeug.security import check_password_hash
 from src.models.admin import Admin, db
 from src.models.blog import BlogPost, BlogCategory
+from src.services.dashboard import get_dashboard_stats as dashboard_stats
+from src.services.admin_sessions import authenticate, forget_principal, issue_token, request_token
+from src.services.password_hashing import PasswordHasherBusy
 from datetime import datetime
 import functools
 
 admin_bp = Blueprint('admin', __name__)
 
+def _busy_response():
+    """Pool de hash de senhas saturado: falha rápido em vez de enfileirar"""
+    response = jsonify({'error': 'Servidor ocupado, tente novamente em instantes'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 def login_required(f):
-    """Decorator para verificar se o usuário está logado"""
+    """Decorator para verificar se o usuário está logado.
+
+    O token assinado é validado localmente e o admin vem do cache de
+    principals; os handlers o leem de `g.admin`.
+    """
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'admin_id' not in session:
+        token = request_token()
+        if not token:
             return jsonify({'error': 'Login necessário'}), 401
         
-        admin = Admin.query.get(session['admin_id'])
-        if not admin or not admin.is_active:
+        admin = authenticate(token)
+        if admin is None:
             session.clear()
             return jsonify({'error': 'Usuário inválido'}), 401
         
+        g.admin = admin
         return f(*args, **kwargs)
     return decorated_function
 
@@ -43,15 +58,20 @@ def login():
         if not admin.is_active:
             return jsonify({'error': 'Conta desativada'}), 401
         
-        # Atualiza último login e gera token de sessão
+        # Parâmetros de hash antigos: regrava com os atuais
+        admin.rehash_password_if_needed(password)
+        
+        # Atualiza último login; o session_token só é gerado se não houver um
+        # (trocá-lo a cada login derrubaria as sessões dos outros dispositivos)
         admin.update_last_login()
-        session_token = admin.generate_session_token()
+        if not admin.session_token:
+            admin.generate_session_token()
+        db.session.commit()
         
-        # Salva na sessão
+        # Token assinado com expiração (também aceito em Authorization: Bearer)
+        session_token = issue_token(admin)
         session['admin_id'] = admin.id
-        session['session_token'] = session_token
-        
-        db.session.commit()
+        session['admin_token'] = session_token
         
         return jsonify({
             'message': 'Login realizado com sucesso',
@@ -59,6 +79,8 @@ def login():
             'session_token': session_token
         }), 200
         
+    except PasswordHasherBusy:
+        return _busy_response()
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
@@ -67,10 +89,10 @@ def login():
 def logout():
     """Endpoint de logout"""
     try:
-        admin = Admin.query.get(session['admin_id'])
-        if admin:
-            admin.session_token = None
-            db.session.commit()
+        # Sem session_token, os tokens já emitidos deixam de valer
+        Admin.query.filter_by(id=g.admin.id).update({'session_token': None})
+        db.session.commit()
+        forget_principal(g.admin.id)
         
         session.clear()
         
@@ -84,8 +106,7 @@ def logout():
 def get_profile():
     """Retorna o perfil do administrador logado"""
     try:
-        admin = Admin.query.get(session['admin_id'])
-        return jsonify({'admin': admin.to_dict()}), 200
+        return jsonify({'admin': g.admin.to_dict()}), 200
         
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
@@ -96,7 +117,7 @@ def update_profile():
     """Atualiza o perfil do administrador"""
     try:
         data = request.get_json()
-        admin = Admin.query.get(session['admin_id'])
+        admin = Admin.query.get(g.admin.id)
         
         # Campos que podem ser atualizados
         if 'full_name' in data:
@@ -110,6 +131,7 @@ def update_profile():
             admin.email = data['email']
         
         db.session.commit()
+        forget_principal(admin.id)
         
         return jsonify({
             'message': 'Perfil atualizado com sucesso',
@@ -129,7 +151,7 @@ def change_password():
         if not data or not data.get('current_password') or not data.get('new_password'):
             return jsonify({'error': 'Senha atual e nova senha são obrigatórias'}), 400
         
-        admin = Admin.query.get(session['admin_id'])
+        admin = Admin.query.get(g.admin.id)
         
         # Verifica a senha atual
         if not admin.check_password(data['current_password']):
@@ -140,12 +162,22 @@ def change_password():
         if len(new_password) < 6:
             return jsonify({'error': 'Nova senha deve ter pelo menos 6 caracteres'}), 400
         
-        # Atualiza a senha
+        # Atualiza a senha e encerra as outras sessões (novo session_token)
         admin.set_password(new_password)
+        admin.generate_session_token()
         db.session.commit()
+        forget_principal(admin.id)
+        
+        session_token = issue_token(admin)
+        session['admin_token'] = session_token
         
-        return jsonify({'message': 'Senha alterada com sucesso'}), 200
+        return jsonify({
+            'message': 'Senha alterada com sucesso',
+            'session_token': session_token
+        }), 200
         
+    except PasswordHasherBusy:
+        return _busy_response()
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
@@ -154,33 +186,8 @@ def change_password():
 def get_dashboard_stats():
     """Retorna estatísticas para o dashboard"""
     try:
-        # Estatísticas do blog
-        total_posts = BlogPost.query.count()
-        published_posts = BlogPost.query.filter_by(is_published=True).count()
-        draft_posts = total_posts - published_posts
-        
-        # Posts mais visualizados
-        popular_posts = BlogPost.query.filter_by(is_published=True)\
-                                      .order_by(BlogPost.views.desc())\
-                                      .limit(5).all()
-        
-        # Posts recentes
-        recent_posts = BlogPost.query.order_by(BlogPost.created_at.desc())\
-                                     .limit(5).all()
-        
-        # Total de visualizações
-        total_views = db.session.query(db.func.sum(BlogPost.views)).scalar() or 0
-        
-        stats = {
-            'blog': {
-                'total_posts': total_posts,
-                'published_posts': published_posts,
-                'draft_posts': draft_posts,
-                'total_views': total_views
-            },
-            'popular_posts': [post.to_dict() for post in popular_posts],
-            'recent_posts': [post.to_dict() for post in recent_posts]
-        }
+        # Totais e listas top-5 em uma consulta, com cache invalidado nas escritas
+        stats = dashboard_stats()
         
         return jsonify(stats), 200
         
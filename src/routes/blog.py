@@ -1,7 +1,14 @@
-from flask import Blueprint, request, jsonify, session
-from src.models.blog import BlogPost, BlogCategory, db
+from flask import Blueprint, Response, request, jsonify, g
+from src.models.blog import BlogPost, BlogCategory, BlogTag, BlogRelatedPost, db
 from src.models.admin import Admin
 from src.routes.admin import login_required
+from src.services.search import search_posts
+from src.services.tags import filter_by_tag
+from src.services.post_counts import paginate, count_mode_from, pagination_dict
+from src.services.related_posts import RELATED_POSTS_K
+from src.services.view_counter import view_counter
+from src.services.post_snapshot import post_snapshot, SNAPSHOT_SIZE
+from src.services.rendering import rendered_for
 from datetime import datetime
 
 blog_bp = Blueprint('blog', __name__)
@@ -16,39 +23,42 @@ def get_posts():
         per_page = request.args.get('per_page', 10, type=int)
         category = request.args.get('category')
         search = request.args.get('search')
+        tag = request.args.get('tag')  # slug da tag
+        count_mode = count_mode_from(request.args)
         
-        query = BlogPost.query.filter_by(is_published=True)
-        
-        if category:
-            query = query.filter_by(category=category)
+        # Primeira página (home e páginas de categoria) sai pronta do snapshot
+        if not search and not tag and page == 1 and 0 < per_page <= SNAPSHOT_SIZE and count_mode == 'exact':
+            return Response(post_snapshot.latest_response_body(per_page, category=category),
+                            status=200, mimetype='application/json')
         
         if search:
-            search_term = f"%{search}%"
-            query = query.filter(db.or_(
-                BlogPost.title.like(search_term),
-                BlogPost.content.like(search_term),
-                BlogPost.excerpt.like(search_term)
-            ))
-        
-        query = query.order_by(BlogPost.published_at.desc())
-        
-        # Paginação
-        posts = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+            # Busca textual ordenada por relevância, com trechos destacados
+            posts = search_posts(search, category=category, page=page, per_page=per_page, tag=tag)
+            posts_list = []
+            for post in posts.items:
+                post_data = post.to_dict()
+                post_data['highlight'] = posts.highlights.get(post.id)
+                posts_list.append(post_data)
+        else:
+            query = BlogPost.query.filter_by(is_published=True)
+            
+            if category:
+                query = query.filter_by(category=category)
+            
+            if tag:
+                query = filter_by_tag(query, tag)
+            
+            query = query.order_by(BlogPost.published_at.desc())
+            
+            # Paginação com contagem em cache (ou estimada / só has_next)
+            posts = paginate(query, page, per_page,
+                             key=('public', category, tag),
+                             count_mode=count_mode)
+            posts_list = [post.to_dict() for post in posts.items]
         
         return jsonify({
-            'posts': [post.to_dict() for post in posts.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': posts.total,
-                'pages': posts.pages,
-                'has_next': posts.has_next,
-                'has_prev': posts.has_prev
-            }
+            'posts': posts_list,
+            'pagination': pagination_dict(posts)
         }), 200
         
     except Exception as e:
@@ -58,16 +68,47 @@ def get_posts():
 def get_post_by_slug(slug):
     """Retorna um post específico pelo slug"""
     try:
-        post = BlogPost.query.filter_by(slug=slug, is_published=True).first()
+        # ?format=rendered devolve o HTML já limpo, com âncoras e sumário
+        rendered_format = request.args.get('format') == 'rendered'
+        columns = (BlogPost.content, BlogPost.rendered_html, BlogPost.toc) if rendered_format else (BlogPost.content,)
+        post = BlogPost.query.options(*(db.undefer(column) for column in columns))\
+                             .filter_by(slug=slug, is_published=True).first()
         
         if not post:
             return jsonify({'error': 'Post não encontrado'}), 404
         
-        # Incrementa visualizações
-        post.increment_views()
-        db.session.commit()
+        # Visualização gravada depois, em lote (a leitura não abre transação de escrita)
+        view_counter.increment(post.id)
         
-        return jsonify({'post': post.to_dict(include_content=True)}), 200
+        if rendered_format:
+            post_data = post.to_dict()
+            rendered = rendered_for(post)
+            post_data['content_html'] = rendered['html']
+            post_data['toc'] = rendered['toc']
+        else:
+            post_data = post.to_dict(include_content=True)
+        post_data['views'] = (post.views or 0) + view_counter.pending(post.id)
+        
+        return jsonify({'post': post_data}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
+@blog_bp.route('/posts/<slug>/related', methods=['GET'])
+def get_related_posts(slug):
+    """Retorna os posts relacionados, lidos da tabela pré-calculada"""
+    try:
+        limit = min(request.args.get('limit', RELATED_POSTS_K, type=int), RELATED_POSTS_K)
+        
+        source_id = db.session.query(BlogPost.id).filter_by(slug=slug, is_published=True).scalar_subquery()
+        posts = BlogPost.query.join(BlogRelatedPost, BlogRelatedPost.related_id == BlogPost.id)\
+                              .filter(BlogRelatedPost.post_id == source_id, BlogPost.is_published.is_(True))\
+                              .order_by(BlogRelatedPost.rank)\
+                              .limit(limit).all()
+        
+        return jsonify({
+            'posts': [post.to_dict() for post in posts]
+        }), 200
         
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
@@ -77,6 +118,11 @@ def get_featured_posts():
     """Retorna posts em destaque"""
     try:
         limit = request.args.get('limit', 3, type=int)
+        
+        if 0 < limit <= SNAPSHOT_SIZE:
+            return Response(post_snapshot.featured_response_body(limit),
+                            status=200, mimetype='application/json')
+        
         posts = BlogPost.get_featured_posts(limit=limit)
         
         return jsonify({
@@ -86,6 +132,20 @@ def get_featured_posts():
     except Exception as e:
         return jsonify({'error': f'Erro interno: {str(e)}'}), 500
 
+@blog_bp.route('/tags', methods=['GET'])
+def get_tags():
+    """Retorna as tags com a quantidade de posts publicados"""
+    try:
+        tags = BlogTag.query.filter(BlogTag.post_count > 0)\
+                            .order_by(BlogTag.post_count.desc(), BlogTag.name).all()
+        
+        return jsonify({
+            'tags': [tag.to_dict() for tag in tags]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+
 @blog_bp.route('/categories', methods=['GET'])
 def get_categories():
     """Retorna todas as categorias"""
@@ -119,22 +179,13 @@ def admin_get_posts():
         
         query = query.order_by(BlogPost.created_at.desc())
         
-        posts = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        posts = paginate(query, page, per_page,
+                         key=('admin', status if status in ('published', 'draft') else 'all'),
+                         count_mode=count_mode_from(request.args))
         
         return jsonify({
             'posts': [post.to_dict() for post in posts.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': posts.total,
-                'pages': posts.pages,
-                'has_next': posts.has_next,
-                'has_prev': posts.has_prev
-            }
+            'pagination': pagination_dict(posts)
         }), 200
         
     except Exception as e:
@@ -154,11 +205,16 @@ def admin_create_post():
             title=data['title'],
             content=data['content'],
             category=data.get('category', 'Geral'),
-            author_id=session['admin_id'],
-            excerpt=data.get('excerpt'),
-            tags=data.get('tags')
+            author_id=g.admin.id,
+            excerpt=data.get('excerpt')
         )
         
+        # Aceita tags como texto separado por vírgulas ou lista
+        if isinstance(data.get('tags'), list):
+            post.set_tags_from_list(data['tags'])
+        else:
+            post.tags = data.get('tags')
+        
         if data.get('featured_image'):
             post.featured_image = data['featured_image']
         
@@ -169,7 +225,7 @@ def admin_create_post():
         if data.get('publish', False):
             post.publish()
         
-        db.session.add(post)
+        post.save_with_unique_slug()
         db.session.commit()
         
         return jsonify({
@@ -185,7 +241,7 @@ def admin_create_post():
 def admin_get_post(post_id):
     """Retorna um post específico para edição"""
     try:
-        post = BlogPost.query.get(post_id)
+        post = db.session.get(BlogPost, post_id, options=[db.undefer(BlogPost.content)])
         
         if not post:
             return jsonify({'error': 'Post não encontrado'}), 404
@@ -210,11 +266,9 @@ def admin_update_post(post_id):
         # Atualiza campos
         if 'title' in data:
             post.title = data['title']
-            post.slug = post.generate_slug()  # Regenera slug se título mudou
         
         if 'content' in data:
-            post.content = data['content']
-            post.read_time = post.calculate_read_time()
+            post.content = data['content']  # Campos derivados recalculados no flush
         
         if 'excerpt' in data:
             post.excerpt = data['excerpt']
@@ -223,7 +277,10 @@ def admin_update_post(post_id):
             post.category = data['category']
         
         if 'tags' in data:
-            post.tags = data['tags']
+            if isinstance(data['tags'], list):
+                post.set_tags_from_list(data['tags'])
+            else:
+                post.tags = data['tags']
         
         if 'featured_image' in data:
             post.featured_image = data['featured_image']
@@ -233,6 +290,8 @@ def admin_update_post(post_id):
         
         post.updated_at = datetime.utcnow()
         
+        if 'title' in data:
+            post.update_slug()  # Regenera slug se título mudou
         db.session.commit()
         
         return jsonify({
@@ -1,7 +1,9 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 from ..models.settings import SiteSettings, WhatsAppConfig, PageContent, ColorTheme
+from ..services.settings_snapshot import SettingsStore
+import os
 import json
 
 settings_bp = Blueprint('settings', __name__)
@@ -10,6 +12,19 @@ settings_bp = Blueprint('settings', __name__)
 engine = create_engine('sqlite:///site_data.db')
 Session = sessionmaker(bind=engine)
 
+# Leituras servidas do snapshot em memória; os POSTs o reconstroem
+settings_store = SettingsStore(Session)
+
+def snapshot_response(body):
+    return Response(body, mimetype='application/json')
+
+def reload_settings():
+    """Reconstrói o snapshot depois de um commit; uma falha aqui não desfaz o que já foi salvo"""
+    try:
+        settings_store.reload()
+    except Exception as e:
+        print(f"Erro ao recarregar as configurações: {e}")
+
 def require_auth():
     if 'admin_logged_in' not in session:
         return jsonify({'error': 'Não autorizado'}), 401
@@ -17,18 +32,8 @@ def require_auth():
 
 @settings_bp.route('/api/settings/whatsapp', methods=['GET'])
 def get_whatsapp_config():
-    db_session = Session()
-    try:
-        config = db_session.query(WhatsAppConfig).first()
-        if not config:
-            # Criar configuração padrão
-            config = WhatsAppConfig()
-            db_session.add(config)
-            db_session.commit()
-        
-        return jsonify(config.to_dict())
-    finally:
-        db_session.close()
+    # Sem linha gravada, devolve os valores padrão (a leitura não insere nada)
+    return snapshot_response(settings_store.current().responses['whatsapp'])
 
 @settings_bp.route('/api/settings/whatsapp', methods=['POST'])
 def update_whatsapp_config():
@@ -66,6 +71,7 @@ def update_whatsapp_config():
             config.widget_color = data['widget_color']
         
         db_session.commit()
+        reload_settings()
         return jsonify({'success': True, 'config': config.to_dict()})
     except Exception as e:
         db_session.rollback()
@@ -75,18 +81,8 @@ def update_whatsapp_config():
 
 @settings_bp.route('/api/settings/page-content', methods=['GET'])
 def get_page_content():
-    db_session = Session()
-    try:
-        page = request.args.get('page', 'all')
-        
-        if page == 'all':
-            contents = db_session.query(PageContent).all()
-        else:
-            contents = db_session.query(PageContent).filter_by(page_name=page).all()
-        
-        return jsonify([content.to_dict() for content in contents])
-    finally:
-        db_session.close()
+    page = request.args.get('page', 'all')
+    return snapshot_response(settings_store.current().page_content_body(page))
 
 @settings_bp.route('/api/settings/page-content', methods=['POST'])
 def update_page_content():
@@ -116,6 +112,7 @@ def update_page_content():
         content.is_active = data.get('is_active', True)
         
         db_session.commit()
+        reload_settings()
         return jsonify({'success': True, 'content': content.to_dict()})
     except Exception as e:
         db_session.rollback()
@@ -125,17 +122,7 @@ def update_page_content():
 
 @settings_bp.route('/api/settings/colors', methods=['GET'])
 def get_color_themes():
-    db_session = Session()
-    try:
-        themes = db_session.query(ColorTheme).all()
-        active_theme = db_session.query(ColorTheme).filter_by(is_active=True).first()
-        
-        return jsonify({
-            'themes': [theme.to_dict() for theme in themes],
-            'active_theme': active_theme.to_dict() if active_theme else None
-        })
-    finally:
-        db_session.close()
+    return snapshot_response(settings_store.current().responses['colors'])
 
 @settings_bp.route('/api/settings/colors', methods=['POST'])
 def create_color_theme():
@@ -157,6 +144,7 @@ def create_color_theme():
             if theme:
                 theme.is_active = True
                 db_session.commit()
+                reload_settings()
                 return jsonify({'success': True, 'active_theme': theme.to_dict()})
             else:
                 return jsonify({'error': 'Tema não encontrado'}), 404
@@ -178,6 +166,7 @@ def create_color_theme():
         
         db_session.add(theme)
         db_session.commit()
+        reload_settings()
         
         return jsonify({'success': True, 'theme': theme.to_dict()})
     except Exception as e:
@@ -188,25 +177,7 @@ def create_color_theme():
 
 @settings_bp.route('/api/settings/general', methods=['GET'])
 def get_general_settings():
-    db_session = Session()
-    try:
-        settings = db_session.query(SiteSettings).all()
-        settings_dict = {}
-        
-        for setting in settings:
-            if setting.setting_type == 'json':
-                try:
-                    settings_dict[setting.setting_key] = json.loads(setting.setting_value)
-                except:
-                    settings_dict[setting.setting_key] = setting.setting_value
-            elif setting.setting_type == 'boolean':
-                settings_dict[setting.setting_key] = setting.setting_value.lower() == 'true'
-            else:
-                settings_dict[setting.setting_key] = setting.setting_value
-        
-        return jsonify(settings_dict)
-    finally:
-        db_session.close()
+    return snapshot_response(settings_store.current().responses['general'])
 
 @settings_bp.route('/api/settings/general', methods=['POST'])
 def update_general_settings():
@@ -237,6 +208,7 @@ def update_general_settings():
                 setting.setting_value = str(value)
         
         db_session.commit()
+        reload_settings()
         return jsonify({'success': True})
     except Exception as e:
         db_session.rollback()
@@ -244,37 +216,29 @@ def update_general_settings():
     finally:
         db_session.close()
 
-# Rota para gerar URL do WhatsApp
+# Links do WhatsApp: tabela pré-calculada no snapshot (reconstruída ao salvar a configuração)
+WHATSAPP_URL_MAX_AGE = int(os.environ.get('WHATSAPP_URL_MAX_AGE', 300))
+
+def cacheable_response(body):
+    """Resposta pública com ETag, para o CDN e o navegador reaproveitarem"""
+    response = snapshot_response(body)
+    response.cache_control.public = True
+    response.cache_control.max_age = WHATSAPP_URL_MAX_AGE
+    response.add_etag()
+    return response.make_conditional(request)
+
+@settings_bp.route('/api/whatsapp-url', methods=['GET'])
+def get_whatsapp_url():
+    service_type = request.args.get('service_type', 'general')
+    return cacheable_response(settings_store.current().whatsapp_url_body(service_type))
+
+@settings_bp.route('/api/whatsapp-urls', methods=['GET'])
+def get_whatsapp_urls():
+    """Todos os links de uma vez, para o frontend pré-carregar"""
+    return cacheable_response(settings_store.current().responses['whatsapp-urls'])
+
 @settings_bp.route('/api/whatsapp-url', methods=['POST'])
 def generate_whatsapp_url():
-    db_session = Session()
-    try:
-        data = request.get_json()
-        service_type = data.get('service_type', 'general')
-        
-        config = db_session.query(WhatsAppConfig).first()
-        if not config:
-            config = WhatsAppConfig()
-        
-        # Selecionar mensagem baseada no tipo de serviço
-        message_map = {
-            'transplant': config.transplant_message,
-            'heart_failure': config.heart_failure_message,
-            'preventive': config.preventive_message,
-            'echo': config.echo_message,
-            'general': config.welcome_message
-        }
-        
-        message = message_map.get(service_type, config.welcome_message)
-        
-        # Gerar URL do WhatsApp
-        whatsapp_url = f"https://wa.me/{config.phone_number}?text={message}"
-        
-        return jsonify({
-            'url': whatsapp_url,
-            'phone': config.phone_number,
-            'message': message
-        })
-    finally:
-        db_session.close()
-
+    data = request.get_json(silent=True) or {}
+    service_type = data.get('service_type', 'general')
+    return snapshot_response(settings_store.current().whatsapp_url_body(service_type))
@@ -0,0 +1,140 @@
+"""
+Sessões administrativas sem estado: token assinado com expiração
+
+O token (itsdangerous, assinado com a SECRET_KEY) carrega o id do admin e
+uma impressão do `session_token` gravado no login. A assinatura e a
+validade são conferidas localmente; o admin vem de um LRU com TTL curto,
+então uma requisição autenticada não consulta o banco quando o admin já
+está em cache.
+
+Logout, troca de senha e edição de perfil removem o admin do cache do
+worker atual; nos demais o TTL (ADMIN_PRINCIPAL_TTL) limita a defasagem.
+Logout e troca de senha também trocam o `session_token`, o que invalida
+os tokens emitidos antes (em todos os dispositivos). O login reaproveita o
+`session_token` existente. Um token com impressão diferente da do cache
+só faz o admin ser relido do banco se foi emitido depois que o cache foi
+carregado (outro worker gravou um session_token novo); tokens antigos,
+revogados, são recusados sem consulta e sem mexer no cache.
+
+O token vem do cabeçalho `Authorization: Bearer <token>` ou da sessão do
+Flask (gravada no login).
+"""
+
+import os
+import time
+import hashlib
+
+from flask import current_app, request, session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from src.services.content_cache import TTLCache
+from src.models.admin import Admin
+
+SESSION_MAX_AGE = int(os.environ.get('ADMIN_SESSION_MAX_AGE', 8 * 3600))
+SESSION_SALT = 'admin-session'
+
+principal_cache = TTLCache(
+    ttl=float(os.environ.get('ADMIN_PRINCIPAL_TTL', 60)),
+    max_entries=int(os.environ.get('ADMIN_PRINCIPAL_MAX_ENTRIES', 64)),
+)
+
+
+class AdminPrincipal:
+    """Cópia somente leitura dos dados do admin autenticado (fica em g.admin)"""
+
+    __slots__ = ('id', 'username', 'email', 'full_name', 'is_active', 'created_at', 'last_login',
+                 'session_id', 'loaded_at')
+
+    def __init__(self, admin):
+        for field in self.__slots__[:-2]:
+            object.__setattr__(self, field, getattr(admin, field))
+        object.__setattr__(self, 'session_id', session_id_for(admin.session_token))
+        object.__setattr__(self, 'loaded_at', time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError('AdminPrincipal é somente leitura')
+
+    def to_dict(self):
+        """Mesmo formato de Admin.to_dict()"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'full_name': self.full_name,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_login': self.last_login.isoformat() if self.last_login else None
+        }
+
+
+def session_id_for(session_token):
+    """Impressão curta do session_token (o token em si não vai para o cliente assinado)"""
+    if not session_token:
+        return None
+    return hashlib.sha256(session_token.encode('utf-8')).hexdigest()[:16]
+
+
+def _serializer():
+    secret_key = current_app.secret_key or os.environ.get('SECRET_KEY')
+    if not secret_key:
+        raise RuntimeError('SECRET_KEY não configurada')
+    return URLSafeTimedSerializer(secret_key, salt=SESSION_SALT)
+
+
+def issue_token(admin):
+    """Emite o token assinado de um admin que acabou de autenticar"""
+    remember_principal(admin)
+    return _serializer().dumps({'id': admin.id, 'sid': session_id_for(admin.session_token)})
+
+
+def remember_principal(admin):
+    principal = AdminPrincipal(admin)
+    principal_cache.set(('admin', admin.id), principal)
+    return principal
+
+
+def forget_principal(admin_id):
+    principal_cache.delete(('admin', admin_id))
+
+
+def load_principal(admin_id):
+    """Admin do cache; só consulta o banco quando ele não está lá"""
+    principal = principal_cache.get(('admin', admin_id))
+    if principal is None:
+        admin = Admin.query.get(admin_id)
+        if admin is None:
+            return None
+        principal = remember_principal(admin)
+    return principal
+
+
+def request_token():
+    """Token da requisição: cabeçalho Authorization ou sessão do Flask"""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip() or None
+    return session.get('admin_token')
+
+
+def authenticate(token):
+    """Valida o token e devolve o AdminPrincipal (ou None se inválido/expirado)"""
+    if not token:
+        return None
+    try:
+        payload, issued_at = _serializer().loads(token, max_age=SESSION_MAX_AGE, return_timestamp=True)
+    except BadSignature:  # inclui SignatureExpired
+        return None
+
+    admin_id = payload.get('id')
+    principal = load_principal(admin_id)
+    if (principal is not None and principal.session_id != payload.get('sid')
+            and principal.loaded_at < issued_at.timestamp() + 1):
+        # Cache anterior ao token (novo session_token gravado em outro worker).
+        # O timestamp do token é truncado para segundos, daí a folga de 1s
+        forget_principal(admin_id)
+        principal = load_principal(admin_id)
+    if principal is None or not principal.is_active:
+        return None
+    if principal.session_id is None or principal.session_id != payload.get('sid'):
+        return None
+    return principal
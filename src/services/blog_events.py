@@ -0,0 +1,69 @@
+"""
+Notificação de escritas em posts do blog, depois do commit
+
+Os caches derivados dos posts (contagens, estatísticas, listas prontas...)
+se inscrevem com `on_posts_committed` e recebem {post_id: 'created' |
+'updated' | 'unpublished' | 'deleted'} só depois que a transação foi confirmada, para
+nunca recalcular a partir de dados que ainda podem sofrer rollback.
+"""
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from src.models.blog import BlogPost
+
+_SESSION_KEY = 'blog_posts_changed'
+_listeners = []
+
+
+def on_posts_committed(listener):
+    """Registra uma função chamada com {post_id: tipo de mudança} após cada commit"""
+    _listeners.append(listener)
+    return listener
+
+
+def _was_unpublished(post):
+    # No after_flush o histórico dos atributos ainda é o de antes do flush.
+    # Sem valor anterior (atributo expirado quando foi alterado), conta como despublicado
+    history = inspect(post).attrs.is_published.history
+    return bool(history.added) and not post.is_published and (True in history.deleted or not history.deleted)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_posts(session, flush_context):
+    changed = session.info.setdefault(_SESSION_KEY, {})
+    for obj in session.new:
+        if isinstance(obj, BlogPost):
+            changed[obj.id] = 'created'
+    for obj in session.dirty:
+        if isinstance(obj, BlogPost) and session.is_modified(obj):
+            if _was_unpublished(obj) and changed.get(obj.id) != 'created':
+                changed[obj.id] = 'unpublished'
+            else:
+                changed.setdefault(obj.id, 'updated')
+    for obj in session.deleted:
+        if isinstance(obj, BlogPost):
+            changed[obj.id] = 'deleted'
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_changed_posts(session):
+    # after_commit também dispara ao liberar um savepoint (begin_nested); só o commit externo vale
+    if session.in_nested_transaction():
+        return
+    changed = session.info.pop(_SESSION_KEY, None)
+    if not changed:
+        return
+    for listener in _listeners:
+        try:
+            listener(changed)
+        except Exception as e:
+            print(f"Erro ao processar alteração de posts: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_posts(session):
+    # O rollback de um savepoint não desfaz o que a transação externa já alterou
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,81 @@
+"""
+Atualização do schema do blog (src/) no deploy ou no boot
+
+Cria as tabelas e colunas que faltam e o índice de busca. É idempotente e
+roda fora das requisições (os ALTER TABLE travam a tabela inteira). Sem as
+colunas mapeadas em BlogPost, qualquer consulta de posts falha, então o passo
+precisa rodar antes de o código novo atender requisições:
+
+    python blog_maintenance.py upgrade-schema
+
+ou `init_blog_schema(app)` no boot do app, depois do `db.init_app(app)`
+(RUN_BLOG_SCHEMA_ON_BOOT=0 desliga, para rodar só no deploy). No PostgreSQL,
+um advisory lock impede que dois workers atualizem o schema ao mesmo tempo.
+"""
+
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from src.models.user import db
+from src.models.admin import Admin  # noqa: F401 (registra a tabela admins)
+from src.services.derived_fields import DERIVED_COLUMNS, backfill_derived_fields, ensure_derived_columns
+from src.services.rendering import RENDER_COLUMNS, backfill_rendered_content
+from src.services.search import create_search_index
+
+# Chave do advisory lock; distinta das migrações do app (728401) e da busca
+# (728402, dentro da própria transação)
+SCHEMA_LOCK_KEY = 728403
+
+
+@contextmanager
+def _schema_lock(engine):
+    if engine.dialect.name != 'postgresql':
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {'key': SCHEMA_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': SCHEMA_LOCK_KEY})
+
+
+def _create_slug_pattern_index(engine):
+    # No PostgreSQL o índice único de slug segue a collation do banco e não atende
+    # LIKE 'base-%'; este atende a busca de colisões em generate_slug
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_blog_posts_slug_pattern ON blog_posts (slug text_pattern_ops)"
+        ))
+
+
+def upgrade_blog_schema(engine):
+    """Aplica o schema atual do blog; retorna um resumo do que foi feito"""
+    with _schema_lock(engine):
+        db.metadata.create_all(engine)
+        _create_slug_pattern_index(engine)
+        added = ensure_derived_columns(engine, DERIVED_COLUMNS)
+        if added:
+            # Colunas novas: preenche o acervo antes de o índice de busca ler plain_text
+            backfill_derived_fields()
+        added_render = ensure_derived_columns(engine, RENDER_COLUMNS)
+        if added_render:
+            backfill_rendered_content()
+        search = create_search_index(engine)
+    return {'added_columns': added + added_render, 'search': search}
+
+
+def init_blog_schema(app):
+    """Atualiza o schema no boot (uma vez por worker; com tudo em dia, só consultas de catálogo)"""
+    if os.environ.get('RUN_BLOG_SCHEMA_ON_BOOT', '1') == '0':
+        return None
+    with app.app_context():
+        try:
+            return upgrade_blog_schema(db.engine)
+        except Exception as e:
+            print(f"Falha ao atualizar o schema do blog: {e}")
+            return None
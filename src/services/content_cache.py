@@ -0,0 +1,92 @@
+"""
+Cache em memória (por processo) para as leituras do CMS
+Dr. Rodrigo Sguario - Site de Cardiologia
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Cache LRU com tempo de expiração e tamanho máximo.
+
+    As chaves são tuplas cujo primeiro elemento é o "namespace"
+    (ex.: ('content', 'section', 'hero')), o que permite invalidar
+    todas as entradas de um mesmo grupo de uma só vez.
+    """
+
+    def __init__(self, ttl=300.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        """Retorna o valor em cache ou None se ausente/expirado"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        """Armazena um valor, descartando o menos usado se o cache estiver cheio"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key):
+        """Remove uma única entrada (se existir)"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, namespace):
+        """Remove todas as entradas de um namespace"""
+        with self._lock:
+            keys = [key for key in self._data if key[0] == namespace]
+            for key in keys:
+                del self._data[key]
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+# Cache compartilhado pelas rotas de conteúdo e configurações.
+# Cada worker tem o seu: o TTL limita por quanto tempo os outros workers
+# podem servir um valor antigo depois que um administrador salva.
+content_cache = TTLCache(
+    ttl=float(os.environ.get('CONTENT_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('CONTENT_CACHE_MAX_ENTRIES', 256)),
+)
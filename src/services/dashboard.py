@@ -0,0 +1,100 @@
+"""
+Estatísticas do dashboard administrativo em uma única consulta
+
+Totais (contagens condicionais e soma de visualizações) e as duas listas
+top-5 saem do mesmo SELECT (UNION ALL de CTEs), só com as colunas que o
+dashboard mostra. O resultado fica em cache por alguns segundos e é
+descartado a cada escrita em posts.
+"""
+
+import os
+
+from sqlalchemy import DateTime, text
+
+from src.services.content_cache import TTLCache
+from src.models.blog import db
+from src.services.blog_events import on_posts_committed
+
+DASHBOARD_LIST_SIZE = 5
+
+LIST_COLUMNS = ('id', 'title', 'slug', 'category', 'views', 'is_published', 'is_featured',
+                'read_time', 'created_at', 'published_at')
+
+_DASHBOARD_SQL = text(f"""
+    WITH totals AS (
+        SELECT count(*) AS total_posts,
+               coalesce(sum(CASE WHEN is_published THEN 1 ELSE 0 END), 0) AS published_posts,
+               coalesce(sum(views), 0) AS total_views
+        FROM blog_posts
+    ),
+    popular AS (
+        SELECT {', '.join(LIST_COLUMNS)} FROM blog_posts
+        WHERE is_published = :published
+        ORDER BY views DESC, id DESC
+        LIMIT :list_size
+    ),
+    recent AS (
+        SELECT {', '.join(LIST_COLUMNS)} FROM blog_posts
+        ORDER BY created_at DESC, id DESC
+        LIMIT :list_size
+    )
+    SELECT 'totals' AS kind, {', '.join(f'NULL AS {column}' for column in LIST_COLUMNS)},
+           total_posts, published_posts, total_views
+    FROM totals
+    UNION ALL
+    SELECT 'popular', {', '.join(LIST_COLUMNS)}, NULL, NULL, NULL FROM popular
+    UNION ALL
+    SELECT 'recent', {', '.join(LIST_COLUMNS)}, NULL, NULL, NULL FROM recent
+""").columns(created_at=DateTime, published_at=DateTime)
+
+dashboard_cache = TTLCache(
+    ttl=float(os.environ.get('DASHBOARD_CACHE_TTL', 30)),
+    max_entries=4,
+)
+
+
+@on_posts_committed
+def invalidate_dashboard(changed=None):
+    dashboard_cache.invalidate('dashboard')
+
+
+def _post_row(row):
+    post = dict(zip(LIST_COLUMNS, row[1:1 + len(LIST_COLUMNS)]))
+    for field in ('created_at', 'published_at'):
+        post[field] = post[field].isoformat() if post[field] else None
+    post['is_published'] = bool(post['is_published'])
+    post['is_featured'] = bool(post['is_featured'])
+    return post
+
+
+def get_dashboard_stats():
+    """Retorna as estatísticas do blog (uma ida ao banco quando fora do cache)"""
+    stats = dashboard_cache.get(('dashboard',))
+    if stats is not None:
+        return stats
+
+    rows = db.session.execute(_DASHBOARD_SQL, {
+        'published': True,
+        'list_size': DASHBOARD_LIST_SIZE,
+    }).all()
+
+    stats = {
+        'blog': {'total_posts': 0, 'published_posts': 0, 'draft_posts': 0, 'total_views': 0},
+        'popular_posts': [],
+        'recent_posts': [],
+    }
+    for row in rows:
+        kind = row[0]
+        if kind == 'totals':
+            total_posts, published_posts, total_views = row[-3:]
+            stats['blog'] = {
+                'total_posts': int(total_posts),
+                'published_posts': int(published_posts),
+                'draft_posts': int(total_posts) - int(published_posts),
+                'total_views': int(total_views),
+            }
+        else:
+            stats[f'{kind}_posts'].append(_post_row(row))
+
+    dashboard_cache.set(('dashboard',), stats)
+    return stats
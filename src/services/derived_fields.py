@@ -0,0 +1,144 @@
+"""
+Campos derivados do conteúdo dos posts (texto puro, palavras, resumo, leitura)
+
+O HTML é limpo uma única vez por escrita (eventos before_insert/before_update
+em src/models/blog.py) e o resultado fica gravado em `plain_text`,
+`word_count`, `excerpt` e `read_time`. Posts antigos são preenchidos por
+`backfill_derived_fields()` (python blog_maintenance.py backfill-derived).
+"""
+
+import html
+import re
+
+from sqlalchemy import bindparam, inspect, text
+
+_SCRIPT_STYLE_RE = re.compile(r'<(script|style)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_BLOCK_TAG_RE = re.compile(r'</?(p|div|br|li|ul|ol|h[1-6]|blockquote|pre|tr|td|th|table|section|article)\b[^>]*>',
+                           re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+DERIVED_COLUMNS = {
+    'plain_text': 'TEXT',
+    'word_count': 'INTEGER',
+}
+
+
+def html_to_text(content):
+    """Remove a marcação HTML e normaliza os espaços"""
+    if not content:
+        return ''
+    text_content = _SCRIPT_STYLE_RE.sub(' ', content)
+    # Blocos viram espaço para não colar palavras de parágrafos diferentes
+    text_content = _BLOCK_TAG_RE.sub(' ', text_content)
+    text_content = _TAG_RE.sub('', text_content)
+    text_content = html.unescape(text_content)
+    return _WHITESPACE_RE.sub(' ', text_content).strip()
+
+
+def make_excerpt(plain_text, length=EXCERPT_LENGTH):
+    """Primeiros `length` caracteres, cortados no último espaço"""
+    if not plain_text:
+        return ''
+    if len(plain_text) <= length:
+        return plain_text
+
+    excerpt = plain_text[:length]
+    last_space = excerpt.rfind(' ')
+    if last_space > 0:
+        excerpt = excerpt[:last_space]
+    return excerpt + '...'
+
+
+def read_time_for(word_count):
+    """Minutos de leitura a 200 palavras por minuto (mínimo 1)"""
+    return max(1, round(word_count / WORDS_PER_MINUTE))
+
+
+def compute_derived_fields(content):
+    """Calcula todos os campos derivados a partir do HTML"""
+    plain_text = html_to_text(content)
+    word_count = len(plain_text.split())
+    return {
+        'plain_text': plain_text,
+        'word_count': word_count,
+        'excerpt': make_excerpt(plain_text),
+        'read_time': read_time_for(word_count),
+    }
+
+
+def apply_derived_fields(post, previous_plain_text=None):
+    """Atualiza os campos derivados do post.
+
+    O resumo só é substituído se estiver vazio ou se ainda for o resumo
+    automático do texto anterior (um resumo escrito à mão é mantido).
+    """
+    derived = compute_derived_fields(post.content)
+    auto_excerpt = not post.excerpt or (
+        previous_plain_text is not None and post.excerpt == make_excerpt(previous_plain_text)
+    )
+
+    post.plain_text = derived['plain_text']
+    post.word_count = derived['word_count']
+    post.read_time = derived['read_time']
+    if auto_excerpt:
+        post.excerpt = derived['excerpt']
+
+
+def ensure_derived_columns(engine, columns=DERIVED_COLUMNS):
+    """Adiciona as colunas derivadas em bancos criados antes delas"""
+    existing = {column['name'] for column in inspect(engine).get_columns('blog_posts')}
+    missing = [(name, sql_type) for name, sql_type in columns.items() if name not in existing]
+    if missing:
+        with engine.begin() as conn:
+            for name, sql_type in missing:
+                conn.execute(text(f"ALTER TABLE blog_posts ADD COLUMN {name} {sql_type}"))
+    return [name for name, _ in missing]
+
+
+def backfill_derived_fields(chunk_size=500, only_missing=True):
+    """Preenche os campos derivados do acervo em lotes (paginação por id)"""
+    from src.models.blog import BlogPost, db
+
+    ensure_derived_columns(db.engine)
+
+    processed = 0
+    last_id = 0
+    while True:
+        query = db.session.query(BlogPost.id, BlogPost.content, BlogPost.excerpt)\
+                          .filter(BlogPost.id > last_id)
+        if only_missing:
+            query = query.filter(BlogPost.plain_text.is_(None))
+        rows = query.order_by(BlogPost.id).limit(chunk_size).all()
+        if not rows:
+            break
+
+        params = []
+        for post_id, content, excerpt in rows:
+            derived = compute_derived_fields(content)
+            params.append({
+                'post_id': post_id,
+                'plain_text': derived['plain_text'],
+                'word_count': derived['word_count'],
+                'read_time': derived['read_time'],
+                'excerpt': excerpt or derived['excerpt'],
+            })
+
+        # UPDATE em lote pela chave primária, sem carregar objetos do ORM
+        table = BlogPost.__table__
+        db.session.execute(table.update().where(table.c.id == bindparam('post_id')).values(
+            plain_text=bindparam('plain_text'),
+            word_count=bindparam('word_count'),
+            read_time=bindparam('read_time'),
+            excerpt=bindparam('excerpt'),
+        ), params)
+        db.session.commit()
+
+        processed += len(rows)
+        last_id = rows[-1][0]
+        print(f"Posts processados: {processed} (até id {last_id})")
+
+    return processed
@@ -0,0 +1,109 @@
+"""
+Hash e verificação de senhas com limite de concorrência por processo
+
+scrypt/pbkdf2 são caros de propósito (CPU e, no scrypt, ~32 MB por hash).
+As chamadas passam por um pool pequeno de threads com limite de fila. A
+thread da requisição continua esperando o resultado; o ganho é outro:
+
+- no máximo PASSWORD_HASH_WORKERS hashes rodam ao mesmo tempo no processo,
+  então uma rajada de logins não disputa CPU e memória com o resto;
+- com o pool e a fila cheios, `PasswordHasherBusy` é levantada na hora e a
+  rota responde 503, em vez de enfileirar sem limite;
+- quem espera mais que PASSWORD_HASH_TIMEOUT também recebe
+  `PasswordHasherBusy` (503), não um erro 500;
+- as funções do hashlib liberam o GIL, então em workers com threads as
+  demais requisições seguem atendidas enquanto o hash roda.
+
+`needs_rehash()` compara os parâmetros do hash gravado com
+PASSWORD_HASH_METHOD; o login regrava o hash quando eles mudam.
+
+Variáveis de ambiente:
+    PASSWORD_HASH_METHOD     método do werkzeug (padrão 'scrypt')
+    PASSWORD_HASH_WORKERS    threads do pool (padrão 2)
+    PASSWORD_HASH_MAX_QUEUE  tarefas aguardando além das threads (padrão 4)
+    PASSWORD_HASH_TIMEOUT    segundos de espera pelo resultado (padrão 10)
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 4))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+
+class PasswordHasherBusy(Exception):
+    """Pool de hash saturado (a rota deve responder 503)"""
+
+
+class PasswordHasher:
+    """Pool limitado: no máximo `workers` executando e `max_queue` aguardando"""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 max_queue=PASSWORD_HASH_MAX_QUEUE, timeout=PASSWORD_HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._method_prefix = None
+        self._rejected = 0
+        self._timeouts = 0
+
+    def _get_executor(self):
+        # Um pool por processo (o gunicorn faz fork depois do import)
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='password-hash')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy('Muitas operações de senha em andamento')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # A tarefa segue no pool e libera a vaga quando terminar
+            with self._lock:
+                self._timeouts += 1
+            raise PasswordHasherBusy('Operação de senha demorou demais')
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def method_prefix(self):
+        """Parâmetros que o método atual grava no hash (ex.: 'scrypt:32768:8:1')"""
+        if self._method_prefix is None:
+            self._method_prefix = self.hash('').split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, pwhash):
+        return not pwhash or pwhash.split('$', 1)[0] != self.method_prefix()
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'max_queue': self.max_queue,
+                    'rejected': self._rejected, 'timeouts': self._timeouts}
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,133 @@
+"""
+Contagens cacheadas para a paginação dos posts
+
+`paginate()` substitui o `query.paginate()` das listagens: o COUNT(*) de
+cada filtro (categoria, status, busca, tag) fica em cache e é invalidado
+quando algum post é criado, alterado, publicado ou excluído. Para listas
+grandes o cliente pode pedir:
+
+- `count=approx`: estimativa do planejador do PostgreSQL (ou a contagem
+  exata em cache quando a estimativa é pequena ou o banco é SQLite);
+- `count=none`: nenhuma contagem, apenas `has_next` (lê per_page + 1 linhas).
+"""
+
+import os
+import json
+import math
+
+from src.services.content_cache import TTLCache
+from src.models.blog import db
+from src.services.blog_events import on_posts_committed
+
+COUNT_MODES = ('exact', 'approx', 'none')
+
+# Abaixo disso a estimativa do planejador não compensa: conta de verdade
+APPROX_MIN_ROWS = int(os.environ.get('POST_COUNT_APPROX_MIN_ROWS', 1000))
+
+# Cada worker tem o seu cache: o TTL limita a defasagem dos outros workers
+count_cache = TTLCache(
+    ttl=float(os.environ.get('POST_COUNT_CACHE_TTL', 60)),
+    max_entries=int(os.environ.get('POST_COUNT_CACHE_MAX_ENTRIES', 512)),
+)
+
+
+class PostPage:
+    """Página de posts com a mesma interface da Pagination do Flask-SQLAlchemy"""
+
+    def __init__(self, items, page, per_page, total=None, has_next=None, estimated=False):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.estimated = estimated
+        self._has_next = has_next
+
+    @property
+    def pages(self):
+        if self.total is None:
+            return None
+        return int(math.ceil(self.total / self.per_page)) if self.per_page else 0
+
+    @property
+    def has_next(self):
+        if self._has_next is not None:
+            return self._has_next
+        return self.page < self.pages
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+
+@on_posts_committed
+def invalidate_post_counts(changed=None):
+    count_cache.invalidate('post_counts')
+
+
+def cached_count(query, key):
+    """COUNT(*) do filtro, reaproveitado até a próxima escrita em posts"""
+    cache_key = ('post_counts',) + tuple(key)
+    total = count_cache.get(cache_key)
+    if total is None:
+        total = query.order_by(None).count()
+        count_cache.set(cache_key, total)
+    return total
+
+
+def estimate_count(query):
+    """Linhas estimadas pelo planejador do PostgreSQL (None em outros bancos)"""
+    if db.engine.dialect.name != 'postgresql':
+        return None
+    compiled = query.order_by(None).statement.compile(dialect=db.engine.dialect)
+    plan = db.session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def paginate(query, page, per_page, key, count_mode='exact'):
+    """Pagina a query usando a contagem em cache, estimada ou nenhuma"""
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+    offset = (page - 1) * per_page
+
+    if count_mode == 'exact':
+        items = query.limit(per_page).offset(offset).all()
+        return PostPage(items, page, per_page, total=cached_count(query, key))
+
+    # Uma linha a mais diz se existe próxima página sem depender da contagem
+    rows = query.limit(per_page + 1).offset(offset).all()
+    items = rows[:per_page]
+    has_next = len(rows) > per_page
+
+    if count_mode == 'none':
+        return PostPage(items, page, per_page, has_next=has_next)
+
+    estimate = estimate_count(query)
+    if estimate is not None and estimate >= APPROX_MIN_ROWS:
+        total = max(estimate, offset + len(items))
+        return PostPage(items, page, per_page, total=total, has_next=has_next, estimated=True)
+    return PostPage(items, page, per_page, total=cached_count(query, key), has_next=has_next)
+
+
+def count_mode_from(args):
+    """Lê o modo de contagem da query string (?count=exact|approx|none)"""
+    mode = args.get('count', 'exact')
+    return mode if mode in COUNT_MODES else 'exact'
+
+
+def pagination_dict(posts):
+    """Bloco 'pagination' das respostas de listagem"""
+    data = {
+        'page': posts.page,
+        'per_page': posts.per_page,
+        'total': posts.total,
+        'pages': posts.pages,
+        'has_next': posts.has_next,
+        'has_prev': posts.has_prev
+    }
+    if getattr(posts, 'estimated', False):
+        data['total_is_estimate'] = True
+    return data
@@ -0,0 +1,196 @@
+"""
+Listas de posts prontas (destaques, mais recentes e mais recentes por categoria)
+
+O snapshot guarda cada post já serializado em JSON (bytes), então
+/posts/featured e a primeira página de /posts só concatenam bytes, sem
+ORDER BY nem to_dict() por requisição.
+
+Ele é gravado na tabela `blog_snapshots` (criada pelo passo de schema,
+src/services/blog_schema.py) e reconstruído depois de um
+commit que publica, despublica, destaca, edita ou remove um post
+publicado. Os outros workers comparam a versão gravada com a sua no
+máximo a cada SNAPSHOT_CHECK_INTERVAL segundos. As visualizações gravadas
+em lote pelo view_counter não reconstroem o snapshot.
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.models.blog import BlogPost, db
+from src.services.blog_events import on_posts_committed
+
+SNAPSHOT_NAME = 'posts'
+SNAPSHOT_SIZE = int(os.environ.get('POST_SNAPSHOT_SIZE', 12))
+SNAPSHOT_CHECK_INTERVAL = float(os.environ.get('POST_SNAPSHOT_CHECK_INTERVAL', 5))
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class PostSnapshot:
+    """Cópia em memória do snapshot, revalidada pela versão gravada no banco"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _decode(payload):
+        raw = json.loads(payload)
+        return {
+            'ids': set(raw['ids']),
+            'featured': [item.encode('utf-8') for item in raw['featured']],
+            'latest': [item.encode('utf-8') for item in raw['latest']],
+            'total': raw['total'],
+            'categories': {
+                category: ([item.encode('utf-8') for item in entry['posts']], entry['total'])
+                for category, entry in raw['categories'].items()
+            },
+        }
+
+    def _current(self):
+        """Retorna os dados atuais, recarregando se outro worker reconstruiu"""
+        now = time.monotonic()
+        if self._data is not None and now - self._checked_at < SNAPSHOT_CHECK_INTERVAL:
+            return self._data
+
+        with self._lock:
+            if self._data is not None and now - self._checked_at < SNAPSHOT_CHECK_INTERVAL:
+                return self._data
+            version = db.session.execute(
+                text("SELECT version FROM blog_snapshots WHERE name = :name"), {'name': SNAPSHOT_NAME}
+            ).scalar()
+            if version is None:
+                self._store(self._build_raw())
+            elif version != self._version:
+                payload = db.session.execute(
+                    text("SELECT payload FROM blog_snapshots WHERE name = :name"), {'name': SNAPSHOT_NAME}
+                ).scalar()
+                self._data = self._decode(payload)
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._data
+
+    def _build_raw(self):
+        # Sessão própria: a reconstrução roda também dentro do after_commit,
+        # quando a sessão da requisição não pode mais emitir SQL
+        with Session(db.engine) as session:
+            return self._build(session)
+
+    def _build(self, session):
+        """Monta o snapshot a partir do banco (3 consultas)"""
+        published = session.query(BlogPost).filter(BlogPost.is_published.is_(True))
+        featured = published.filter(BlogPost.is_featured.is_(True))\
+                            .order_by(BlogPost.published_at.desc())\
+                            .limit(SNAPSHOT_SIZE).all()
+        latest = published.order_by(BlogPost.published_at.desc())\
+                          .limit(SNAPSHOT_SIZE).all()
+
+        # Mais recentes por categoria em uma consulta (ROW_NUMBER por categoria)
+        ranked = session.query(
+            BlogPost.id,
+            db.func.row_number().over(partition_by=BlogPost.category,
+                                      order_by=BlogPost.published_at.desc()).label('position'),
+            db.func.count().over(partition_by=BlogPost.category).label('total')
+        ).filter(BlogPost.is_published.is_(True)).subquery()
+        by_category = session.query(BlogPost, ranked.c.total)\
+                                .join(ranked, ranked.c.id == BlogPost.id)\
+                                .filter(ranked.c.position <= SNAPSHOT_SIZE)\
+                                .order_by(BlogPost.category, ranked.c.position).all()
+
+        categories = {}
+        for post, total in by_category:
+            entry = categories.setdefault(post.category, {'posts': [], 'total': int(total)})
+            entry['posts'].append(_dumps(post.to_dict()))
+
+        total = sum(entry['total'] for entry in categories.values())
+        ids = {post.id for post in featured} | {post.id for post in latest} | {post.id for post, _ in by_category}
+        return {
+            'ids': sorted(ids),
+            'featured': [_dumps(post.to_dict()) for post in featured],
+            'latest': [_dumps(post.to_dict()) for post in latest],
+            'total': total,
+            'categories': categories,
+        }
+
+    def _store(self, raw):
+        """Grava o snapshot com uma nova versão e atualiza a cópia local"""
+        payload = _dumps(raw)
+        version = uuid.uuid4().hex
+        params = {'name': SNAPSHOT_NAME, 'payload': payload, 'version': version, 'updated_at': datetime.utcnow()}
+        with db.engine.begin() as connection:
+            updated = connection.execute(text("""
+                UPDATE blog_snapshots SET payload = :payload, version = :version, updated_at = :updated_at
+                WHERE name = :name
+            """), params).rowcount
+            if not updated:
+                connection.execute(text("""
+                    INSERT INTO blog_snapshots (name, payload, version, updated_at)
+                    VALUES (:name, :payload, :version, :updated_at)
+                """), params)
+        self._data = self._decode(payload)
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    def rebuild(self):
+        with self._lock:
+            self._store(self._build_raw())
+
+    def contains(self, post_ids):
+        data = self._data
+        return data is not None and not data['ids'].isdisjoint(post_ids)
+
+    # --- Respostas prontas ---
+
+    def featured_response_body(self, limit):
+        items = self._current()['featured'][:limit]
+        return b'{"posts":[' + b','.join(items) + b']}'
+
+    def latest_response_body(self, per_page, category=None):
+        """Primeira página de /posts (sem busca nem tag), no mesmo formato da rota"""
+        data = self._current()
+        if category:
+            items, total = data['categories'].get(category, ([], 0))
+        else:
+            items, total = data['latest'], data['total']
+        pagination = {
+            'page': 1,
+            'per_page': per_page,
+            'total': total,
+            'pages': int(math.ceil(total / per_page)) if per_page else 0,
+            'has_next': total > per_page,
+            'has_prev': False,
+        }
+        return (b'{"pagination":' + _dumps(pagination).encode('utf-8')
+                + b',"posts":[' + b','.join(items[:per_page]) + b']}')
+
+
+post_snapshot = PostSnapshot()
+
+
+@on_posts_committed
+def _rebuild_snapshot(changed):
+    # Exclusões e despublicações mudam os totais mesmo fora das listas
+    if any(kind in ('deleted', 'unpublished') for kind in changed.values()):
+        post_snapshot.rebuild()
+        return
+    # Nos demais casos, só interessa se algum post alterado está (ou estava) nas listas publicadas
+    if not post_snapshot.contains(changed):
+        with Session(db.engine) as session:
+            published = session.query(BlogPost.id)\
+                               .filter(BlogPost.id.in_(list(changed)), BlogPost.is_published.is_(True))\
+                               .first()
+        if published is None:
+            return
+    post_snapshot.rebuild()
@@ -0,0 +1,331 @@
+"""
+Posts relacionados por similaridade TF-IDF
+
+Os vizinhos mais próximos de cada post publicado ficam gravados em
+`blog_related_posts` (post_id, rank, related_id, score), e a rota
+/posts/<slug>/related só lê essa tabela.
+
+- `rebuild_related_posts()` recalcula tudo (python blog_maintenance.py rebuild-related);
+- depois de cada commit que altera posts, `update_related_posts()` roda em
+  uma thread de fundo e recalcula só o post alterado e os posts cuja lista
+  ele passa a integrar ou deixa de integrar.
+
+O índice fica em memória por processo (`index_cache`). A cada commit, uma
+consulta leve (id, updated_at dos publicados) aponta o que mudou; só esses
+textos são lidos de novo. Rascunhos e edições que não mudam título,
+categoria, tags nem texto (destaque, imagem, visualizações) não recalculam
+nada.
+
+O vetor de cada post combina título (peso 3), categoria e tags (peso 2) e
+texto puro (peso 1), com tf logarítmico, idf suavizado e norma L2, de modo
+que o produto escalar é a similaridade de cosseno.
+"""
+
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, text
+
+from src.models.blog import BlogRelatedPost, db
+from src.services.blog_events import on_posts_committed
+from src.services.derived_fields import html_to_text
+
+RELATED_POSTS_K = int(os.environ.get('RELATED_POSTS_K', 5))
+RELATED_POSTS_ASYNC = os.environ.get('RELATED_POSTS_ASYNC', '1') != '0'
+
+FIELD_WEIGHTS = (('title', 3.0), ('category', 2.0), ('tags', 2.0), ('body', 1.0))
+
+_TOKEN_RE = re.compile(r'[a-z0-9]{3,}')
+
+STOPWORDS = frozenset("""
+    aos as com como das dos ela elas ele eles entre era essa esse esta este isso isto
+    foi for ha mais mas mesmo muito muita nao nas nem nos num numa onde para pela pelas
+    pelo pelos por qual quais quando que sao se sem ser seu seus sua suas tambem tem ter
+    uma umas uns voce voces pode podem sobre apos ate cada todo toda todos todas depois
+    antes ainda assim entao porque sua tal the and
+""".split())
+
+
+def _normalize(value):
+    normalized = unicodedata.normalize('NFKD', value or '')
+    return normalized.encode('ascii', 'ignore').decode('ascii').lower()
+
+
+def tokenize(value):
+    """Palavras sem acento, com 3+ caracteres e fora da lista de stopwords"""
+    return [token for token in _TOKEN_RE.findall(_normalize(value)) if token not in STOPWORDS]
+
+
+class TfidfIndex:
+    """Matriz TF-IDF esparsa (linhas normalizadas) com índice invertido por termo"""
+
+    def __init__(self, post_ids, documents):
+        self.post_ids = np.asarray(post_ids, dtype=np.int64)
+        self.positions = {post_id: index for index, post_id in enumerate(post_ids)}
+        count = len(post_ids)
+
+        vocabulary = {}
+        counts = []
+        for fields in documents:
+            weighted = Counter()
+            for field, weight in FIELD_WEIGHTS:
+                for token in tokenize(fields.get(field)):
+                    weighted[vocabulary.setdefault(token, len(vocabulary))] += weight
+            counts.append(weighted)
+
+        document_frequency = np.zeros(len(vocabulary), dtype=np.float64)
+        for weighted in counts:
+            document_frequency[list(weighted)] += 1
+        idf = np.log((1 + count) / (1 + document_frequency)) + 1
+
+        self.rows = []
+        term_parts, doc_parts, weight_parts = [], [], []
+        for index, weighted in enumerate(counts):
+            terms = np.fromiter(weighted.keys(), dtype=np.int64, count=len(weighted))
+            tf = np.fromiter(weighted.values(), dtype=np.float64, count=len(weighted))
+            weights = (1 + np.log(tf)) * idf[terms] if len(terms) else tf
+            norm = np.linalg.norm(weights)
+            if norm:
+                weights = weights / norm
+            self.rows.append((terms, weights))
+            term_parts.append(terms)
+            doc_parts.append(np.full(len(terms), index, dtype=np.int64))
+            weight_parts.append(weights)
+
+        # Postings ordenadas por termo (equivalente a uma matriz CSC)
+        terms = np.concatenate(term_parts) if term_parts else np.zeros(0, dtype=np.int64)
+        order = np.argsort(terms, kind='stable')
+        self.posting_docs = (np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int64))[order]
+        self.posting_weights = (np.concatenate(weight_parts) if weight_parts else np.zeros(0))[order]
+        self.term_offsets = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=len(vocabulary)))))
+
+    def __len__(self):
+        return len(self.post_ids)
+
+    def similarities(self, position):
+        """Cosseno do post na posição `position` contra todos os outros"""
+        terms, weights = self.rows[position]
+        if not len(terms):
+            return np.zeros(len(self))
+        starts = self.term_offsets[terms]
+        lengths = self.term_offsets[terms + 1] - starts
+        # Junta as postings de todos os termos do post de uma vez
+        flat = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) \
+            + np.arange(lengths.sum())
+        scores = np.bincount(self.posting_docs[flat],
+                             weights=self.posting_weights[flat] * np.repeat(weights, lengths),
+                             minlength=len(self))
+        scores[position] = 0.0
+        return scores
+
+    def top_k(self, position, k=RELATED_POSTS_K):
+        """[(post_id, score), ...] dos k mais parecidos, com score > 0"""
+        scores = self.similarities(position)
+        if len(scores) > k:
+            candidates = np.argpartition(-scores, k)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(self.post_ids[i]), float(scores[i])) for i in candidates if scores[i] > 0]
+
+
+def _document(row):
+    return {
+        'title': row.title,
+        'category': row.category,
+        'tags': row.tags,
+        'body': row.plain_text if row.plain_text is not None else html_to_text(row.content),
+    }
+
+
+def load_index():
+    """Monta o índice com todos os posts publicados (uma consulta)"""
+    rows = db.session.execute(text("""
+        SELECT id, title, category, tags, plain_text, content
+        FROM blog_posts WHERE is_published = :published ORDER BY id
+    """), {'published': True}).all()
+    return TfidfIndex([row.id for row in rows], [_document(row) for row in rows])
+
+
+class IndexCache:
+    """Documentos dos posts publicados e o TfidfIndex montado com eles (por processo)"""
+
+    FETCH_CHUNK = 500
+
+    def __init__(self):
+        self._documents = {}  # post_id -> (updated_at, documento)
+        self._index = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _fetch(self, post_ids):
+        """Linhas com o texto dos posts informados que ainda estão publicados"""
+        post_ids = list(post_ids)
+        for start in range(0, len(post_ids), self.FETCH_CHUNK):
+            yield from db.session.execute(text("""
+                SELECT id, updated_at, title, category, tags, plain_text, content
+                FROM blog_posts WHERE is_published = :published AND id IN :ids
+            """).bindparams(bindparam('ids', expanding=True)),
+                {'published': True, 'ids': post_ids[start:start + self.FETCH_CHUNK]})
+
+    def refresh(self):
+        """Sincroniza com o banco e devolve (índice, ids cujo documento mudou).
+
+        Na primeira carga do processo não há com o que comparar e os ids
+        voltam como None.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._documents, self._index, self._pid = {}, None, os.getpid()
+            initial = self._index is None
+
+            stamps = dict(db.session.execute(text(
+                "SELECT id, updated_at FROM blog_posts WHERE is_published = :published"
+            ), {'published': True}).all())
+
+            changed = set()
+            for post_id in set(self._documents) - set(stamps):
+                del self._documents[post_id]
+                changed.add(post_id)
+
+            stale = {post_id for post_id, stamp in stamps.items()
+                     if post_id not in self._documents or self._documents[post_id][0] != stamp}
+            fetched = set()
+            for row in self._fetch(stale):
+                fetched.add(row.id)
+                document = _document(row)
+                previous = self._documents.get(row.id)
+                if previous is None or previous[1] != document:
+                    changed.add(row.id)
+                self._documents[row.id] = (row.updated_at, document)
+            # Despublicados entre as duas consultas
+            for post_id in stale - fetched:
+                if self._documents.pop(post_id, None) is not None:
+                    changed.add(post_id)
+
+            if changed or initial:
+                post_ids = sorted(self._documents)
+                self._index = TfidfIndex(post_ids, [self._documents[post_id][1] for post_id in post_ids])
+            return self._index, (None if initial else changed)
+
+
+index_cache = IndexCache()
+
+
+def _replace_neighbours(connection, neighbours):
+    """Regrava as listas de `neighbours` ({post_id: [(related_id, score), ...]})"""
+    if not neighbours:
+        return
+    connection.execute(
+        text("DELETE FROM blog_related_posts WHERE post_id IN :post_ids")
+        .bindparams(bindparam('post_ids', expanding=True)),
+        {'post_ids': list(neighbours)}
+    )
+    rows = [{'post_id': post_id, 'rank': rank, 'related_id': related_id, 'score': score}
+            for post_id, related in neighbours.items()
+            for rank, (related_id, score) in enumerate(related, start=1)]
+    if rows:
+        connection.execute(text("""
+            INSERT INTO blog_related_posts (post_id, rank, related_id, score)
+            VALUES (:post_id, :rank, :related_id, :score)
+        """), rows)
+
+
+def rebuild_related_posts(k=RELATED_POSTS_K):
+    """Recalcula os relacionados de todos os posts publicados"""
+    db.metadata.create_all(bind=db.engine, tables=[BlogRelatedPost.__table__])
+    index = load_index()
+    neighbours = {int(post_id): index.top_k(position, k) for position, post_id in enumerate(index.post_ids)}
+    with db.engine.begin() as connection:
+        connection.execute(text("DELETE FROM blog_related_posts"))
+        _replace_neighbours(connection, neighbours)
+    return len(neighbours)
+
+
+def update_related_posts(post_ids, k=RELATED_POSTS_K):
+    """Atualização incremental depois que `post_ids` foram criados, editados ou removidos"""
+    index, changed = index_cache.refresh()
+    if changed is None:
+        # Índice recém-carregado: vale a lista do commit
+        changed = set(post_ids)
+    if not changed:
+        return set()
+    recompute = {post_id for post_id in changed if post_id in index.positions}
+
+    with db.engine.begin() as connection:
+        # Posts que listavam algum dos alterados (a similaridade mudou ou o post saiu)
+        listing = connection.execute(
+            text("SELECT DISTINCT post_id FROM blog_related_posts WHERE related_id IN :ids")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(changed)}
+        ).scalars().all()
+        recompute.update(post_id for post_id in listing if post_id in index.positions)
+
+        # Posts em que um alterado passa a entrar no top-k (similaridade é simétrica)
+        floors = {row.post_id: (row.entries, row.min_score) for row in connection.execute(text("""
+            SELECT post_id, count(*) AS entries, min(score) AS min_score
+            FROM blog_related_posts GROUP BY post_id
+        """))}
+        for post_id in changed:
+            position = index.positions.get(post_id)
+            if position is None:
+                continue
+            scores = index.similarities(position)
+            for other in np.nonzero(scores > 0)[0]:
+                other_id = int(index.post_ids[other])
+                entries, min_score = floors.get(other_id, (0, 0.0))
+                if entries < k or scores[other] > min_score:
+                    recompute.add(other_id)
+
+        removed = [post_id for post_id in changed if post_id not in index.positions]
+        if removed:
+            connection.execute(
+                text("DELETE FROM blog_related_posts WHERE post_id IN :ids")
+                .bindparams(bindparam('ids', expanding=True)),
+                {'ids': removed}
+            )
+
+        _replace_neighbours(connection, {post_id: index.top_k(index.positions[post_id], k)
+                                         for post_id in recompute})
+    return recompute
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='related-posts')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run_update(app, post_ids):
+    with app.app_context():
+        try:
+            update_related_posts(post_ids)
+        except Exception as e:
+            print(f"Erro ao atualizar posts relacionados: {e}")
+        finally:
+            db.session.remove()
+
+
+@on_posts_committed
+def _schedule_update(changed):
+    if not has_app_context():
+        return
+    app = current_app._get_current_object()
+    if RELATED_POSTS_ASYNC:
+        _get_executor().submit(_run_update, app, list(changed))
+    else:
+        _run_update(app, list(changed))
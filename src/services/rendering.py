@@ -0,0 +1,232 @@
+"""
+Renderização do conteúdo dos posts (HTML seguro, âncoras, sumário, imagens lazy)
+
+O conteúdo (HTML do editor ou Markdown) é renderizado uma vez por escrita
+(eventos before_insert/before_update em src/models/blog.py) e gravado em
+`rendered_html`, `toc` (JSON) e `render_hash`. O hash cobre o conteúdo e
+RENDER_VERSION, então todos os workers reaproveitam a mesma renderização e
+uma mudança no pipeline invalida as antigas. Posts sem renderização válida
+são renderizados na leitura (com cache por hash no processo) até o
+`python blog_maintenance.py render-content`.
+
+O Markdown usa o pacote `markdown` quando instalado; sem ele, o texto é
+convertido em parágrafos simples.
+"""
+
+import os
+import re
+import json
+import html
+import hashlib
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup
+from sqlalchemy import bindparam
+
+from src.services.content_cache import TTLCache
+from src.services.derived_fields import ensure_derived_columns
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+# Incrementar quando a saída do pipeline mudar (força nova renderização)
+RENDER_VERSION = 1
+
+RENDER_COLUMNS = {
+    'rendered_html': 'TEXT',
+    'toc': 'TEXT',
+    'render_hash': 'VARCHAR(64)',
+}
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'del', 'div', 'em', 'figcaption',
+    'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre',
+    's', 'small', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th',
+    'thead', 'tr', 'u', 'ul',
+}
+# Removidas com o conteúdo; as demais tags não permitidas só perdem a marcação
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'form', 'input', 'button',
+                'select', 'textarea', 'noscript', 'svg', 'math', 'link', 'meta', 'base'}
+ALLOWED_ATTRIBUTES = {
+    '*': {'class', 'title'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+
+TOC_LEVELS = ('h2', 'h3', 'h4')
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+_HTML_HINT_RE = re.compile(r'<(p|div|br|h[1-6]|ul|ol|li|img|a|strong|em|blockquote|pre|table|span)\b',
+                           re.IGNORECASE)
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+
+# Renderizações de posts antigos (sem render_hash válido), por hash do conteúdo
+render_cache = TTLCache(
+    ttl=float(os.environ.get('RENDER_CACHE_TTL', 3600)),
+    max_entries=int(os.environ.get('RENDER_CACHE_MAX_ENTRIES', 256)),
+)
+
+
+def content_hash(content):
+    """sha256 do conteúdo junto com a versão do pipeline"""
+    return hashlib.sha256(f'{RENDER_VERSION}:{content or ""}'.encode('utf-8')).hexdigest()
+
+
+def markdown_to_html(content):
+    """Converte Markdown em HTML (parágrafos simples sem o pacote markdown)"""
+    if markdown is not None:
+        return markdown.markdown(content, extensions=['extra', 'sane_lists'])
+    paragraphs = [block.strip() for block in _PARAGRAPH_SPLIT_RE.split(content) if block.strip()]
+    return ''.join(f"<p>{html.escape(block).replace(chr(10), '<br>')}</p>" for block in paragraphs)
+
+
+def _safe_url(value):
+    value = (value or '').strip()
+    try:
+        scheme = urlsplit(value).scheme.lower()
+    except ValueError:
+        return None
+    return value if scheme in ALLOWED_SCHEMES else None
+
+
+def _sanitize(soup):
+    """Remove tags, atributos e URLs fora da lista permitida"""
+    for tag in soup.find_all(True):
+        if tag.name in DROPPED_TAGS:
+            tag.decompose()
+
+    for tag in soup.find_all(True):
+        if tag.name not in ALLOWED_TAGS:
+            tag.unwrap()
+            continue
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag.name, set())
+        for attribute in list(tag.attrs):
+            if attribute not in allowed:
+                del tag[attribute]
+            elif attribute in URL_ATTRIBUTES:
+                url = _safe_url(tag[attribute])
+                if url is None:
+                    del tag[attribute]
+                else:
+                    tag[attribute] = url
+        if tag.name == 'a' and tag.get('target') == '_blank':
+            tag['rel'] = 'noopener noreferrer'
+
+
+def _add_heading_anchors(soup):
+    """Dá um id único a cada título e devolve o sumário (h2-h4)"""
+    from src.models.blog import slugify
+
+    used = set()
+    toc = []
+    for heading in soup.find_all(HEADING_TAGS):
+        text_content = heading.get_text(' ', strip=True)
+        base = slugify(text_content) or 'secao'
+        anchor = base
+        counter = 2
+        while anchor in used:
+            anchor = f'{base}-{counter}'
+            counter += 1
+        used.add(anchor)
+        heading['id'] = anchor
+        if heading.name in TOC_LEVELS:
+            toc.append({'level': int(heading.name[1]), 'id': anchor, 'text': text_content})
+    return toc
+
+
+def _lazy_images(soup):
+    for image in soup.find_all('img'):
+        image['loading'] = 'lazy'
+        image['decoding'] = 'async'
+
+
+def render_content(content):
+    """Renderiza o conteúdo: {'html': ..., 'toc': [...], 'hash': ...}"""
+    content = content or ''
+    source = content if _HTML_HINT_RE.search(content) else markdown_to_html(content)
+
+    soup = BeautifulSoup(source, 'html.parser')
+    _sanitize(soup)
+    toc = _add_heading_anchors(soup)
+    _lazy_images(soup)
+
+    return {'html': str(soup), 'toc': toc, 'hash': content_hash(content)}
+
+
+def render_cached(content):
+    """render_content() com cache por hash do conteúdo no processo"""
+    key = ('render', content_hash(content))
+    rendered = render_cache.get(key)
+    if rendered is None:
+        rendered = render_content(content)
+        render_cache.set(key, rendered)
+    return rendered
+
+
+def apply_rendered_fields(post):
+    """Renderiza o post, a menos que a renderização gravada já seja a do conteúdo atual"""
+    digest = content_hash(post.content)
+    if post.render_hash == digest and post.rendered_html is not None:
+        return
+    rendered = render_content(post.content)
+    post.rendered_html = rendered['html']
+    post.toc = json.dumps(rendered['toc'], ensure_ascii=False)
+    post.render_hash = rendered['hash']
+
+
+def rendered_for(post):
+    """HTML e sumário do post para a resposta (?format=rendered)"""
+    if post.rendered_html is not None and post.render_hash == content_hash(post.content):
+        return {'html': post.rendered_html, 'toc': json.loads(post.toc) if post.toc else []}
+    rendered = render_cached(post.content)
+    return {'html': rendered['html'], 'toc': rendered['toc']}
+
+
+def backfill_rendered_content(chunk_size=200, only_stale=True):
+    """Renderiza o acervo em lotes (paginação por id), gravando só o que mudou"""
+    from src.models.blog import BlogPost, db
+
+    ensure_derived_columns(db.engine, RENDER_COLUMNS)
+
+    processed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(BlogPost.id, BlogPost.content, BlogPost.render_hash)\
+                         .filter(BlogPost.id > last_id)\
+                         .order_by(BlogPost.id).limit(chunk_size).all()
+        if not rows:
+            break
+
+        params = []
+        for post_id, content, render_hash in rows:
+            if only_stale and render_hash == content_hash(content):
+                continue
+            rendered = render_content(content)
+            params.append({
+                'post_id': post_id,
+                'rendered_html': rendered['html'],
+                'toc': json.dumps(rendered['toc'], ensure_ascii=False),
+                'render_hash': rendered['hash'],
+            })
+
+        if params:
+            table = BlogPost.__table__
+            db.session.execute(table.update().where(table.c.id == bindparam('post_id')).values(
+                rendered_html=bindparam('rendered_html'),
+                toc=bindparam('toc'),
+                render_hash=bindparam('render_hash'),
+            ), params)
+            db.session.commit()
+
+        processed += len(params)
+        last_id = rows[-1][0]
+        print(f"Posts renderizados: {processed} (até id {last_id})")
+
+    return processed
@@ -0,0 +1,342 @@
+"""
+Busca textual dos posts do blog
+
+- PostgreSQL: coluna `search_vector` (tsvector gerado, configuração `blog_pt` =
+  português + unaccent) com índice GIN; ranking por ts_rank_cd e trechos com ts_headline.
+- SQLite: tabela virtual FTS5 (`blog_posts_fts`, sem acentos) sobre o texto puro
+  (`plain_text`), mantida por triggers; ranking por bm25 e trechos com snippet().
+- Outros bancos (ou SQLite sem FTS5): LIKE, como antes.
+
+O índice é criado no deploy por `create_search_index()` (via
+src/services/blog_schema.py), nunca em uma requisição: as buscas só detectam
+qual backend está disponível e, sem o índice, usam LIKE.
+"""
+
+import re
+import math
+import threading
+
+from sqlalchemy import text
+
+from src.models.blog import BlogPost, db
+from src.services.tags import filter_by_tag
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+
+# Pesos: título > resumo > conteúdo (o parser do PostgreSQL já ignora as tags HTML)
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'blog_pt') THEN
+            CREATE TEXT SEARCH CONFIGURATION blog_pt (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION blog_pt
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END
+    $$
+    """,
+    """
+    ALTER TABLE blog_posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('blog_pt'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('blog_pt'::regconfig, coalesce(excerpt, '')), 'B') ||
+        setweight(to_tsvector('blog_pt'::regconfig, coalesce(content, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_blog_posts_search ON blog_posts USING GIN (search_vector)",
+]
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE blog_posts_fts USING fts5(
+        title, excerpt, plain_text,
+        content='blog_posts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_posts_fts_ai AFTER INSERT ON blog_posts BEGIN
+        INSERT INTO blog_posts_fts(rowid, title, excerpt, plain_text)
+        VALUES (new.id, new.title, new.excerpt, new.plain_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_posts_fts_ad AFTER DELETE ON blog_posts BEGIN
+        INSERT INTO blog_posts_fts(blog_posts_fts, rowid, title, excerpt, plain_text)
+        VALUES ('delete', old.id, old.title, old.excerpt, old.plain_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS blog_posts_fts_au AFTER UPDATE OF title, excerpt, plain_text ON blog_posts BEGIN
+        INSERT INTO blog_posts_fts(blog_posts_fts, rowid, title, excerpt, plain_text)
+        VALUES ('delete', old.id, old.title, old.excerpt, old.plain_text);
+        INSERT INTO blog_posts_fts(rowid, title, excerpt, plain_text)
+        VALUES (new.id, new.title, new.excerpt, new.plain_text);
+    END
+    """,
+    "INSERT INTO blog_posts_fts(blog_posts_fts) VALUES ('rebuild')",
+]
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class SearchResults:
+    """Página de resultados com a mesma interface usada da Pagination do Flask-SQLAlchemy"""
+
+    def __init__(self, items, total, page, per_page, highlights=None, ranks=None):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+        self.highlights = highlights or {}
+        self.ranks = ranks or {}
+
+    @property
+    def pages(self):
+        return int(math.ceil(self.total / self.per_page)) if self.per_page else 0
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+
+def create_search_index(engine):
+    """Cria (DDL, no deploy) o índice de busca do banco e retorna o backend disponível"""
+    dialect = engine.dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        return 'like'
+    try:
+        # Com o índice pronto, nem o ALTER TABLE (que trava a tabela) é emitido
+        if not _index_ready(engine):
+            if dialect == 'postgresql':
+                _setup_postgres(engine)
+            else:
+                _setup_sqlite(engine)
+        return dialect
+    except Exception as e:
+        print(f"Índice de busca indisponível, usando LIKE: {e}")
+        return 'like'
+
+
+def _index_ready(engine):
+    """True se o índice de busca do banco já existe (só consultas de catálogo)"""
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            return bool(conn.execute(text("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'blog_posts' AND column_name = 'search_vector'
+            """)).scalar())
+        existing = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'blog_posts_fts'"
+        )).scalar()
+        return bool(existing and 'plain_text' in existing)
+
+
+def _detect_backend(engine):
+    """Backend de busca disponível, sem alterar o schema"""
+    dialect = engine.dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        return 'like'
+    if not _index_ready(engine):
+        print("Índice de busca não encontrado (rode python blog_maintenance.py upgrade-schema); usando LIKE")
+        return 'like'
+    return dialect
+
+
+def search_backend():
+    """Backend de busca do processo (detectado uma vez, só com consultas de catálogo)"""
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None:
+            try:
+                _backend = _detect_backend(db.engine)
+            except Exception as e:
+                print(f"Índice de busca indisponível, usando LIKE: {e}")
+                _backend = 'like'
+        return _backend
+
+
+def _setup_postgres(engine):
+    with engine.begin() as conn:
+        # Evita que dois deploys criem a configuração/coluna ao mesmo tempo
+        conn.execute(text("SELECT pg_advisory_xact_lock(728402)"))
+        for statement in POSTGRES_SETUP:
+            conn.execute(text(statement))
+
+
+def _setup_sqlite(engine):
+    with engine.begin() as conn:
+        existing = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'blog_posts_fts'"
+        )).scalar()
+        if existing and 'plain_text' in existing:
+            return
+        if existing:
+            # Índice antigo sobre o HTML: recria sobre o texto puro
+            for name in ('blog_posts_fts_ai', 'blog_posts_fts_ad', 'blog_posts_fts_au'):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text("DROP TABLE blog_posts_fts"))
+        # Cria a tabela, os triggers e indexa os posts já existentes
+        for statement in SQLITE_SETUP:
+            conn.execute(text(statement))
+
+
+def _fts5_query(query_text):
+    """Converte o texto digitado em uma consulta FTS5 segura (AND de prefixos)"""
+    words = _WORD_RE.findall(query_text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_posts(query_text, category=None, page=1, per_page=10, published_only=True, tag=None):
+    """Busca posts por relevância, retornando uma página de `SearchResults`"""
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+    backend = search_backend()
+
+    if backend == 'postgresql':
+        return _search_postgres(query_text, category, page, per_page, published_only, tag)
+    if backend == 'sqlite':
+        return _search_sqlite(query_text, category, page, per_page, published_only, tag)
+    return _search_like(query_text, category, page, per_page, published_only, tag)
+
+
+def _filters(alias, category, published_only, params, tag=None):
+    clauses = []
+    if published_only:
+        clauses.append(f"{alias}.is_published = :published")
+        params['published'] = True
+    if category:
+        clauses.append(f"{alias}.category = :category")
+        params['category'] = category
+    if tag:
+        clauses.append(f"""{alias}.id IN (
+            SELECT pt.post_id FROM blog_post_tags pt JOIN blog_tags t ON t.id = pt.tag_id WHERE t.slug = :tag
+        )""")
+        params['tag'] = tag
+    return ''.join(f" AND {clause}" for clause in clauses)
+
+
+def _search_postgres(query_text, category, page, per_page, published_only, tag):
+    params = {
+        'q': query_text,
+        'limit': per_page,
+        'offset': (page - 1) * per_page,
+        'options': f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=35, MinWords=15, MaxFragments=2',
+    }
+    where = _filters('p', category, published_only, params, tag)
+
+    # O ts_headline (caro) só roda para as linhas da página
+    rows = db.session.execute(text(f"""
+        WITH ranked AS (
+            SELECT p.id, ts_rank_cd(p.search_vector, q, 32) AS rank, count(*) OVER () AS total, q
+            FROM blog_posts p, websearch_to_tsquery('blog_pt', :q) q
+            WHERE p.search_vector @@ q{where}
+            ORDER BY rank DESC, p.id DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT r.id, r.rank, r.total,
+               ts_headline('blog_pt', coalesce(p.plain_text, p.content), r.q, :options) AS highlight
+        FROM ranked r
+        JOIN blog_posts p ON p.id = r.id
+        ORDER BY r.rank DESC, r.id DESC
+    """), params).all()
+
+    if rows:
+        total = rows[0].total
+    elif page > 1:
+        total = db.session.execute(text(f"""
+            SELECT count(*) FROM blog_posts p, websearch_to_tsquery('blog_pt', :q) q
+            WHERE p.search_vector @@ q{where}
+        """), params).scalar()
+    else:
+        total = 0
+
+    return _build_results(rows, total, page, per_page)
+
+
+def _search_sqlite(query_text, category, page, per_page, published_only, tag):
+    match = _fts5_query(query_text)
+    if not match:
+        return SearchResults([], 0, page, per_page)
+
+    params = {'q': match, 'limit': per_page, 'offset': (page - 1) * per_page}
+    where = _filters('p', category, published_only, params, tag)
+
+    # bm25/snippet só funcionam direto na consulta FTS; o ranking e a contagem
+    # ficam na CTE e o trecho é gerado apenas para a página
+    rows = db.session.execute(text(f"""
+        WITH matches AS (
+            SELECT rowid AS id, bm25(blog_posts_fts, 10.0, 5.0, 1.0) AS rank
+            FROM blog_posts_fts
+            WHERE blog_posts_fts MATCH :q
+        ),
+        page AS (
+            SELECT m.id, m.rank, count(*) OVER () AS total
+            FROM matches m
+            JOIN blog_posts p ON p.id = m.id
+            WHERE 1 = 1{where}
+            ORDER BY m.rank, m.id DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT page.id, page.rank, page.total,
+               snippet(blog_posts_fts, 2, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '…', 24) AS highlight
+        FROM blog_posts_fts
+        JOIN page ON page.id = blog_posts_fts.rowid
+        WHERE blog_posts_fts MATCH :q
+        ORDER BY page.rank, page.id DESC
+    """), params).all()
+
+    if rows:
+        total = rows[0].total
+    elif page > 1:
+        total = db.session.execute(text(f"""
+            SELECT count(*) FROM blog_posts_fts JOIN blog_posts p ON p.id = blog_posts_fts.rowid
+            WHERE blog_posts_fts MATCH :q{where}
+        """), params).scalar()
+    else:
+        total = 0
+
+    # bm25 é "quanto menor, melhor"; expõe como relevância positiva
+    rows = [(row.id, -row.rank, row.total, row.highlight) for row in rows]
+    return _build_results(rows, total, page, per_page)
+
+
+def _search_like(query_text, category, page, per_page, published_only, tag):
+    search_term = f"%{query_text}%"
+    query = BlogPost.query
+    if published_only:
+        query = query.filter_by(is_published=True)
+    if category:
+        query = query.filter_by(category=category)
+    if tag:
+        query = filter_by_tag(query, tag)
+    query = query.filter(db.or_(
+        BlogPost.title.like(search_term),
+        BlogPost.content.like(search_term),
+        BlogPost.excerpt.like(search_term)
+    )).order_by(BlogPost.published_at.desc())
+
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    return SearchResults(pagination.items, pagination.total, page, per_page)
+
+
+def _build_results(rows, total, page, per_page):
+    ids = [row[0] for row in rows]
+    posts = {post.id: post for post in BlogPost.query.filter(BlogPost.id.in_(ids)).all()} if ids else {}
+    items = [posts[post_id] for post_id in ids if post_id in posts]
+    ranks = {row[0]: float(row[1]) for row in rows}
+    highlights = {row[0]: row[3] for row in rows}
+    return SearchResults(items, total, page, per_page, highlights=highlights, ranks=ranks)
@@ -0,0 +1,220 @@
+"""
+Snapshot imutável das configurações do site (por processo)
+
+WhatsAppConfig (e os links wa.me de cada serviço), temas de cor (e o
+ativo), SiteSettings e PageContent por página são lidos de uma vez e
+guardados já serializados. As rotas GET de src/routes/settings.py só
+devolvem esses bytes: não abrem sessão nem inserem nada. Cada POST de
+configurações chama `reload()` depois do commit, que monta um snapshot
+novo e troca a referência (quem está lendo continua com o anterior,
+inteiro).
+
+Cada seção é carregada separadamente: se uma tabela falhar (ausente ou
+com schema diferente), a seção fica com o último valor bom (ou o padrão)
+e as demais seguem atualizadas.
+
+Outros workers recarregam em segundo plano depois de SETTINGS_SNAPSHOT_TTL
+segundos (0 desliga), sem bloquear a requisição que percebeu a expiração.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from types import MappingProxyType
+from urllib.parse import quote
+
+from src.models.settings import ColorTheme, PageContent, SiteSettings, WhatsAppConfig
+
+SETTINGS_SNAPSHOT_TTL = float(os.environ.get('SETTINGS_SNAPSHOT_TTL', 300))
+
+# service_type -> campo de WhatsAppConfig com a mensagem
+WHATSAPP_MESSAGE_FIELDS = {
+    'general': 'welcome_message',
+    'transplant': 'transplant_message',
+    'heart_failure': 'heart_failure_message',
+    'preventive': 'preventive_message',
+    'echo': 'echo_message',
+}
+
+_NON_DIGIT_RE = re.compile(r'\D')
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def default_whatsapp_config():
+    """Valores padrão das colunas de WhatsAppConfig (sem gravar a linha)"""
+    config = {}
+    for column in WhatsAppConfig.__table__.columns:
+        default = column.default
+        if default is None:
+            config[column.name] = None
+        elif default.is_callable:
+            config[column.name] = default.arg(None)
+        else:
+            config[column.name] = default.arg
+    return config
+
+
+def build_whatsapp_links(config):
+    """Links wa.me por service_type, com a mensagem codificada para URL"""
+    phone = _NON_DIGIT_RE.sub('', config.get('phone_number') or '')
+    links = {}
+    for service_type, field in WHATSAPP_MESSAGE_FIELDS.items():
+        message = config.get(field) or config.get('welcome_message') or ''
+        links[service_type] = {
+            'service_type': service_type,
+            'url': f"https://wa.me/{phone}?text={quote(message, safe='')}",
+            'phone': config.get('phone_number'),
+            'message': message,
+        }
+    return links
+
+
+def parse_setting(setting):
+    """Valor tipado de um SiteSettings (json, boolean ou texto)"""
+    if setting.setting_type == 'json':
+        try:
+            return json.loads(setting.setting_value)
+        except (TypeError, ValueError):
+            return setting.setting_value
+    if setting.setting_type == 'boolean':
+        return (setting.setting_value or '').lower() == 'true'
+    return setting.setting_value
+
+
+def _load_whatsapp(db_session):
+    config = db_session.query(WhatsAppConfig).order_by(WhatsAppConfig.id).first()
+    return config.to_dict() if config else default_whatsapp_config()
+
+
+def _load_themes(db_session):
+    return [theme.to_dict() for theme in db_session.query(ColorTheme).order_by(ColorTheme.id)]
+
+
+def _load_general(db_session):
+    settings = db_session.query(SiteSettings).order_by(SiteSettings.id)
+    return {setting.setting_key: parse_setting(setting) for setting in settings}
+
+
+def _load_contents(db_session):
+    return [content.to_dict() for content in db_session.query(PageContent).order_by(PageContent.id)]
+
+
+# seção: (carregador, valor usado se a primeira carga falhar)
+SECTION_LOADERS = {
+    'whatsapp': (_load_whatsapp, default_whatsapp_config),
+    'themes': (_load_themes, list),
+    'general': (_load_general, dict),
+    'contents': (_load_contents, list),
+}
+
+
+class SettingsSnapshot:
+    """Configurações de um instante; os atributos não devem ser alterados"""
+
+    __slots__ = ('whatsapp', 'whatsapp_links', 'themes', 'general', 'contents', 'page_names',
+                 'responses', 'loaded_at')
+
+    def __init__(self, whatsapp, themes, general, contents):
+        pages = {}
+        for content in contents:
+            pages.setdefault(content['page_name'], []).append(content)
+        active_theme = next((theme for theme in themes if theme['is_active']), None)
+        links = build_whatsapp_links(whatsapp)
+
+        self.whatsapp = MappingProxyType(whatsapp)
+        self.whatsapp_links = MappingProxyType(links)
+        self.themes = tuple(themes)
+        self.general = MappingProxyType(general)
+        self.contents = tuple(contents)
+        self.page_names = tuple(pages)
+        self.responses = MappingProxyType({
+            'whatsapp': _dumps(whatsapp),
+            'whatsapp-urls': _dumps({'links': links}),
+            **{f'whatsapp-url:{service_type}': _dumps(link) for service_type, link in links.items()},
+            'colors': _dumps({'themes': themes, 'active_theme': active_theme}),
+            'general': _dumps(general),
+            'page-content': _dumps(contents),
+            **{f'page-content:{page}': _dumps(items) for page, items in pages.items()},
+        })
+        self.loaded_at = time.monotonic()
+
+    def section(self, name):
+        """Cópia simples de uma seção, no formato aceito pelo construtor"""
+        value = getattr(self, name)
+        return dict(value) if isinstance(value, MappingProxyType) else list(value)
+
+    def whatsapp_url_body(self, service_type):
+        """Link do serviço (tipos desconhecidos usam a mensagem de boas-vindas)"""
+        return self.responses.get(f'whatsapp-url:{service_type}', self.responses['whatsapp-url:general'])
+
+    def page_content_body(self, page):
+        if page == 'all':
+            return self.responses['page-content']
+        return self.responses.get(f'page-content:{page}', b'[]')
+
+
+class SettingsStore:
+    """Guarda o snapshot atual e o reconstrói a partir do banco"""
+
+    def __init__(self, session_factory, ttl=SETTINGS_SNAPSHOT_TTL):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _load(self):
+        previous = self._snapshot
+        sections = {}
+        db_session = self.session_factory()
+        try:
+            for name, (loader, default) in SECTION_LOADERS.items():
+                try:
+                    sections[name] = loader(db_session)
+                except Exception as e:
+                    db_session.rollback()
+                    print(f"Erro ao carregar configurações ({name}), mantendo o último valor: {getattr(e, 'orig', e)}")
+                    sections[name] = previous.section(name) if previous is not None else default()
+        finally:
+            db_session.close()
+        return SettingsSnapshot(**sections)
+
+    def reload(self):
+        """Reconstrói o snapshot e troca a referência de uma vez"""
+        snapshot = self._load()
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Erro ao recarregar configurações: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, name='settings-snapshot', daemon=True).start()
+
+    def current(self):
+        """Snapshot atual (a primeira chamada do processo carrega do banco)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot
+            if snapshot is None:
+                return self.reload()
+        if self.ttl and time.monotonic() - snapshot.loaded_at > self.ttl:
+            self._refresh_in_background()
+        return snapshot
@@ -0,0 +1,152 @@
+"""
+Índice normalizado de tags do blog
+
+`BlogPost.tags` (texto separado por vírgulas) continua sendo o que a API
+recebe e devolve; as tabelas `blog_tags` e `blog_post_tags` são mantidas
+pelos eventos do BlogPost (src/models/blog.py) e servem o filtro
+`?tag=` e a contagem de posts publicados por tag (`blog_tags.post_count`).
+
+As funções recebem a conexão do flush, então rodam na mesma transação
+da escrita do post.
+"""
+
+from sqlalchemy import bindparam, text
+
+_INSERT_TAGS = "INSERT INTO blog_tags (name, slug, post_count) VALUES {values} ON CONFLICT (slug) DO NOTHING"
+
+_REFRESH_COUNTS = text("""
+    UPDATE blog_tags SET post_count = (
+        SELECT count(*) FROM blog_post_tags pt
+        JOIN blog_posts p ON p.id = pt.post_id
+        WHERE pt.tag_id = blog_tags.id AND p.is_published = :published
+    )
+    WHERE id IN :tag_ids
+""").bindparams(bindparam('tag_ids', expanding=True))
+
+_REFRESH_ALL_COUNTS = text("""
+    UPDATE blog_tags SET post_count = (
+        SELECT count(*) FROM blog_post_tags pt
+        JOIN blog_posts p ON p.id = pt.post_id
+        WHERE pt.tag_id = blog_tags.id AND p.is_published = :published
+    )
+""")
+
+_SELECT_TAG_IDS = text("SELECT id, slug FROM blog_tags WHERE slug IN :slugs")\
+    .bindparams(bindparam('slugs', expanding=True))
+
+
+def _current_tag_ids(connection, post_id):
+    rows = connection.execute(text("SELECT tag_id FROM blog_post_tags WHERE post_id = :post_id"),
+                              {'post_id': post_id})
+    return {row[0] for row in rows}
+
+
+def upsert_tags(connection, tags):
+    """Garante que as tags existem e retorna {slug: id}. `tags` é {slug: nome}"""
+    if not tags:
+        return {}
+    params = {}
+    values = []
+    for index, (slug, name) in enumerate(tags.items()):
+        params[f'name{index}'] = name
+        params[f'slug{index}'] = slug
+        values.append(f'(:name{index}, :slug{index}, 0)')
+    connection.execute(text(_INSERT_TAGS.format(values=', '.join(values))), params)
+    rows = connection.execute(_SELECT_TAG_IDS, {'slugs': list(tags)})
+    return {slug: tag_id for tag_id, slug in rows}
+
+
+def refresh_tag_counts(connection, tag_ids=None):
+    """Recalcula `post_count` das tags informadas (ou de todas)"""
+    if tag_ids is None:
+        connection.execute(_REFRESH_ALL_COUNTS, {'published': True})
+    elif tag_ids:
+        connection.execute(_REFRESH_COUNTS, {'published': True, 'tag_ids': list(tag_ids)})
+
+
+def sync_post_tags(connection, post_id, tags):
+    """Faz as associações do post refletirem `tags` ({slug: nome})"""
+    old_ids = _current_tag_ids(connection, post_id)
+    new_ids = set(upsert_tags(connection, tags).values())
+
+    removed = old_ids - new_ids
+    added = new_ids - old_ids
+    if removed:
+        connection.execute(
+            text("DELETE FROM blog_post_tags WHERE post_id = :post_id AND tag_id IN :tag_ids")
+            .bindparams(bindparam('tag_ids', expanding=True)),
+            {'post_id': post_id, 'tag_ids': list(removed)}
+        )
+    if added:
+        connection.execute(text("INSERT INTO blog_post_tags (post_id, tag_id) VALUES (:post_id, :tag_id)"),
+                           [{'post_id': post_id, 'tag_id': tag_id} for tag_id in added])
+
+    # Tags mantidas também mudam de contagem se o post foi (des)publicado
+    refresh_tag_counts(connection, old_ids | new_ids)
+
+
+def refresh_post_tag_counts(connection, post_id):
+    """Atualiza as contagens das tags do post (ex.: depois de publicar)"""
+    refresh_tag_counts(connection, _current_tag_ids(connection, post_id))
+
+
+def remove_post_tags(connection, post_id):
+    """Remove as associações do post (antes de excluí-lo)"""
+    tag_ids = _current_tag_ids(connection, post_id)
+    if tag_ids:
+        connection.execute(text("DELETE FROM blog_post_tags WHERE post_id = :post_id"), {'post_id': post_id})
+        refresh_tag_counts(connection, tag_ids)
+
+
+def filter_by_tag(query, tag_slug):
+    """Restringe uma query de BlogPost aos posts com a tag (join pelo índice tag_id, post_id)"""
+    from src.models.blog import BlogPost, BlogTag, blog_post_tags
+
+    return query.join(blog_post_tags, blog_post_tags.c.post_id == BlogPost.id)\
+                .join(BlogTag, BlogTag.id == blog_post_tags.c.tag_id)\
+                .filter(BlogTag.slug == tag_slug)
+
+
+def migrate_tags(chunk_size=1000):
+    """Cria as tabelas de tags e popula a partir de `blog_posts.tags` em lote"""
+    from src.models.blog import BlogTag, blog_post_tags, parse_tags, db
+
+    db.metadata.create_all(bind=db.engine, tables=[BlogTag.__table__, blog_post_tags])
+
+    processed = 0
+    last_id = 0
+    with db.engine.begin() as connection:
+        while True:
+            rows = connection.execute(
+                text("SELECT id, tags FROM blog_posts WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {'last_id': last_id, 'limit': chunk_size}
+            ).all()
+            if not rows:
+                break
+
+            post_tags = {post_id: parse_tags(tags) for post_id, tags in rows}
+            all_tags = {}
+            for tags in post_tags.values():
+                for slug, name in tags.items():
+                    all_tags.setdefault(slug, name)
+
+            tag_ids = upsert_tags(connection, all_tags)
+            links = [{'post_id': post_id, 'tag_id': tag_ids[slug]}
+                     for post_id, tags in post_tags.items() for slug in tags]
+            # Limpa e regrava as associações do lote (idempotente)
+            connection.execute(
+                text("DELETE FROM blog_post_tags WHERE post_id IN :post_ids")
+                .bindparams(bindparam('post_ids', expanding=True)),
+                {'post_ids': list(post_tags)}
+            )
+            if links:
+                connection.execute(text("INSERT INTO blog_post_tags (post_id, tag_id) VALUES (:post_id, :tag_id)"),
+                                   links)
+
+            processed += len(rows)
+            last_id = rows[-1][0]
+            print(f"Posts processados: {processed} (até id {last_id})")
+
+        refresh_tag_counts(connection)
+
+    return processed
@@ -0,0 +1,134 @@
+"""
+Contador de visualizações com escrita adiada (write-behind)
+
+As leituras públicas só acumulam incrementos em memória (por worker);
+os incrementos são gravados em lote com um único
+`UPDATE ... SET views = views + delta` a cada intervalo, quando o buffer
+passa do limite e no desligamento do processo.
+"""
+
+import os
+import time
+import atexit
+import threading
+
+from flask import current_app
+from sqlalchemy import text
+
+from src.models.blog import db
+
+
+class ViewCounter:
+    """Buffer de incrementos de visualização por post"""
+
+    def __init__(self, flush_interval=10.0, max_pending=500):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._last_flush = time.monotonic()
+
+    def increment(self, post_id, amount=1):
+        """Registra visualizações sem tocar no banco"""
+        self._ensure_started()
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + amount
+            self._pending_total += amount
+            should_flush = self._pending_total >= self.max_pending
+
+        if should_flush:
+            self.flush()
+
+    def pending(self, post_id):
+        """Visualizações ainda não gravadas de um post"""
+        with self._lock:
+            return self._pending.get(post_id, 0)
+
+    def _ensure_started(self):
+        # Após o fork do gunicorn a thread do processo pai não existe mais
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._app = current_app._get_current_object()
+            self._pending = {}
+            self._pending_total = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar visualizações: {e}")
+
+    def flush(self):
+        """Grava os incrementos acumulados em um único UPDATE"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+                self._pending_total = 0
+                self._last_flush = time.monotonic()
+
+            if not batch or self._app is None:
+                return 0
+
+            params = {}
+            values = []
+            for index, (post_id, delta) in enumerate(batch.items()):
+                params[f'id{index}'] = post_id
+                params[f'delta{index}'] = delta
+                values.append(f'(:id{index}, :delta{index})')
+
+            statement = text(f"""
+                WITH v(id, delta) AS (VALUES {', '.join(values)})
+                UPDATE blog_posts
+                SET views = coalesce(views, 0) + (SELECT v.delta FROM v WHERE v.id = blog_posts.id)
+                WHERE id IN (SELECT v.id FROM v)
+            """)
+
+            try:
+                with self._app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(statement, params)
+            except Exception:
+                # Devolve os incrementos ao buffer para a próxima tentativa
+                with self._lock:
+                    for post_id, delta in batch.items():
+                        self._pending[post_id] = self._pending.get(post_id, 0) + delta
+                        self._pending_total += delta
+                raise
+
+            return len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_posts': len(self._pending),
+                'pending_views': self._pending_total,
+                'seconds_since_flush': round(time.monotonic() - self._last_flush, 3),
+            }
+
+
+view_counter = ViewCounter(
+    flush_interval=float(os.environ.get('VIEW_COUNTER_FLUSH_INTERVAL', 10)),
+    max_pending=int(os.environ.get('VIEW_COUNTER_MAX_PENDING', 500)),
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_counter.flush()
+    except Exception as e:
+        print(f"Erro ao gravar visualizações no desligamento: {e}")
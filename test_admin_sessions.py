@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Testes das sessões administrativas (src/services/admin_sessions.py e rotas de src/routes/admin.py)
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.user import db
+from src.models.admin import Admin
+from src.routes.admin import admin_bp
+from src.services import admin_sessions
+from src.services.content_cache import TTLCache
+
+PASSWORD = 'senha-segura'
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(admin_sessions, 'principal_cache', TTLCache(ttl=60, max_entries=8))
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.secret_key = 'chave-de-teste'
+    db.init_app(app)
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    with app.app_context():
+        db.create_all()
+        db.session.add(Admin('admin', 'admin@exemplo.com', PASSWORD, 'Administrador'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def login(app):
+    response = app.test_client(use_cookies=False).post(
+        '/api/admin/login', json={'username': 'admin', 'password': PASSWORD})
+    assert response.status_code == 200
+    return response.get_json()['session_token']
+
+
+def profile_status(app, token):
+    response = app.test_client(use_cookies=False).get(
+        '/api/admin/profile', headers={'Authorization': f'Bearer {token}'})
+    return response.status_code
+
+
+def test_login_nao_derruba_outros_dispositivos(app):
+    first = login(app)
+    second = login(app)
+    assert profile_status(app, first) == 200
+    assert profile_status(app, second) == 200
+
+
+def test_token_novo_aceito_em_worker_com_cache_antigo(app):
+    old_token = login(app)
+    assert profile_status(app, old_token) == 200  # principal em cache com a impressão antiga
+
+    # Outro worker fez logout e login: novo session_token no banco, cache deste worker intacto
+    admin = Admin.query.filter_by(username='admin').one()
+    admin.session_token = 'gravado-por-outro-worker'
+    db.session.commit()
+    with app.test_request_context():
+        new_token = admin_sessions._serializer().dumps(
+            {'id': admin.id, 'sid': admin_sessions.session_id_for('gravado-por-outro-worker')})
+
+    assert profile_status(app, new_token) == 200
+    assert profile_status(app, old_token) == 401
+
+
+def test_troca_de_senha_invalida_os_tokens_anteriores(app):
+    old_token = login(app)
+    response = app.test_client(use_cookies=False).post(
+        '/api/admin/change-password',
+        json={'current_password': PASSWORD, 'new_password': 'outra-senha'},
+        headers={'Authorization': f'Bearer {old_token}'})
+    assert response.status_code == 200
+    new_token = response.get_json()['session_token']
+
+    assert profile_status(app, old_token) == 401
+    assert profile_status(app, new_token) == 200
+
+
+def test_logout_invalida_o_token(app):
+    token = login(app)
+    response = app.test_client(use_cookies=False).post(
+        '/api/admin/logout', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert profile_status(app, token) == 401
+
+
+def test_token_adulterado_e_recusado(app):
+    token = login(app)
+    assert profile_status(app, token[:-2] + ('aa' if not token.endswith('aa') else 'bb')) == 401
+    assert profile_status(app, '') == 401
+
+
+def test_token_revogado_e_recusado_sem_consulta_nem_despejo(app, monkeypatch):
+    old_token = login(app)
+    response = app.test_client(use_cookies=False).post(
+        '/api/admin/logout', headers={'Authorization': f'Bearer {old_token}'})
+    assert response.status_code == 200
+
+    # O principal em cache é carregado segundos depois da emissão do token antigo
+    later = admin_sessions.time.time() + 10
+    monkeypatch.setattr(admin_sessions.time, 'time', lambda: later)
+    new_token = login(app)
+    assert profile_status(app, new_token) == 200
+    admin_id = Admin.query.filter_by(username='admin').one().id
+    cached = admin_sessions.principal_cache.get(('admin', admin_id))
+
+    queries = []
+
+    def count_query(conn, cursor, statement, *args):
+        queries.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        assert profile_status(app, old_token) == 401
+        assert profile_status(app, old_token) == 401
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+    assert queries == []
+    assert admin_sessions.principal_cache.get(('admin', admin_id)) is cached
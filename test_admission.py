@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Testes do controle de admissão (admission.py) com um app Flask mínimo
+"""
+
+import threading
+import time
+
+from flask import Flask, Response
+
+from admission import AdmissionController, TokenBuckets, classify_request, init_admission
+
+
+def make_app(controller):
+    app = Flask(__name__)
+    init_admission(app, controller)
+    release = threading.Event()
+
+    @app.route('/api/posts')
+    def posts():
+        return 'ok'
+
+    @app.route('/api/lento')
+    def slow():
+        release.wait(5)
+        return 'ok'
+
+    @app.route('/api/site/backup', methods=['POST'])
+    def backup():
+        def generate():
+            yield b'cabecalho\n'
+            yield b'linhas\n'
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    app.release = release
+    return app
+
+
+def test_classificacao():
+    assert classify_request('/api/reviews/import', 'POST') == 'import'
+    assert classify_request('/api/site/backup', 'POST') == 'backup'
+    assert classify_request('/api/blog/posts', 'GET') == 'public_read'
+    assert classify_request('/api/blog/posts', 'POST') == 'admin_write'
+
+
+def test_bucket_vazio_responde_429_com_retry_after():
+    controller = AdmissionController(limits={'public_read': (0.5, 2), 'admin_write': (1, 1),
+                                             'import': (1, 1), 'backup': (1, 1)},
+                                     max_concurrent=4)
+    client = make_app(controller).test_client()
+    assert [client.get('/api/posts').status_code for _ in range(3)] == [200, 200, 429]
+
+    response = client.get('/api/posts')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    # Outro IP tem o próprio bucket
+    assert client.get('/api/posts', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+
+def test_bucket_repoe_fichas_com_o_tempo(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('admission.time.monotonic', lambda: now[0])
+    buckets = TokenBuckets({'public_read': (2.0, 1)})
+    assert buckets.take('public_read', 'ip') == 0
+    assert buckets.take('public_read', 'ip') > 0
+    now[0] += 0.5
+    assert buckets.take('public_read', 'ip') == 0
+
+
+def test_limite_de_simultaneas_responde_503():
+    controller = AdmissionController(max_concurrent=1)
+    app = make_app(controller)
+    busy = threading.Thread(target=app.test_client().get, args=('/api/lento',))
+    busy.start()
+    try:
+        while controller._in_flight == 0:
+            time.sleep(0.001)
+        response = app.test_client().get('/api/posts')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        app.release.set()
+        busy.join()
+    assert app.test_client().get('/api/posts').status_code == 200
+    assert controller._in_flight == 0
+
+
+def test_resposta_em_streaming_segura_a_vaga_ate_o_fim():
+    controller = AdmissionController(max_concurrent=1)
+    client = make_app(controller).test_client()
+
+    response = client.post('/api/site/backup', buffered=False)
+    assert controller._in_flight == 1
+    assert client.get('/api/posts').status_code == 503
+
+    assert b''.join(response.response) == b'cabecalho\nlinhas\n'
+    response.close()
+    assert controller._in_flight == 0
+    assert client.get('/api/posts').status_code == 200
+
+
+def test_metricas():
+    controller = AdmissionController(max_concurrent=2)
+    make_app(controller).test_client().get('/api/posts')
+    metrics = {name: samples for name, _, _, samples in controller.collect_metrics()}
+    assert metrics['admission_admitted_total'] == [({'class': 'public_read'}, 1)]
+    assert metrics['admission_in_flight'] == [({}, 0)]
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Testes do backup (backup.py): leitura e validação dos arquivos e da cadeia de
+restauração, com uma conexão falsa no lugar do PostgreSQL
+"""
+
+import io
+import json
+from datetime import datetime, timezone, timedelta
+
+import backup
+
+T0 = datetime(2025, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+TABLES = {
+    'site_content': [('hero', 'Início', {'title': 'Olá'}, T0)],
+    'site_settings': [('tema', '"azul"', T0)],
+    'posts': [(1, 'Primeiro', 'Texto', T0, T0), (2, 'Segundo', 'Mais texto', T0, T0)],
+}
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.itersize = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(query)
+        if 'pg_stat_activity' in query:
+            self.rows = [(self.conn.watermark, self.conn.watermark + timedelta(minutes=5))]
+        elif query.lstrip().startswith('SELECT') and ' FROM ' in query:
+            table = query.split(' FROM ')[1].split()[0]
+            if table == 'backup_deletions':
+                self.conn.deletion_params.append(params)
+                self.rows = [(key,) for key in self.conn.deletions.get(params[0], [])]
+            elif table in TABLES:
+                self.rows = list(TABLES[table])
+
+    def copy_expert(self, query, fileobj):
+        self.conn.executed.append(query)
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeConnection:
+    def __init__(self, watermark=T0, deletions=None):
+        self.watermark = watermark
+        self.deletions = deletions or {}
+        self.deletion_params = []
+        self.executed = []
+        self.cursor_name = ''
+        self.committed = False
+
+    def cursor(self, name=None):
+        self.cursor_name = name or ''
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def commit(self):
+        self.committed = True
+
+
+def make_backup(since=None, watermark=T0, deletions=None):
+    return b''.join(backup.iter_backup_lines(FakeConnection(watermark, deletions), since=since))
+
+
+def test_backup_completo_ida_e_volta():
+    data = make_backup()
+    header = json.loads(data.split(b'\n', 1)[0])
+    assert header['kind'] == 'full'
+    assert header['watermark'] == T0.isoformat()
+
+    parsed = backup.parse_backup(io.BytesIO(data))
+    try:
+        assert parsed.counts['posts'] == {'rows': 2, 'deletes': 0}
+        assert parsed.rows['posts'].read().count(b'\n') == 2
+    finally:
+        parsed.close()
+
+
+def test_backup_gzip_e_aceito():
+    data = b''.join(backup.iter_chunks([make_backup()], compress=True))
+    parsed = backup.parse_backup(io.BytesIO(data))
+    parsed.close()
+
+
+def test_linha_alterada_falha_no_checksum():
+    data = make_backup().replace(b'Segundo', b'Segundx')
+    try:
+        backup.parse_backup(io.BytesIO(data))
+        assert False, 'esperava BackupError'
+    except backup.BackupError as e:
+        assert 'posts' in str(e)
+
+
+def test_backup_sem_manifesto_e_rejeitado():
+    lines = make_backup().splitlines(keepends=True)
+    try:
+        backup.parse_backup(io.BytesIO(b''.join(lines[:-1])))
+        assert False, 'esperava BackupError'
+    except backup.BackupError as e:
+        assert 'manifesto' in str(e)
+
+
+def assert_restore_falha(files, trecho):
+    conn = FakeConnection()
+    try:
+        backup.restore_backups(conn, [io.BytesIO(data) for data in files])
+        assert False, 'esperava BackupError'
+    except backup.BackupError as e:
+        assert trecho in str(e)
+    assert not conn.committed
+
+
+def test_cadeia_completo_e_incrementais():
+    full = make_backup(watermark=T0)
+    incremental = make_backup(since=T0 - timedelta(seconds=30), watermark=T0 + timedelta(hours=1))
+    conn = FakeConnection()
+    summary = backup.restore_backups(conn, [io.BytesIO(full), io.BytesIO(incremental)])
+    assert [item['kind'] for item in summary] == ['full', 'incremental']
+    assert conn.committed
+
+
+def test_cadeia_deve_comecar_pelo_completo():
+    assert_restore_falha([make_backup(since=T0)], 'completo')
+
+
+def test_cadeia_com_lacuna():
+    full = make_backup(watermark=T0)
+    incremental = make_backup(since=T0 + timedelta(hours=1), watermark=T0 + timedelta(hours=2))
+    assert_restore_falha([full, incremental], 'Lacuna')
+
+
+def test_marca_sem_fuso_e_rejeitada():
+    full = make_backup(watermark=T0)
+    incremental = make_backup(since=T0, watermark=T0 + timedelta(hours=1))
+    incremental = incremental.replace(T0.isoformat().encode(), b'2025-05-01T12:00:00', 1)
+    assert_restore_falha([full, incremental], 'fuso')
+
+    try:
+        backup.parse_mark('2025-05-01T12:00:00')
+        assert False, 'esperava BackupError'
+    except backup.BackupError:
+        pass
+    assert backup.parse_mark('2025-05-01T12:00:00+00:00') == T0
+
+
+def test_incremental_traz_so_as_exclusoes_desde_a_marca():
+    since = T0 - timedelta(seconds=30)
+    conn = FakeConnection(T0 + timedelta(hours=1), deletions={'posts': ['7']})
+    data = b''.join(backup.iter_backup_lines(conn, since=since))
+    # Só tombstones filtrados pela marca, nunca a lista de chaves vivas
+    assert conn.deletion_params == [(table, since) for table in backup.BACKUP_TABLES]
+
+    parsed = backup.parse_backup(io.BytesIO(data))
+    try:
+        assert parsed.counts['posts'] == {'rows': 2, 'deletes': 1}
+        assert parsed.deletes['posts'].read() == b'"7"\n'
+    finally:
+        parsed.close()
+
+    restore = FakeConnection()
+    backup.restore_backups(restore, [io.BytesIO(make_backup()), io.BytesIO(data)])
+    statements = [' '.join(q.split()) for q in restore.executed]
+    delete_at = next(i for i, q in enumerate(statements) if q.startswith('DELETE FROM posts'))
+    upsert_at = next(i for i, q in enumerate(statements) if q.startswith('INSERT INTO posts'))
+    assert delete_at < upsert_at
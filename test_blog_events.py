@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Testes da notificação de alterações em posts (src/services/blog_events.py)
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db
+from src.models.admin import Admin  # noqa: F401 (registra a tabela admins)
+from src.models.blog import BlogPost
+from src.services import blog_events, related_posts
+
+
+@pytest.fixture
+def commits(monkeypatch):
+    received = []
+    monkeypatch.setattr(blog_events, '_listeners', [received.append])
+    monkeypatch.setattr(related_posts, 'RELATED_POSTS_ASYNC', False)
+    return received
+
+
+@pytest.fixture
+def app(commits):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def new_post(title):
+    return BlogPost(title=title, content='<p>Texto</p>', category='Prevenção', author_id=1)
+
+
+def test_savepoint_nao_dispara_antes_do_commit(app, commits):
+    post = new_post('Coração')
+    post.save_with_unique_slug()  # begin_nested + flush
+    assert commits == []
+
+    db.session.commit()
+    assert commits == [{post.id: 'created'}]
+
+
+def test_rollback_do_savepoint_mantem_as_alteracoes_anteriores(app, commits):
+    first = new_post('Coração')
+    first.save_with_unique_slug()
+    db.session.commit()
+    commits.clear()
+
+    second = new_post('Arritmia')
+    second.save_with_unique_slug()
+    duplicate = new_post('Outro')
+    duplicate.slug = 'coracao'
+    with pytest.raises(IntegrityError):
+        with db.session.begin_nested():
+            db.session.add(duplicate)
+            db.session.flush()
+    db.session.commit()
+
+    assert commits == [{second.id: 'created'}]
+
+
+def test_rollback_externo_descarta(app, commits):
+    new_post('Coração').save_with_unique_slug()
+    db.session.rollback()
+    db.session.commit()
+    assert commits == []
+
+
+def test_despublicar_e_informado(app, commits):
+    post = new_post('Coração')
+    post.publish()
+    post.save_with_unique_slug()
+    db.session.commit()
+    commits.clear()
+
+    post.unpublish()  # atributos expirados pelo commit: sem valor anterior carregado
+    db.session.commit()
+    assert commits == [{post.id: 'unpublished'}]
+
+    post.publish()
+    db.session.commit()
+    db.session.refresh(post)
+    post.unpublish()
+    db.session.commit()
+    assert commits[1:] == [{post.id: 'updated'}, {post.id: 'unpublished'}]
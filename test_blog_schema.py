@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Testes do passo de schema do blog (src/services/blog_schema.py) e da busca sem DDL
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+from src.models.user import db
+from src.models.blog import BlogPost
+from src.services import related_posts, search
+from src.services.blog_schema import upgrade_blog_schema
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(search, '_backend', None)
+    # O SQLite em memória tem uma única conexão: nada de thread de fundo
+    monkeypatch.setattr(related_posts, 'RELATED_POSTS_ASYNC', False)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def fts_exists():
+    return db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE name = 'blog_posts_fts'"
+    )).scalar() is not None
+
+
+def add_post(title):
+    post = BlogPost(title=title, content='<p>Cuidados com o coração</p>', category='Prevenção', author_id=1)
+    post.publish()
+    post.save_with_unique_slug()
+    db.session.commit()
+
+
+def test_busca_sem_indice_usa_like_e_nao_cria_nada(app):
+    add_post('Coração saudável')
+    results = search.search_posts('coração')
+    assert search.search_backend() == 'like'
+    assert [post.title for post in results.items] == ['Coração saudável']
+    assert not fts_exists()
+
+
+def test_upgrade_cria_o_indice_e_e_idempotente(app):
+    add_post('Coração saudável')
+    assert upgrade_blog_schema(db.engine) == {'added_columns': [], 'search': 'sqlite'}
+    assert upgrade_blog_schema(db.engine) == {'added_columns': [], 'search': 'sqlite'}
+    assert fts_exists()
+
+    results = search.search_posts('coracao')
+    assert search.search_backend() == 'sqlite'
+    assert results.total == 1
+
+
+def test_upgrade_adiciona_e_preenche_colunas_novas(app):
+    add_post('Coração saudável')
+    # Banco anterior às colunas derivadas
+    for column in ('plain_text', 'word_count', 'rendered_html', 'toc', 'render_hash'):
+        db.session.execute(text(f"ALTER TABLE blog_posts DROP COLUMN {column}"))
+    db.session.commit()
+
+    summary = upgrade_blog_schema(db.engine)
+    assert summary['added_columns'] == ['plain_text', 'word_count', 'rendered_html', 'toc', 'render_hash']
+    row = db.session.execute(text("SELECT plain_text, word_count, rendered_html FROM blog_posts")).one()
+    assert tuple(row) == ('Cuidados com o coração', 4, '<p>Cuidados com o coração</p>')
+
+
+def test_listagem_nao_carrega_o_conteudo(app):
+    add_post('Coração saudável')
+    statement = str(BlogPost.query.statement.compile())
+    assert 'blog_posts.content' not in statement
+    for column in ('plain_text', 'rendered_html', 'toc'):
+        assert f'blog_posts.{column}' not in statement
+
+    post = BlogPost.query.first()
+    post.is_featured = True
+    db.session.commit()
+    post.content = '<p>Outro texto sobre arritmia</p>'
+    db.session.commit()
+    assert (post.word_count, post.plain_text) == (4, 'Outro texto sobre arritmia')
+
+
+def test_lock_do_schema_nao_e_o_das_migracoes():
+    from migrations import MIGRATIONS_LOCK_KEY
+    from src.services.blog_schema import SCHEMA_LOCK_KEY
+    assert SCHEMA_LOCK_KEY not in (MIGRATIONS_LOCK_KEY, 728402)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Testes do pool de conexões (db_pool.py) com conexões falsas, sem PostgreSQL
+"""
+
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+import db_pool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        time.sleep(self.conn.ping_delay)
+
+
+class FakeConnection:
+    def __init__(self, *args, **kwargs):
+        self.closed = 0
+        self.ping_delay = 0.0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        time.sleep(self.ping_delay)
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return self.status
+
+
+def make_pool(monkeypatch, **kwargs):
+    monkeypatch.setattr(psycopg2, 'connect', FakeConnection)
+    return db_pool.ConnectionPool('postgresql://teste', **kwargs)
+
+
+def test_timeout_quando_pool_esgotado(monkeypatch):
+    pool = make_pool(monkeypatch, max_size=1, timeout=0.1)
+    pool.getconn()
+    try:
+        pool.getconn()
+        assert False, 'esperava PoolTimeout'
+    except db_pool.PoolTimeout:
+        pass
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_putconn_desfaz_transacao_e_reutiliza(monkeypatch):
+    pool = make_pool(monkeypatch, max_size=1)
+    conn = pool.getconn()
+    conn.status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.status == extensions.TRANSACTION_STATUS_IDLE
+    assert pool.getconn() is conn
+
+
+def test_ping_lento_nao_bloqueia_o_pool(monkeypatch):
+    pool = make_pool(monkeypatch, max_size=2, ping_after=0)
+    slow = pool.getconn()
+    other = pool.getconn()
+    pool.putconn(slow)
+    slow.ping_delay = 0.5
+
+    worker = threading.Thread(target=pool.getconn)
+    worker.start()
+    time.sleep(0.05)  # o worker está no SELECT 1 da conexão lenta
+
+    started = time.monotonic()
+    pool.putconn(other)
+    pool.stats()
+    assert time.monotonic() - started < 0.2
+    worker.join()
+
+    # A vaga da conexão em teste conta no limite: nada de conexões extras
+    assert pool.stats()['created'] == 2
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Testes do pool de hash de senhas (src/services/password_hashing.py)
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.services.password_hashing import PasswordHasher, PasswordHasherBusy
+
+FAST_METHOD = 'pbkdf2:sha256:1000'
+
+
+def test_hash_e_verificacao():
+    hasher = PasswordHasher(method=FAST_METHOD)
+    pwhash = hasher.hash('senha-123')
+    assert hasher.verify(pwhash, 'senha-123')
+    assert not hasher.verify(pwhash, 'outra')
+    assert not hasher.needs_rehash(pwhash)
+    assert PasswordHasher(method='pbkdf2:sha256:2000').needs_rehash(pwhash)
+
+
+def test_pool_cheio_recusa_na_hora():
+    hasher = PasswordHasher(method=FAST_METHOD, workers=1, max_queue=0, timeout=5)
+    release = threading.Event()
+    worker = threading.Thread(target=hasher._run, args=(release.wait,))
+    worker.start()
+    try:
+        while hasher._slots._value:  # espera a tarefa ocupar a única vaga
+            time.sleep(0.001)
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('senha-123')
+    finally:
+        release.set()
+        worker.join()
+    assert hasher.stats()['rejected'] == 1
+    assert hasher.verify(hasher.hash('senha-123'), 'senha-123')
+
+
+def test_timeout_vira_busy_e_libera_a_vaga():
+    hasher = PasswordHasher(method=FAST_METHOD, workers=1, max_queue=0, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(PasswordHasherBusy):
+        hasher._run(release.wait)
+    assert hasher.stats()['timeouts'] == 1
+
+    release.set()
+    hasher._executor.shutdown(wait=True)
+    hasher._executor = None
+    assert hasher.verify(hasher.hash('senha-123'), 'senha-123')
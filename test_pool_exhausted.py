@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Pool de conexões esgotado nas rotas de app.py: 503 com Retry-After, não 500
+"""
+
+import app as app_module
+from db_pool import PoolTimeout
+
+
+class ExhaustedPool:
+    def getconn(self):
+        raise PoolTimeout('Nenhuma conexão livre após 5.0s (5/5 em uso)')
+
+
+class BrokenPool:
+    def getconn(self):
+        raise OSError('connection refused')
+
+
+def test_pool_esgotado_responde_503(monkeypatch):
+    monkeypatch.setattr(app_module, 'get_pool', lambda: ExhaustedPool())
+    app_module.content_cache.clear()
+    response = app_module.app.test_client().get('/api/settings')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_banco_fora_do_ar_continua_500(monkeypatch):
+    monkeypatch.setattr(app_module, 'get_pool', lambda: BrokenPool())
+    app_module.content_cache.clear()
+    response = app_module.app.test_client().get('/api/settings')
+    assert response.status_code == 500
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Testes das listas de posts prontas (src/services/post_snapshot.py) em um SQLite em memória
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.models.admin import Admin  # noqa: F401 (registra a tabela admins)
+from src.models.blog import BlogPost
+from src.services import post_snapshot as snapshot_module, related_posts
+from src.services.post_snapshot import PostSnapshot
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # O SQLite em memória tem uma única conexão: nada de thread de fundo
+    monkeypatch.setattr(related_posts, 'RELATED_POSTS_ASYNC', False)
+    monkeypatch.setattr(snapshot_module, 'SNAPSHOT_SIZE', 2)
+    monkeypatch.setattr(snapshot_module, 'post_snapshot', PostSnapshot())
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def create_posts(count):
+    posts = []
+    start = datetime(2025, 1, 1)
+    for number in range(count):
+        post = BlogPost(title=f'Post {number}', content='<p>Texto</p>', category='Prevenção', author_id=1)
+        post.publish()
+        post.published_at = start + timedelta(days=number)
+        post.save_with_unique_slug()
+        posts.append(post)
+    db.session.commit()
+    return posts
+
+
+def latest():
+    body = json.loads(snapshot_module.post_snapshot.latest_response_body(2))
+    category = json.loads(snapshot_module.post_snapshot.latest_response_body(2, category='Prevenção'))
+    return [post['title'] for post in body['posts']], body['pagination']['total'], category['pagination']['total']
+
+
+def test_despublicar_post_fora_das_listas_atualiza_os_totais(app):
+    oldest = create_posts(4)[0]
+    assert latest() == (['Post 3', 'Post 2'], 4, 4)
+
+    oldest.unpublish()
+    db.session.commit()
+    assert latest() == (['Post 3', 'Post 2'], 3, 3)
+
+
+def test_excluir_post_fora_das_listas_atualiza_os_totais(app):
+    oldest = create_posts(4)[0]
+    assert latest()[1] == 4
+
+    db.session.delete(oldest)
+    db.session.commit()
+    assert latest() == (['Post 3', 'Post 2'], 3, 3)
+
+
+def test_rascunho_fora_das_listas_nao_reconstroi(app, monkeypatch):
+    create_posts(3)
+    latest()
+    draft = BlogPost(title='Rascunho', content='<p>Texto</p>', category='Prevenção', author_id=1)
+    draft.save_with_unique_slug()
+    db.session.commit()
+
+    rebuilds = []
+    monkeypatch.setattr(snapshot_module.post_snapshot, 'rebuild', lambda: rebuilds.append(1))
+    draft.title = 'Rascunho editado'
+    db.session.commit()
+    assert rebuilds == []
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Testes do cursor da listagem de posts (GET /api/blog/posts) e da migração de data_criacao
+"""
+
+from datetime import datetime, timezone, timedelta
+
+from app import encode_posts_cursor, decode_posts_cursor
+from migrations import MIGRATIONS
+
+
+def test_cursor_ida_e_volta():
+    created = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=timezone(timedelta(hours=-3)))
+    cursor = encode_posts_cursor(created, 42)
+    assert '=' not in cursor
+    assert decode_posts_cursor(cursor) == (created, 42)
+
+
+def test_cursor_invalido():
+    for cursor in ('', 'nao-e-base64!!', encode_posts_cursor(datetime(2025, 1, 1), 1)[:-3] + 'xyz'):
+        try:
+            decode_posts_cursor(cursor)
+            assert False, f'cursor aceito: {cursor!r}'
+        except ValueError:
+            pass
+
+
+def test_migracao_torna_data_criacao_obrigatoria():
+    executed = []
+
+    class Cursor:
+        def execute(self, sql, params=None):
+            executed.append(' '.join(sql.split()))
+
+    migrate = {version: fn for version, _, fn in MIGRATIONS}[5]
+    migrate(Cursor())
+    assert executed[0].startswith('UPDATE posts SET data_criacao = COALESCE(')
+    assert executed[1] == 'ALTER TABLE posts ALTER COLUMN data_criacao SET NOT NULL;'
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Testes da atualização dos posts relacionados (src/services/related_posts.py) em um SQLite em memória
+"""
+
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.models.admin import Admin  # noqa: F401 (registra a tabela admins)
+from src.models.blog import BlogPost, BlogRelatedPost
+from src.services import related_posts
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Conta quantas vezes o TfidfIndex é montado"""
+    calls = []
+    real_index = related_posts.TfidfIndex
+
+    def counting_index(*args, **kwargs):
+        calls.append(1)
+        return real_index(*args, **kwargs)
+
+    monkeypatch.setattr(related_posts, 'TfidfIndex', counting_index)
+    monkeypatch.setattr(related_posts, 'RELATED_POSTS_ASYNC', False)
+    monkeypatch.setattr(related_posts, 'index_cache', related_posts.IndexCache())
+    return calls
+
+
+@pytest.fixture
+def app(builds):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def create_post(title, content, publish=True, category='Transplante'):
+    post = BlogPost(title=title, content=f'<p>{content}</p>', category=category, author_id=1)
+    if publish:
+        post.publish()
+    post.save_with_unique_slug()
+    db.session.commit()
+    return post
+
+
+def related_ids(post):
+    rows = BlogRelatedPost.query.filter_by(post_id=post.id).order_by(BlogRelatedPost.rank).all()
+    return [row.related_id for row in rows]
+
+
+def test_relacionados_atualizados_depois_do_commit(app, builds):
+    first = create_post('Transplante cardíaco', 'cuidados depois do transplante cardíaco')
+    second = create_post('Vida após o transplante', 'rotina depois do transplante cardíaco')
+    create_post('Receitas leves', 'salada de folhas e azeite', category='Nutrição')
+
+    assert related_ids(first) == [second.id]
+    assert related_ids(second) == [first.id]
+
+
+def test_rascunhos_e_edicoes_sem_texto_nao_recalculam(app, builds):
+    first = create_post('Transplante cardíaco', 'cuidados depois do transplante cardíaco')
+    create_post('Vida após o transplante', 'rotina depois do transplante cardíaco')
+    before = len(builds)
+
+    draft = create_post('Rascunho sobre transplante', 'transplante cardíaco', publish=False)
+    draft.content = '<p>Outro rascunho sobre transplante cardíaco</p>'
+    db.session.commit()
+    first.is_featured = True
+    first.featured_image = 'https://exemplo.com/capa.jpg'
+    db.session.commit()
+    assert len(builds) == before
+
+    first.content = '<p>Texto novo sobre arritmia</p>'
+    db.session.commit()
+    assert len(builds) == before + 1
+
+
+def test_despublicar_remove_das_listas(app, builds):
+    first = create_post('Transplante cardíaco', 'cuidados depois do transplante cardíaco')
+    second = create_post('Vida após o transplante', 'rotina depois do transplante cardíaco')
+
+    second.unpublish()
+    db.session.commit()
+    assert related_ids(first) == []
+    assert related_ids(second) == []
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Testes da chave de deduplicação das avaliações (review_keys.py, usada por app.py e migrations.py)
+"""
+
+import hashlib
+
+from app import review_dedup_key
+from review_keys import assign_dedup_keys
+
+
+def test_espacos_e_maiusculas_nao_mudam_a_chave():
+    key = review_dedup_key('google', 'Maria Silva', 'Ótimo  atendimento!')
+    assert review_dedup_key('google', '  maria   SILVA ', 'ótimo atendimento!\n') == key
+
+
+def test_comentario_diferente_gera_outra_chave():
+    assert review_dedup_key('google', 'Maria', 'Ótimo') != review_dedup_key('google', 'Maria', 'Bom')
+    assert review_dedup_key('google', 'Maria', 'Ótimo') != review_dedup_key('doctoralia', 'Maria', 'Ótimo')
+
+
+def test_comentario_vazio_equivale_a_nulo():
+    assert review_dedup_key('google', 'Maria', None) == review_dedup_key('google', 'Maria', '')
+
+
+def test_id_externo_tem_precedencia():
+    key = review_dedup_key('google', 'Maria', 'Ótimo', external_id='abc123')
+    assert review_dedup_key('google', 'Outro nome', 'Outro texto', external_id='abc123') == key
+    assert key == hashlib.md5(b'ext|google|abc123').hexdigest()
+    # id externo vazio cai na regra de texto
+    assert review_dedup_key('google', 'Maria', 'Ótimo', external_id='') == \
+        review_dedup_key('google', 'Maria', 'Ótimo')
+
+
+def test_preenchimento_da_migracao_usa_a_chave_da_importacao():
+    rows = [
+        (3, 'google', 'ÉRICA  Conceição', 'Ótimo ATENDIMENTO', None),
+        (1, 'google', 'érica conceição', 'ótimo atendimento', ''),
+        (2, 'google', 'Outra', None, 'abc123'),
+    ]
+    assert assign_dedup_keys(rows) == [
+        (1, review_dedup_key('google', 'érica conceição', 'ótimo atendimento')),
+        (2, review_dedup_key('google', 'Outra', None, external_id='abc123')),
+    ]
+    # Uma nova importação da mesma avaliação colide com a chave preenchida
+    assert review_dedup_key('google', 'Érica Conceição', 'ótimo Atendimento') == assign_dedup_keys(rows)[0][1]
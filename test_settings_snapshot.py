@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Testes do snapshot de configurações (src/services/settings_snapshot.py e rotas de src/routes/settings.py)
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.models.settings import Base, ColorTheme, WhatsAppConfig
+from src.routes import settings as settings_routes
+from src.services.settings_snapshot import SettingsStore
+
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'site_data.db')
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'settings.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_banco_distribuido_serve_os_links_padrao(tmp_path):
+    if not os.path.exists(SHIPPED_DB):
+        pytest.skip('site_data.db ausente')
+    # Cópia: o site_data.db do repositório não tem whatsapp_config e tem outro site_settings
+    path = tmp_path / 'site_data.db'
+    shutil.copy(SHIPPED_DB, path)
+    engine = create_engine(f'sqlite:///{path}')
+    snapshot = SettingsStore(sessionmaker(bind=engine), ttl=0).current()
+    engine.dispose()
+
+    link = json.loads(snapshot.whatsapp_url_body('echo'))
+    assert link['url'].startswith('https://wa.me/5511933821515?text=')
+    assert snapshot.themes == ()
+
+
+def test_secao_com_erro_mantem_o_ultimo_valor(engine):
+    Session = sessionmaker(bind=engine)
+    db_session = Session()
+    db_session.add(WhatsAppConfig(phone_number='5511900000000'))
+    db_session.add(ColorTheme(theme_name='Azul', primary_color='#00f', secondary_color='#fff',
+                              accent_color='#0ff', background_color='#fff', text_color='#000',
+                              is_active=True))
+    db_session.commit()
+    db_session.close()
+
+    store = SettingsStore(Session, ttl=0)
+    assert store.current().whatsapp['phone_number'] == '5511900000000'
+
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE color_themes'))
+        conn.execute(text("UPDATE whatsapp_config SET phone_number = '5511911111111'"))
+    snapshot = store.reload()
+
+    assert [theme['theme_name'] for theme in snapshot.themes] == ['Azul']
+    assert snapshot.whatsapp['phone_number'] == '5511911111111'
+
+
+def test_falha_no_reload_nao_vira_500_depois_do_commit(engine, monkeypatch):
+    Session = sessionmaker(bind=engine)
+    store = SettingsStore(Session, ttl=0)
+
+    def broken_reload():
+        raise RuntimeError('banco indisponível')
+
+    monkeypatch.setattr(store, 'reload', broken_reload)
+    monkeypatch.setattr(settings_routes, 'Session', Session)
+    monkeypatch.setattr(settings_routes, 'settings_store', store)
+
+    app = Flask(__name__)
+    app.secret_key = 'chave-de-teste'
+    app.register_blueprint(settings_routes.settings_bp)
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['admin_logged_in'] = True
+
+    response = client.post('/api/settings/whatsapp', json={'phone_number': '5511922222222'})
+    assert response.status_code == 200
+
+    db_session = Session()
+    assert db_session.query(WhatsAppConfig).one().phone_number == '5511922222222'
+    db_session.close()
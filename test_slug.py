@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Testes da geração de slugs dos posts (src/models/blog.py) em um SQLite em memória
+"""
+
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.models.admin import Admin  # noqa: F401 (registra a tabela admins)
+from src.models.blog import BlogPost
+from src.services import related_posts
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # O SQLite em memória tem uma única conexão: nada de thread de fundo
+    monkeypatch.setattr(related_posts, 'RELATED_POSTS_ASYNC', False)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def create_post(title):
+    post = BlogPost(title=title, content='<p>Texto</p>', category='Prevenção', author_id=1)
+    post.save_with_unique_slug()
+    db.session.commit()
+    return post
+
+
+def test_sufixo_numerico(app):
+    assert [create_post('Coração').slug for _ in range(3)] == ['coracao', 'coracao-1', 'coracao-2']
+
+
+def test_slugs_mais_longos_com_mesmo_prefixo_nao_contam(app):
+    for _ in range(3):
+        create_post('Coração')
+    for n in range(60):
+        create_post(f'Coração saudável {n} dicas')
+    create_post('Coração 2024 em números')
+
+    assert create_post('Coração').slug == 'coracao-3'
+
+
+def test_edicao_do_titulo_gera_slug_livre(app):
+    create_post('Coração')
+    create_post('Coração')
+    post = create_post('Arritmia')
+
+    post.title = 'Coração'
+    post.update_slug()
+    db.session.commit()
+    assert post.slug == 'coracao-2'
+
+
+def test_edicao_tenta_de_novo_em_colisao(app, monkeypatch):
+    create_post('Coração')
+    post = create_post('Arritmia')
+
+    real_generate_slug = BlogPost.generate_slug
+    calls = []
+
+    def colliding_generate_slug(self):
+        calls.append(1)
+        # A primeira tentativa simula um insert concorrente que já levou o slug
+        return 'coracao' if len(calls) == 1 else real_generate_slug(self)
+
+    monkeypatch.setattr(BlogPost, 'generate_slug', colliding_generate_slug)
+    post.title = 'Coração'
+    post.content = '<p>Novo texto</p>'
+    post.update_slug()
+    db.session.commit()
+
+    assert len(calls) == 2
+    assert post.slug == 'coracao-1'
+    assert db.session.get(BlogPost, post.id).content == '<p>Novo texto</p>'
+
+
+def test_postgres_usa_prefixo_indexavel():
+    from sqlalchemy.dialects import postgresql
+    from src.models.blog import _numeric_slug_clause
+
+    clause = _numeric_slug_clause(BlogPost.slug, 'coracao', 'postgresql')
+    sql = str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+    assert "blog_posts.slug LIKE 'coracao-%%'" in sql
+    assert "blog_posts.slug ~ '^coracao-[0-9]+$'" in sql
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Testes das tags normalizadas do blog (blog_tags.post_count e filtro ?tag=) em um SQLite em memória
+"""
+
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.models.admin import Admin  # noqa: F401 (registra a tabela admins)
+from src.models.blog import BlogPost, BlogTag, parse_tags
+from src.services import related_posts
+from src.services.tags import filter_by_tag
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # O SQLite em memória tem uma única conexão: nada de thread de fundo
+    monkeypatch.setattr(related_posts, 'RELATED_POSTS_ASYNC', False)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def create_post(title, tags, publish=True):
+    post = BlogPost(title=title, content='<p>Texto</p>', category='Prevenção', author_id=1, tags=tags)
+    if publish:
+        post.publish()
+    post.save_with_unique_slug()
+    db.session.commit()
+    return post
+
+
+def counts():
+    db.session.expire_all()
+    return {tag.slug: tag.post_count for tag in BlogTag.query.all()}
+
+
+def test_parse_tags_normaliza_e_remove_repetidas():
+    assert parse_tags(' Coração, coracao ,Exercício,, ') == {'coracao': 'Coração', 'exercicio': 'Exercício'}
+    assert parse_tags(['Dieta', 'dieta']) == {'dieta': 'Dieta'}
+    assert parse_tags(None) == {}
+
+
+def test_contagem_so_de_publicados(app):
+    create_post('Um', 'Coração, Dieta')
+    create_post('Dois', 'Coração')
+    create_post('Rascunho', 'Coração, Exercício', publish=False)
+    assert counts() == {'coracao': 2, 'dieta': 1, 'exercicio': 0}
+
+
+def test_publicar_e_despublicar_atualizam_a_contagem(app):
+    post = create_post('Rascunho', 'Coração', publish=False)
+    assert counts() == {'coracao': 0}
+
+    post.publish()
+    db.session.commit()
+    assert counts() == {'coracao': 1}
+
+    post.unpublish()
+    db.session.commit()
+    assert counts() == {'coracao': 0}
+
+
+def test_editar_e_apagar_atualizam_a_contagem(app):
+    post = create_post('Um', 'Coração, Dieta')
+    create_post('Dois', 'Dieta')
+
+    post.tags = 'Exercício'
+    db.session.commit()
+    assert counts() == {'coracao': 0, 'dieta': 1, 'exercicio': 1}
+
+    db.session.delete(post)
+    db.session.commit()
+    assert counts() == {'coracao': 0, 'dieta': 1, 'exercicio': 0}
+
+
+def test_filtro_por_tag(app):
+    create_post('Um', 'Coração, Dieta')
+    create_post('Dois', 'Dieta')
+    titles = [post.title for post in filter_by_tag(BlogPost.query, 'coracao').all()]
+    assert titles == ['Um']
+    assert filter_by_tag(BlogPost.query, 'inexistente').count() == 0